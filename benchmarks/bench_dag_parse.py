@@ -0,0 +1,147 @@
+"""
+Benchmark do tempo de parsing dos arquivos de DAG (o trabalho que o scheduler repete a cada
+min_file_process_interval para todos os arquivos da pasta dags).
+
+Cada arquivo é processado por um DagBag do Airflow (como em `airflow dags report`) em um processo
+novo, depois de importar o próprio Airflow, repetido --repeat vezes (vale a mediana). Além do tempo,
+são listados os módulos pesados importados durante o parsing (pandas, requests, pyarrow...): o
+arquivo da DAG deve apenas montar o grafo, com esses imports dentro das tasks.
+
+Com --save-baseline os tempos são gravados em benchmarks/baselines.json (chave 'dag_parse');
+nas execuções seguintes, arquivos mais lentos que a baseline além da tolerância ou que importem
+módulos pesados são apontados como regressão (código de saída 1). As baselines dependem da máquina
+e não são versionadas: sem --save-baseline, arquivos sem tempo na baseline terminam com código de
+saída 2 (sem comparação), depois das verificações que não dependem dela.
+
+Uso:
+    python benchmarks/bench_dag_parse.py [--repeat 5] [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DAGS_DIR = os.path.abspath(os.path.join(BENCHMARKS_DIR, '..', 'dags'))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+RESULT_MARKER = '[BENCH_RESULT]'
+
+# Módulos que não devem ser importados no parsing de uma DAG
+HEAVY_MODULES = {'pandas', 'numpy', 'pyarrow', 'requests', 'psycopg2', 'scipy', 'rdflib', 'pyoxigraph'}
+
+
+def dag_files() -> list[str]:
+    """Arquivos que o scheduler processa (safe mode: contêm 'airflow' e 'dag'), sem os ignorados"""
+    files = []
+    for directory, _, names in os.walk(DAGS_DIR):
+        relative = os.path.relpath(directory, DAGS_DIR)
+        if relative.split(os.sep)[0] in ('COMMON', '__pycache__'):
+            continue
+        for name in sorted(names):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as file:
+                content = file.read().lower()
+            if b'airflow' in content and b'dag' in content:
+                files.append(path)
+    return sorted(files)
+
+
+def parse_once(path: str):
+    """Executado no processo filho: processa o arquivo com um DagBag e imprime o resultado em JSON"""
+    import time
+
+    sys.path.insert(0, DAGS_DIR)
+    from airflow.models.dagbag import DagBag
+
+    before = set(sys.modules)
+    started_at = time.perf_counter()
+    dagbag = DagBag(dag_folder=path, include_examples=False, safe_mode=True)
+    elapsed = time.perf_counter() - started_at
+    imported = {name.split('.')[0] for name in set(sys.modules) - before}
+    print(RESULT_MARKER + json.dumps({
+        'ms': round(elapsed * 1000, 2),
+        'dags': sorted(dagbag.dag_ids),
+        'errors': {os.path.basename(file): str(error) for file, error in dagbag.import_errors.items()},
+        'heavy_imports': sorted(imported & HEAVY_MODULES),
+    }))
+
+
+def measure(path: str, repeat: int) -> dict:
+    """Mediana do tempo de parsing do arquivo em `repeat` processos novos"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        line = next(line for line in output.splitlines() if line.startswith(RESULT_MARKER))
+        runs.append(json.loads(line[len(RESULT_MARKER):]))
+    result = runs[-1]
+    result['ms'] = statistics.median(run['ms'] for run in runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='processos por arquivo (vale a mediana)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='arquivo JSON das baselines')
+    parser.add_argument('--save-baseline', action='store_true', help='grava os tempos como nova baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='variação tolerada em relação à baseline')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        parse_once(args.worker)
+        return
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baselines = json.load(file)
+    baseline = baselines.get('dag_parse', {})
+
+    results = {}
+    regressions = []
+    uncompared = []
+    print(f"{'arquivo':<48} {'ms':>9} {'baseline':>9}  DAGs")
+    for path in dag_files():
+        name = os.path.relpath(path, DAGS_DIR)
+        result = measure(path, args.repeat)
+        results[name] = result['ms']
+        reference = baseline.get(name)
+        print(f"{name:<48} {result['ms']:>9.1f} {reference if reference is not None else '-':>9}  "
+              f"{', '.join(result['dags'])}")
+        for file, error in result['errors'].items():
+            regressions.append(f'{name}: erro de import ({file}): {error.splitlines()[-1] if error else ""}')
+        if result['heavy_imports']:
+            regressions.append(f"{name}: importa no parsing {', '.join(result['heavy_imports'])}")
+        if reference is None:
+            uncompared.append(name)
+        elif result['ms'] > reference * (1 + args.tolerance):
+            regressions.append(f"{name}: {result['ms']:.1f} ms (baseline {reference:.1f} ms)")
+    print(f"{'total':<48} {sum(results.values()):>9.1f}")
+
+    if args.save_baseline:
+        baselines['dag_parse'] = results
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f'\n[BENCH] Baseline gravada em {args.baseline}')
+
+    if regressions:
+        print(f'\n[BENCH] {len(regressions)} regressões:')
+        for regression in regressions:
+            print(f'    {regression}')
+        sys.exit(1)
+    if uncompared and not args.save_baseline:
+        print(f'\n[BENCH] {len(uncompared)} arquivos sem tempo em {args.baseline} '
+              f'(grave uma baseline com --save-baseline nesta máquina)')
+        sys.exit(2)
+    print('\n[BENCH] Nenhuma regressão no parsing das DAGs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark de vazão do decodificador de METAR (dags/METAR/metar_decoder.py).
+
+Gera mensagens METAR sintéticas (formato brasileiro, com tendência, observações e variações de
+visibilidade/nuvens/tempo presente) e mede quantas mensagens por minuto decode_metar processa.
+
+Uso:
+    python benchmarks/bench_metar_decoder.py [--reports 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from METAR.metar_decoder import decode_metar  # noqa: E402
+
+STATIONS = ['SBGR', 'SBSP', 'SBRJ', 'SBGL', 'SBBR', 'SBCF', 'SBPA', 'SBSV', 'SBRF', 'SBKP']
+VISIBILITIES = ['9999', 'CAVOK', '8000', '5000', '3000', '1500', '0800', '9999NDV']
+WEATHER = ['', '', '', '-RA', 'RA', '+TSRA', 'BR', 'VCSH', '-DZ BR', 'FG', 'TS VCSH']
+CLOUDS = ['', 'FEW015', 'SCT020', 'BKN008 OVC015', 'FEW020 SCT030CB BKN100', 'FEW010 SCT025TCU BKN080 OVC100',
+          'VV002']
+TRENDS = ['', ' NOSIG', ' BECMG 2000 RA', ' TEMPO 3000 TSRA BKN010CB']
+
+
+def synthetic_reports(count: int, seed: int = 42) -> list[str]:
+    """Mensagens METAR sintéticas (reprodutíveis)"""
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(count):
+        visibility = rng.choice(VISIBILITIES)
+        body = [
+            rng.choice(STATIONS),
+            f'{rng.randint(1, 28):02d}{rng.randint(0, 23):02d}00Z',
+            f'{rng.randint(0, 36) * 10:03d}{rng.randint(0, 25):02d}KT',
+            visibility,
+        ]
+        if visibility != 'CAVOK':
+            body += [rng.choice(WEATHER), rng.choice(CLOUDS)]
+        temperature = rng.randint(5, 35)
+        # Altímetro em hPa (Q) ou, como nas estações norte-americanas, em centésimos de inHg (A)
+        pressure = f'A{rng.randint(2950, 3020)}' if rng.random() < 0.2 else f'Q{rng.randint(1000, 1030)}'
+        body += [f'{temperature:02d}/{temperature - rng.randint(0, 10):02d}', pressure]
+        report = ' '.join(part for part in body if part) + rng.choice(TRENDS)
+        if rng.random() < 0.1:
+            report += ' RMK A2992'
+        reports.append(('METAR ' if rng.random() < 0.5 else '') + report)
+    return reports
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=1_000_000, help='quantidade de mensagens')
+    parser.add_argument('--repeat', type=int, default=3, help='repetições (vale a melhor)')
+    args = parser.parse_args()
+
+    raw = pd.Series(synthetic_reports(args.reports))
+    print(f'[BENCH] {len(raw)} mensagens sintéticas geradas')
+
+    timings = []
+    for i in range(args.repeat):
+        started_at = time.perf_counter()
+        decoded = decode_metar(raw)
+        timings.append(time.perf_counter() - started_at)
+        print(f'[BENCH] Execução {i + 1}: {timings[-1]:.2f}s')
+
+    best = min(timings)
+    print(f'[BENCH] Melhor tempo: {best:.2f}s — {len(raw) / best * 60:,.0f} mensagens/minuto')
+    print('[BENCH] Preenchimento das colunas decodificadas:')
+    for column, filled in decoded.notna().mean().items():
+        print(f'    {column:<22} {filled:6.1%}')
+
+
+if __name__ == '__main__':
+    main()
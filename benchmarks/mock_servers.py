@@ -0,0 +1,296 @@
+"""
+Servidores HTTP locais que substituem as fontes externas nos benchmarks.
+
+Um único servidor (threads, porta livre em 127.0.0.1) responde, com dados sintéticos e
+reprodutíveis, nas mesmas formas das APIs reais:
+
+    /asos.py                 CSV do asos.py do IEM (estações × dias, uma observação por hora)
+    /stations.geojson        lista de estações da rede BR__ASOS (GeoJSON)
+    /vra                     VRA da ANAC: JSON dentro de uma string JSON (?dt_voo=ddmmaaaa)
+    /taticflow               Tatic Flow paginado (?createdat=gt.<data>&limit=&offset=)
+    /<dataset>/data          Graph Store Protocol do Fuseki (POST de Turtle)
+    /<dataset>/query         SPARQL do Fuseki (resultados em application/sparql-results+json)
+    /<dataset>/update        SPARQL Update do Fuseki
+
+Uso:
+
+    with MockServer(vra_flights=3000) as server:
+        os.environ['AIRDATA_VRA_URL'] = server.url('/vra')
+        ...
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench_metar_decoder import STATIONS, synthetic_reports
+
+# Colunas retornadas pelo asos.py com data=all, latlon=no, elev=no
+ASOS_COLUMNS = [
+    'station', 'valid', 'tmpf', 'dwpf', 'relh', 'drct', 'sknt', 'p01i', 'alti', 'mslp', 'vsby', 'gust',
+    'skyc1', 'skyc2', 'skyc3', 'skyc4', 'skyl1', 'skyl2', 'skyl3', 'skyl4', 'wxcodes',
+    'ice_accretion_1hr', 'ice_accretion_3hr', 'ice_accretion_6hr', 'peak_wind_gust', 'peak_wind_drct',
+    'peak_wind_time', 'feel', 'metar', 'snowdepth',
+]
+AIRLINES = [('GLO', 'GOL LINHAS AÉREAS S.A.'), ('TAM', 'TAM LINHAS AÉREAS S.A.'), ('AZU', 'AZUL LINHAS AÉREAS S.A.')]
+AIRPORTS = ['SBGR', 'SBSP', 'SBRJ', 'SBGL', 'SBBR', 'SBCF', 'SBPA', 'SBSV', 'SBRF', 'SBKP']
+TATICFLOW_START = datetime(2025, 1, 1)
+
+
+def station_codes(count: int) -> list[str]:
+    """`count` códigos ICAO sintéticos (os primeiros são aeródromos reais)"""
+    codes = list(STATIONS)
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    i = 0
+    while len(codes) < count:
+        code = f'SB{letters[i // 26 % 26]}{letters[i % 26]}'
+        if code not in codes:
+            codes.append(code)
+        i += 1
+    return codes[:count]
+
+
+def asos_csv(stations: list[str], start_date: date, end_date: date) -> str:
+    """CSV do asos.py com uma observação por hora para cada estação e dia do período"""
+    rows = [','.join(ASOS_COLUMNS)]
+    hours = int((end_date - start_date).days + 1) * 24
+    for station in stations:
+        rng = random.Random(zlib.crc32(f'{station}{start_date}'.encode()))
+        reports = synthetic_reports(hours, seed=rng.randint(0, 2 ** 31))
+        valid = datetime.combine(start_date, datetime.min.time())
+        for report in reports:
+            tmpf = round(rng.uniform(50, 95), 1)
+            rows.append(','.join([
+                station, valid.strftime('%Y-%m-%d %H:%M'), str(tmpf), str(round(tmpf - rng.uniform(0, 15), 1)),
+                str(round(rng.uniform(30, 100), 2)), str(rng.randint(0, 36) * 10), str(rng.randint(0, 25)),
+                rng.choice(['0.00', '0.00', 'T', '0.04']), str(round(rng.uniform(29.7, 30.2), 2)),
+                str(round(rng.uniform(1005, 1025), 1)), str(rng.choice([10.0, 6.0, 3.0, 1.25])),
+                rng.choice(['null', 'null', '25']),
+                rng.choice(['FEW', 'SCT', 'BKN', 'NSC']), rng.choice(['null', 'BKN']), 'null', 'null',
+                str(rng.choice([1000, 1500, 3000])), rng.choice(['null', '8000']), 'null', 'null',
+                rng.choice(['null', 'null', '-RA', 'BR']),
+                'null', 'null', 'null', 'null', 'null', 'null',
+                str(round(tmpf + rng.uniform(-2, 4), 1)), report, 'null',
+            ]))
+            valid += timedelta(hours=1)
+    return '\n'.join(rows) + '\n'
+
+
+def stations_geojson(stations: list[str]) -> str:
+    """GeoJSON da rede BR__ASOS com as estações informadas"""
+    return json.dumps({
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'id': station,
+             'properties': {'sid': station, 'sname': station, 'elevation': 10.0 * i, 'country': 'BR'},
+             'geometry': {'type': 'Point', 'coordinates': [-46.0 - i * 0.1, -23.0 + i * 0.05]}}
+            for i, station in enumerate(stations)
+        ],
+    })
+
+
+def vra_payload(day: date, flights: int) -> str:
+    """Resposta da API do VRA para um dia: a lista de voos serializada em JSON e depois como string JSON"""
+    rng = random.Random(day.toordinal())
+    records = []
+    for number in range(flights):
+        airline, airline_name = AIRLINES[number % len(AIRLINES)]
+        origin, destination = rng.sample(AIRPORTS, 2)
+        departure = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(0, 23 * 60))
+        arrival = departure + timedelta(minutes=rng.randint(45, 240))
+        delay = timedelta(minutes=rng.randint(-5, 60))
+        records.append({
+            'sg_empresa_icao': airline,
+            'nm_empresa': airline_name,
+            'nr_voo': str(1000 + number),
+            'cd_di': '0',
+            'cd_tipo_linha': 'N',
+            'sg_equipamento_icao': rng.choice(['A320', 'B738', 'E195', 'AT76']),
+            'nr_assentos_ofertados': rng.choice([70, 118, 174, 186]),
+            'sg_icao_origem': origin,
+            'nm_aerodromo_origem': origin,
+            'dt_partida_prevista': departure.strftime('%d/%m/%Y %H:%M'),
+            'dt_partida_real': (departure + delay).strftime('%d/%m/%Y %H:%M'),
+            'sg_icao_destino': destination,
+            'nm_aerodromo_destino': destination,
+            'dt_chegada_prevista': arrival.strftime('%d/%m/%Y %H:%M'),
+            'dt_chegada_real': (arrival + delay).strftime('%d/%m/%Y %H:%M'),
+            'ds_situacao_voo': 'REALIZADO',
+            'ds_justificativa': None,
+            'dt_referencia': day.strftime('%d/%m/%Y'),
+            'ds_situacao_partida': 'Pontual' if delay.total_seconds() <= 0 else 'Atraso',
+            'ds_situacao_chegada': 'Pontual' if delay.total_seconds() <= 0 else 'Atraso',
+        })
+    return json.dumps(json.dumps(records))
+
+
+def taticflow_record(index: int) -> dict:
+    """Registro sintético do Tatic Flow; `createdat` cresce um segundo por registro"""
+    rng = random.Random(index)
+    created_at = TATICFLOW_START + timedelta(seconds=index)
+    departure = created_at + timedelta(minutes=rng.randint(10, 60))
+    return {
+        'id': f'00000000-0000-4000-8000-{index:012d}',
+        'flowid': f'00000000-0000-4000-9000-{index:012d}',
+        'createdat': created_at.isoformat(timespec='milliseconds'),
+        'locality': rng.choice(AIRPORTS),
+        'callsign': f'{rng.choice(AIRLINES)[0]}{rng.randint(1000, 9999)}',
+        'adep': rng.choice(AIRPORTS),
+        'ades': rng.choice(AIRPORTS),
+        'rv': 'I',
+        'flighttype': 'S',
+        'runway': '09R',
+        'equipment': 'SDE2FGHIRWY/LB1',
+        'acfttype': rng.choice(['A320', 'B738', 'E195']),
+        'eventtype': rng.choice(['DEP', 'ARR']),
+        'eobt': departure.isoformat(timespec='milliseconds'),
+        'dep': departure.isoformat(timespec='milliseconds'),
+        'arr': (departure + timedelta(minutes=rng.randint(45, 240))).isoformat(timespec='milliseconds'),
+        'transponder': f'{rng.randint(0, 7777):04d}',
+    }
+
+
+def taticflow_page(created_after: str, limit: int, offset: int, records: int) -> list[dict]:
+    """Página da consulta createdat > created_after, ordenada por createdat"""
+    after = datetime.fromisoformat(created_after)
+    first = max(0, int((after - TATICFLOW_START).total_seconds()) + 1)
+    start = first + offset
+    return [taticflow_record(index) for index in range(start, min(records, start + limit))]
+
+
+def sparql_results(rows: int) -> dict:
+    """Resultado SELECT sintético (?voo ?origem ?destino ?atraso)"""
+    variables = ['voo', 'origem', 'destino', 'atraso']
+    return {
+        'head': {'vars': variables},
+        'results': {'bindings': [
+            {
+                'voo': {'type': 'uri', 'value': f'http://airdata.example/voo/{i}'},
+                'origem': {'type': 'literal', 'value': AIRPORTS[i % len(AIRPORTS)]},
+                'destino': {'type': 'literal', 'value': AIRPORTS[(i + 3) % len(AIRPORTS)]},
+                'atraso': {'type': 'literal', 'value': str(i % 90),
+                           'datatype': 'http://www.w3.org/2001/XMLSchema#integer'},
+            }
+            for i in range(rows)
+        ]},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'AirDataMock/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type: str = 'application/json', status: int = 200):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        config = self.server.config
+        if url.path == '/asos.py':
+            start = date(int(query['year1'][0]), int(query['month1'][0]), int(query['day1'][0]))
+            end = date(int(query['year2'][0]), int(query['month2'][0]), int(query['day2'][0]))
+            self._send(asos_csv(query.get('station', []), start, end), 'text/plain')
+        elif url.path == '/stations.geojson':
+            self._send(stations_geojson(station_codes(config['stations'])))
+        elif url.path == '/vra':
+            day = datetime.strptime(query['dt_voo'][0], '%d%m%Y').date()
+            self._send(vra_payload(day, config['vra_flights']))
+        elif url.path == '/taticflow':
+            created_after = query['createdat'][0].removeprefix('gt.')
+            page = taticflow_page(created_after, int(query['limit'][0]), int(query['offset'][0]),
+                                  config['taticflow_records'])
+            self._send(json.dumps(page))
+        elif url.path.endswith('/query'):
+            self._send(json.dumps(sparql_results(config['sparql_rows'])), 'application/sparql-results+json')
+        else:
+            self._send('Not Found', 'text/plain', 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._body()
+        if url.path.endswith('/data'):
+            # Contagem aproximada de triplas (sentenças terminadas em ' .')
+            with self.server.lock:
+                self.server.triples += body.count(b' .\n') + body.count(b' .\r\n')
+                self.server.bytes_received += len(body)
+            self._send(json.dumps({'count': body.count(b' .\n')}), status=200)
+        elif url.path.endswith('/update'):
+            self._send(b'', 'text/plain', 204)
+        elif url.path.endswith('/query'):
+            self._send(json.dumps(sparql_results(self.server.config['sparql_rows'])), 'application/sparql-results+json')
+        else:
+            self._send('Not Found', 'text/plain', 404)
+
+
+class MockServer:
+    """
+    Servidor local com todas as fontes simuladas, executado em uma thread.
+
+    Args:
+        latency_ms: atraso artificial de cada resposta (simula a rede)
+        stations: quantidade de estações na lista da rede BR__ASOS
+        vra_flights: voos por dia na resposta do VRA
+        taticflow_records: total de registros do Tatic Flow (a partir de 2025-01-01)
+        sparql_rows: linhas de cada resultado SELECT
+    """
+
+    def __init__(self, latency_ms: float = 0, stations: int = 40, vra_flights: int = 3000,
+                 taticflow_records: int = 20000, sparql_rows: int = 500):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000
+        self.httpd.lock = threading.Lock()
+        self.httpd.triples = 0
+        self.httpd.bytes_received = 0
+        self.httpd.config = {
+            'stations': stations,
+            'vra_flights': vra_flights,
+            'taticflow_records': taticflow_records,
+            'sparql_rows': sparql_rows,
+        }
+        self._thread = None
+
+    def url(self, path: str = '') -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def environ(self) -> dict:
+        """Variáveis de ambiente que apontam as extrações para este servidor"""
+        return {
+            'AIRDATA_ASOS_URL': self.url('/asos.py'),
+            'AIRDATA_ASOS_STATIONS_URL': self.url('/stations.geojson'),
+            'AIRDATA_VRA_URL': self.url('/vra'),
+            'AIRDATA_TATICFLOW_URL': self.url('/taticflow'),
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
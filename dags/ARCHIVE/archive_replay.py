@@ -0,0 +1,70 @@
+from airflow.sdk import Param, dag, task
+
+
+def replay_hooks(source: str) -> dict:
+    """Ganchos de recarga definidos pela própria fonte (importados só dentro da task)"""
+    if source == 'metar':
+        from METAR.metar_schema import REPLAY_HOOKS
+
+        return REPLAY_HOOKS
+    if source == 'vra':
+        from VRA.vra_dimensions import REPLAY_HOOKS
+
+        return REPLAY_HOOKS
+    return {}
+
+
+@dag(
+    dag_id='archive_replay',
+    schedule=None,
+    max_active_runs=1,
+    params={
+        'source': Param('vra', enum=['metar', 'vra', 'taticflow']),
+        'start_date': Param('2025-01-01', type='string', format='date'),
+        'end_date': Param('2025-01-31', type='string', format='date'),
+        # Apaga as linhas de cada dia antes de recarregá-lo (sem isso, só preenche lacunas)
+        'rebuild': Param(False, type='boolean'),
+    }
+)
+def archive_replay():
+    """
+    DAG (disparada manualmente) que reconstrói as tabelas airdata.* a partir do arquivo Parquet
+    das extrações, sem acessar as APIs externas. As tabelas devem existir (task create_table da
+    DAG de extração correspondente). Por padrão só preenche lacunas (linhas existentes são
+    mantidas); com `rebuild`, cada dia é apagado e recarregado do arquivo.
+    """
+
+    @task
+    def replay_archive(**context):
+        """Recarrega, dia a dia, as partições do arquivo da fonte no intervalo informado"""
+        from datetime import date
+        from COMMON.archive import archived_days, replay
+        from COMMON.db import get_connection
+
+        params = context['params']
+        source = params['source']
+        start_date = date.fromisoformat(params['start_date'])
+        end_date = date.fromisoformat(params['end_date'])
+        rebuild = params.get('rebuild', False)
+
+        hooks = replay_hooks(source)
+        day_dirs = archived_days(source, start_date, end_date)
+        print(f"[REPLAY] {len(day_dirs)} dias de '{source}' encontrados no arquivo entre {start_date} e {end_date}")
+
+        conn = get_connection()
+        total = 0
+        try:
+            for day_dir in day_dirs:
+                # Uma transação por dia: uma falha não desfaz os dias já recarregados
+                with conn, conn.cursor() as cur:
+                    loaded = replay(cur, source, day_dir, hooks, rebuild=rebuild)
+                print(f"[REPLAY] {day_dir}: {loaded} linhas")
+                total += loaded
+        finally:
+            conn.close()
+        print(f"[REPLAY] Total recarregado: {total}")
+
+    replay_archive()
+
+
+archive_replay()
@@ -0,0 +1 @@
+"""Módulos compartilhados entre as DAGs do AirData (não definem DAGs)."""
@@ -0,0 +1,151 @@
+"""
+Arquivo colunar (Parquet) das extrações brutas do AirData.
+
+Cada DAG de extração grava os DataFrames que carrega no banco em um dataset Parquet
+particionado por data (`<fonte>/year=/month=/day=`), no volume de dados do Airflow.
+A partir dele as tabelas airdata.* podem ser reconstruídas (ver `replay`) sem acessar
+as APIs externas.
+"""
+import os
+from datetime import date, timedelta
+
+ARCHIVE_DIR = os.environ.get("AIRDATA_ARCHIVE_DIR", "/opt/airflow/data/archive")
+
+# Como cada fonte é particionada no arquivo e recarregada nas tabelas airdata.* (as conversões
+# específicas de cada fonte são ganchos passados a `replay`, definidos no pacote da fonte)
+ARCHIVE_SOURCES = {
+    "metar": {
+        "table": "metar",
+        "date_column": "valid",
+        "partition_column": "valid",
+        "key_columns": ["station", "valid"],
+    },
+    "vra": {
+        "table": "vra_fact",
+        "date_column": "dt_referencia",
+        "partition_column": "dt_referencia",
+        "key_columns": ["dt_referencia", "sg_empresa_icao", "nr_voo", "sg_icao_origem", "dt_partida_prevista"],
+    },
+    "taticflow": {
+        "table": "taticflow",
+        "date_column": "createdat",
+        "partition_column": None,
+        "key_columns": ["flowid"],
+    },
+}
+
+
+def write_archive(df, source: str, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Grava um DataFrame no dataset Parquet da fonte, particionado por ano/mês/dia.
+
+    Args:
+        df: DataFrame tipado, com as mesmas colunas carregadas no banco
+        source: nome da fonte (chave de ARCHIVE_SOURCES)
+        archive_dir: diretório raiz do arquivo
+
+    Returns:
+        quantidade de linhas gravadas
+    """
+    import pandas as pd
+
+    if df is None or df.empty:
+        return 0
+
+    dates = pd.to_datetime(df[ARCHIVE_SOURCES[source]["date_column"]], errors="coerce")
+    partitioned = df.assign(year=dates.dt.year, month=dates.dt.month, day=dates.dt.day)
+    partitioned = partitioned.dropna(subset=["year", "month", "day"])
+    partitioned = partitioned.astype({"year": "int16", "month": "int8", "day": "int8"})
+
+    # Cada escrita gera arquivos novos (nome com uuid), sem sobrescrever os anteriores
+    partitioned.to_parquet(
+        os.path.join(archive_dir, source),
+        engine="pyarrow",
+        partition_cols=["year", "month", "day"],
+        index=False
+    )
+    print(f"[ARCHIVE] {len(partitioned)} linhas de '{source}' gravadas em {archive_dir}")
+    return len(partitioned)
+
+
+def archived_days(source: str, start_date: date, end_date: date, archive_dir: str = ARCHIVE_DIR) -> list[str]:
+    """Lista os diretórios de partição (um por dia) existentes no arquivo para o intervalo"""
+    day_dirs = []
+    day = start_date
+    while day <= end_date:
+        day_dir = os.path.join(archive_dir, source, f"year={day.year}", f"month={day.month}", f"day={day.day}")
+        if os.path.isdir(day_dir):
+            day_dirs.append(day_dir)
+        day += timedelta(days=1)
+    return day_dirs
+
+
+def read_archive_day(day_dir: str):
+    """Lê todos os arquivos Parquet de uma partição diária"""
+    import pandas as pd
+
+    # Arquivos gravados em execuções diferentes podem ter tipos inferidos diferentes para
+    # colunas totalmente nulas, por isso são lidos um a um e concatenados
+    files = sorted(name for name in os.listdir(day_dir) if name.endswith(".parquet"))
+    return pd.concat(
+        [pd.read_parquet(os.path.join(day_dir, name), engine="pyarrow") for name in files],
+        ignore_index=True
+    )
+
+
+def replay(cur, source: str, day_dir: str, hooks: dict | None = None, rebuild: bool = False) -> int:
+    """
+    Recarrega uma partição diária do arquivo na tabela airdata.<fonte> usando COPY.
+
+    Sem `rebuild`, só preenche lacunas: linhas já existentes na tabela (mesma chave) são mantidas.
+    Com `rebuild`, as linhas do dia na tabela são apagadas antes da carga (na mesma transação) e o
+    dia fica igual ao arquivo.
+
+    Args:
+        hooks: ganchos definidos pela fonte (ex: VRA.vra_dimensions.REPLAY_HOOKS): 'schema' ajusta
+            os tipos do DataFrame lido; 'fact' converte o formato arquivado no da tabela (cursor,
+            DataFrame), com as chaves 'fact_key_columns'; 'on_failure' é chamado se a recarga falhar
+
+    Returns:
+        quantidade de linhas enviadas ao banco
+    """
+    import pandas as pd
+    from COMMON.db import insert_dataframe, mark_touched_days
+    from COMMON.partitioning import load_partitioned
+
+    config = ARCHIVE_SOURCES[source]
+    hooks = hooks or {}
+    df = read_archive_day(day_dir).drop_duplicates(subset=config["key_columns"])
+    if hooks.get("schema"):
+        df = hooks["schema"](df)
+    key_columns = config["key_columns"]
+    try:
+        if rebuild:
+            date_column = config["date_column"]
+            for day in sorted(pd.to_datetime(df[date_column]).dropna().dt.date.unique()):
+                cur.execute(
+                    f"DELETE FROM airdata.{config['table']} WHERE {date_column} >= %s AND {date_column} < %s",
+                    (day, day + timedelta(days=1))
+                )
+                print(f"[REPLAY] {cur.rowcount} linhas de {day} removidas de airdata.{config['table']}")
+        if hooks.get("fact"):
+            df = hooks["fact"](cur, df)
+            key_columns = hooks["fact_key_columns"]
+
+        if config["partition_column"]:
+            total = load_partitioned(
+                cur,
+                df,
+                table=config["table"],
+                partition_column=config["partition_column"],
+                key_columns=key_columns
+            )
+        else:
+            total = insert_dataframe(cur, df, f"airdata.{config['table']}")
+    except Exception:
+        if hooks.get("on_failure"):
+            hooks["on_failure"]()
+        raise
+
+    mark_touched_days(cur, source, pd.to_datetime(df[config["date_column"]]).dropna().dt.date)
+    return total
@@ -0,0 +1,282 @@
+"""
+Conectores de fonte e fábrica de DAGs de extração.
+
+Uma fonte externa é descrita por uma subclasse de SourceConnector: o que baixar a partir da marca
+d'água (`items`/`fetch`), como converter a resposta em DataFrame (`parse`), o esquema tipado das
+colunas (`schema`), a chave natural (`key_columns`) e a marca d'água após cada item. O restante
+(criação da tabela e do estado, pipeline de download/conversão/carga, validação e quarentena,
+arquivo Parquet, carga via COPY, partições e marca d'água) é o mesmo para todas as fontes e fica aqui.
+
+Exemplo (arquivo de DAG):
+
+    class MinhaFonte(SourceConnector):
+        name = 'minha_fonte'
+        ...
+
+    minha_fonte_extraction = build_extraction_dag(MinhaFonte(), dag_id='minha_fonte_extraction', schedule='@daily')
+"""
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+
+class Column(NamedTuple):
+    """Tipo de uma coluna no esquema do conector ('text', 'int', 'float', 'timestamp' ou 'date')"""
+    type: str
+    format: str | None = None
+
+
+def apply_schema(df, schema: dict):
+    """Converte as colunas presentes no DataFrame para os tipos do esquema (valores inválidos viram nulos)"""
+    import pandas as pd
+
+    for column, spec in schema.items():
+        if column not in df.columns:
+            continue
+        if spec.type in ('timestamp', 'date'):
+            df[column] = pd.to_datetime(df[column], format=spec.format, errors='coerce')
+        elif spec.type == 'int':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        elif spec.type == 'float':
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        elif spec.type == 'text':
+            df[column] = df[column].astype('string')
+        else:
+            raise ValueError(f"Tipo desconhecido para a coluna '{column}': {spec.type}")
+    return df
+
+
+class SourceConnector(ABC):
+    """
+    Fonte de dados de uma DAG de extração. `items`, `fetch`, `parse` e `item_watermark` são
+    abstratos: um conector sem algum deles falha ao ser instanciado (no parsing do arquivo da DAG).
+
+    Atributos de classe:
+        name: nome da fonte (chave da marca d'água em airdata.ingestion_state e do arquivo Parquet)
+        table: tabela de destino (schema airdata)
+        table_sql: DDL da tabela e dos índices
+        schema: esquema tipado das colunas ({coluna: Column})
+        key_columns: chave natural (linhas repetidas são ignoradas)
+        partition_column: coluna de particionamento mensal (None para tabela não particionada)
+        rules: regras de validação do lote (linhas reprovadas vão para airdata.quarantine)
+        watermark_column: coluna usada para inicializar a marca d'água a partir da tabela
+        initial_watermark: marca d'água quando a tabela está vazia
+        fetch_workers / parse_workers: threads dos estágios de download e conversão
+    """
+    name: str = None
+    table: str = None
+    table_sql: str = ''
+    schema: dict = {}
+    key_columns: list = []
+    partition_column: str | None = None
+    rules: list = []
+    watermark_column: str = None
+    initial_watermark: str = '2025-07-31'
+    fetch_workers: int = 4
+    parse_workers: int = 2
+
+    @abstractmethod
+    def items(self, watermark: str):
+        """Itens a baixar a partir da marca d'água (dias, offsets de páginas...)"""
+
+    @abstractmethod
+    def fetch(self, item):
+        """Baixa um item; retorna a resposta, None (sem dados) ou lança StopPipeline (fim da origem)"""
+
+    @abstractmethod
+    def parse(self, item, payload):
+        """Converte a resposta de um item em DataFrame (None ou vazio se não houver dados)"""
+
+    @abstractmethod
+    def item_watermark(self, item, df) -> str:
+        """Marca d'água depois que o item foi carregado"""
+
+    def format_watermark(self, value) -> str:
+        """Converte o valor de `watermark_column` (MAX na tabela) em marca d'água"""
+        return value.isoformat()
+
+    def create_sql(self) -> str:
+        """SQL da task create_table: estado de ingestão, funções de partição e a tabela da fonte"""
+        from COMMON.db import INGESTION_STATE_SQL
+        from COMMON.partitioning import PARTITION_FUNCTIONS_SQL
+        from COMMON.validation import QUARANTINE_SQL
+
+        sql = INGESTION_STATE_SQL + QUARANTINE_SQL + self.table_sql
+        if self.partition_column:
+            sql = PARTITION_FUNCTIONS_SQL + sql + f"""
+            -- Partições do mês corrente e do próximo
+            SELECT airdata.ensure_monthly_partitions(
+                '{self.table}', CURRENT_DATE, (CURRENT_DATE + INTERVAL '1 month')::DATE
+            );
+            """
+        return sql
+
+    def get_watermark(self, cur) -> str:
+        """Marca d'água registrada; sem estado, usa (uma única vez) o MAX de `watermark_column` e o registra"""
+        from COMMON.db import get_watermark, set_watermark
+
+        watermark = get_watermark(cur, self.name)
+        if watermark is None:
+            cur.execute(f"SELECT MAX({self.watermark_column}) FROM airdata.{self.table};")
+            last_value = cur.fetchone()[0]
+            if last_value is not None:
+                watermark = self.format_watermark(last_value)
+                set_watermark(cur, self.name, watermark)
+        return watermark
+
+    def load(self, cur, item, df) -> int:
+        """Carrega o DataFrame (linhas aprovadas) de um item (na transação do cursor)"""
+        from COMMON.db import insert_dataframe, mark_touched_days
+        from COMMON.partitioning import load_partitioned
+
+        if self.partition_column:
+            inserted = load_partitioned(
+                cur,
+                df,
+                table=self.table,
+                partition_column=self.partition_column,
+                key_columns=self.key_columns
+            )
+            mark_touched_days(cur, self.name, df[self.partition_column].dropna().dt.date.unique())
+        else:
+            inserted = insert_dataframe(cur, df, f"airdata.{self.table}")
+        return inserted
+
+    def run(self, watermark: str, metrics=None) -> int:
+        """
+        Extrai e carrega todos os itens a partir da marca d'água.
+
+        Download, conversão e validação rodam em paralelo; a carga segue a ordem dos itens, com uma
+        transação por item (dados + quarentena + marca d'água), então uma execução que falhar é
+        retomada do último item carregado.
+
+        Args:
+            watermark: marca d'água a partir da qual os itens são extraídos
+            metrics: COMMON.metrics.Metrics onde registrar os estágios (padrão: uma nova, '<nome>_extraction')
+
+        Returns:
+            quantidade de linhas inseridas
+        """
+        from datetime import date
+        from COMMON.archive import write_archive
+        from COMMON.db import get_connection, set_watermark
+        from COMMON.metrics import Metrics
+        from COMMON.partitioning import ensure_monthly_partitions, next_month
+        from COMMON.pipeline import Pipeline, Stage, StopPipeline
+        from COMMON.validation import Validator, quarantine
+
+        conn = get_connection()
+        validator = Validator(self.name, self.rules)
+        # Tempo/linhas/bytes de cada estágio do pipeline e das etapas dentro deles
+        metrics = metrics or Metrics(f"{self.name}_extraction")
+        total = 0
+
+        def parse(fetched):
+            item, payload = fetched
+            with metrics.stage("parse.convert") as record:
+                df = self.parse(item, payload)
+                record.rows = 0 if df is None else len(df)
+            if df is None or df.empty:
+                print(f"[{self.name.upper()}] Nenhum dado para {item}.")
+                return None
+            with metrics.stage("parse.schema", rows=len(df)):
+                df = apply_schema(df, self.schema)
+            # A marca d'água considera também as linhas reprovadas (elas não são baixadas de novo)
+            watermark = self.item_watermark(item, df)
+            with metrics.stage("parse.validation", rows=len(df)):
+                result = validator.validate(df)
+            with metrics.stage("parse.archive", rows=len(result.valid)):
+                write_archive(result.valid, self.name)
+            return item, result, watermark
+
+        def load(parsed):
+            nonlocal total
+            item, result, watermark = parsed
+            with conn, conn.cursor() as cur:
+                with metrics.stage("load.quarantine", rows=len(result.rejected)):
+                    quarantine(cur, self.name, result.rejected)
+                with metrics.stage("load.db_write", rows=len(result.valid)):
+                    inserted = self.load(cur, item, result.valid)
+                set_watermark(cur, self.name, watermark)
+            print(f"[{self.name.upper()}] Inseridos {inserted} registros ({item}).")
+            total += inserted
+            return item
+
+        def fetch(item):
+            try:
+                payload = self.fetch(item)
+            except StopPipeline as e:
+                # A última página pode trazer dados: segue adiante no mesmo formato (item, resposta)
+                raise StopPipeline(None if e.result is None else (item, e.result))
+            return None if payload is None else (item, payload)
+
+        try:
+            Pipeline([
+                Stage('download', fetch, workers=self.fetch_workers),
+                Stage('parse', parse, workers=self.parse_workers),
+                Stage('load', load, ordered=True),
+            ], metrics=metrics).run(self.items(watermark))
+
+            if self.partition_column:
+                # Mantém sempre a partição do mês seguinte criada para as próximas cargas
+                with conn, conn.cursor() as cur:
+                    ensure_monthly_partitions(cur, self.table, date.today(), next_month(date.today()))
+        finally:
+            conn.close()
+        print(f"[{self.name.upper()}] Atualização concluída. Total inserido: {total}")
+        metrics.publish()
+        return total
+
+
+def build_extraction_dag(connector: SourceConnector, dag_id: str, schedule: str, **dag_kwargs):
+    """
+    Gera a DAG de extração de um conector: create_table >> get_last_update >> update_data.
+
+    Args:
+        connector: conector da fonte
+        dag_id: ID da DAG
+        schedule: agendamento da DAG
+        dag_kwargs: demais argumentos do @dag (ex: tags)
+
+    Returns:
+        a DAG gerada
+    """
+    from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
+    from airflow.sdk import dag, task
+
+    dag_kwargs.setdefault('max_active_runs', 1)
+
+    @dag(dag_id=dag_id, schedule=schedule, doc_md=connector.__doc__, **dag_kwargs)
+    def extraction():
+        # Task para criar a tabela da fonte (e o estado de ingestão) se não existir
+        create_table = SQLExecuteQueryOperator(
+            task_id='create_table',
+            conn_id='postgres',
+            sql=connector.create_sql()
+        )
+
+        @task
+        def get_last_update() -> str:
+            """Task para obter a marca d'água da fonte (airdata.ingestion_state)"""
+            from COMMON.db import get_connection
+
+            conn = get_connection()
+            with conn, conn.cursor() as cur:
+                watermark = connector.get_watermark(cur)
+            conn.close()
+
+            # Verifica se há dados na tabela
+            if watermark is None:
+                print(f"Nenhum dado encontrado — iniciando de {connector.initial_watermark}")
+                return connector.initial_watermark
+            print(f"Última atualização: {watermark}")
+            return watermark
+
+        @task
+        def update_data(watermark: str) -> int:
+            """Task para extrair e carregar os dados da fonte a partir da marca d'água"""
+            return connector.run(watermark)
+
+        last_update = get_last_update()
+        create_table >> last_update >> update_data(last_update)
+
+    return extraction()
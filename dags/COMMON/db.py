@@ -0,0 +1,212 @@
+"""Utilitários de acesso ao banco de dados do AirData (Postgres)."""
+import configparser
+import os
+
+DB_CONFIG_PATH = os.environ.get("AIRDATA_DB_CONFIG", "/opt/airflow/config/db.cfg")
+
+
+def get_db_config(path: str = DB_CONFIG_PATH) -> dict:
+    """Lê as configurações de conexão com o banco de dados a partir do arquivo db.cfg"""
+    config = configparser.ConfigParser()
+    config.read(path)
+    return {
+        "host": config["database"]["host"],
+        "port": config["database"]["port"],
+        "dbname": config["database"]["dbname"],
+        "user": config["database"]["user"],
+        "password": config["database"]["password"],
+    }
+
+
+def get_connection():
+    """Abre uma conexão psycopg2 com o banco de dados do AirData"""
+    import psycopg2
+
+    return psycopg2.connect(**get_db_config())
+
+
+def get_engine():
+    """Cria a engine SQLAlchemy de conexão com o banco de dados do AirData"""
+    from sqlalchemy import create_engine
+
+    db_config = get_db_config()
+    return create_engine(
+        f"postgresql+psycopg2://{db_config['user']}:{db_config['password']}@"
+        f"{db_config['host']}:{db_config['port']}/{db_config['dbname']}"
+    )
+
+
+def copy_dataframe(cur, df, table: str) -> int:
+    """
+    Carrega um DataFrame em uma tabela usando COPY ... FROM STDIN (CSV).
+
+    Args:
+        cur: cursor psycopg2 (a transação fica a cargo de quem chama)
+        df: DataFrame cujas colunas têm o mesmo nome das colunas da tabela
+        table: nome qualificado da tabela de destino (ex: airdata.metar)
+
+    Returns:
+        quantidade de linhas copiadas
+    """
+    import io
+
+    if df.empty:
+        return 0
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{column.lower()}"' for column in df.columns)
+    cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(df)
+
+
+# Estado de ingestão por fonte: guarda a marca d'água (última data/instante carregado) de cada
+# extração, para que a consulta de "última atualização" seja uma busca por chave e não um agregado.
+# Os dias afetados por cada carga ficam em ingestion_touched_days, para que as DAGs de
+# processamento atualizem apenas esses dias, lidos pelo id da transação da carga (load_txid) e não
+# pelo horário (uma transação que demora a fazer commit teria um horário já ultrapassado pela
+# marca d'água de quem lê). Extrações sem ordem natural (ex: lotes do METAR)
+# registram os itens já carregados em ingestion_checkpoint, para retomar uma execução que falhou.
+INGESTION_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS airdata.ingestion_state (
+    source TEXT PRIMARY KEY,
+    watermark TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS airdata.ingestion_touched_days (
+    source TEXT NOT NULL,
+    day DATE NOT NULL,
+    loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    load_txid BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, day)
+);
+ALTER TABLE airdata.ingestion_touched_days ADD COLUMN IF NOT EXISTS load_txid BIGINT NOT NULL DEFAULT 0;
+DROP INDEX IF EXISTS airdata.ingestion_touched_days_loaded_at_idx;
+CREATE INDEX IF NOT EXISTS ingestion_touched_days_load_txid_idx ON airdata.ingestion_touched_days (load_txid);
+
+CREATE TABLE IF NOT EXISTS airdata.ingestion_checkpoint (
+    source TEXT NOT NULL,
+    run_key TEXT NOT NULL,
+    item TEXT NOT NULL,
+    committed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, run_key, item)
+);
+"""
+
+
+def get_watermark(cur, source: str) -> str | None:
+    """Retorna a marca d'água registrada para a fonte (ou None se ainda não houver)"""
+    cur.execute("SELECT watermark FROM airdata.ingestion_state WHERE source = %s", (source,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cur, source: str, watermark: str):
+    """Registra a marca d'água da fonte (deve ser chamada na mesma transação da carga)"""
+    cur.execute(
+        """
+        INSERT INTO airdata.ingestion_state (source, watermark, updated_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (source) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = EXCLUDED.updated_at
+        """,
+        (source, watermark)
+    )
+
+
+def mark_touched_days(cur, source: str, days):
+    """Registra os dias afetados por uma carga da fonte (na mesma transação da carga)"""
+    days = sorted(set(days))
+    if not days:
+        return
+    cur.execute(
+        """
+        INSERT INTO airdata.ingestion_touched_days (source, day, loaded_at, load_txid)
+        SELECT %s, UNNEST(%s::DATE[]), clock_timestamp(), txid_current()
+        ON CONFLICT (source, day) DO UPDATE SET loaded_at = EXCLUDED.loaded_at, load_txid = EXCLUDED.load_txid
+        """,
+        (source, days)
+    )
+
+
+def insert_dataframe(cur, df, table: str) -> int:
+    """
+    Insere um DataFrame em uma tabela ignorando linhas que violem chaves únicas.
+
+    Os dados são copiados (COPY) para uma tabela temporária e inseridos com
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    Returns:
+        quantidade de linhas efetivamente inseridas
+    """
+    if df.empty:
+        return 0
+
+    stage = f"{table.split('.')[-1]}_stage"
+    cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS)")
+    copy_dataframe(cur, df, stage)
+    columns = ", ".join(f'"{column.lower()}"' for column in df.columns)
+    cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} ON CONFLICT DO NOTHING")
+    inserted = cur.rowcount
+    cur.execute(f"DROP TABLE {stage}")
+    return inserted
+
+
+def upsert_dataframe(cur, df, table: str, key_columns: list[str], touch_column: str | None = None) -> int:
+    """
+    Insere ou atualiza (pela chave `key_columns`) as linhas de um DataFrame em uma tabela.
+
+    Os dados são copiados (COPY) para uma tabela temporária e aplicados com
+    INSERT ... SELECT ... ON CONFLICT (chave) DO UPDATE. Com `touch_column` (ex: updated_at), essa
+    coluna recebe CURRENT_TIMESTAMP nas linhas atualizadas (nas novas vale o DEFAULT da tabela).
+
+    Returns:
+        quantidade de linhas inseridas ou atualizadas
+    """
+    if df.empty:
+        return 0
+
+    stage = f"{table.split('.')[-1]}_stage"
+    cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS)")
+    copy_dataframe(cur, df, stage)
+    columns = [f'"{column.lower()}"' for column in df.columns]
+    keys = ", ".join(f'"{column.lower()}"' for column in key_columns)
+    updates = [f"{column} = EXCLUDED.{column}" for column in columns
+               if column.strip('"') not in key_columns and column.strip('"') != touch_column]
+    if updates and touch_column:
+        updates.append(f'"{touch_column}" = CURRENT_TIMESTAMP')
+    updates = ", ".join(updates)
+    cur.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {stage} "
+        f"ON CONFLICT ({keys}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+    )
+    upserted = cur.rowcount
+    cur.execute(f"DROP TABLE {stage}")
+    return upserted
+
+
+def get_checkpoint(cur, source: str, run_key: str) -> set:
+    """Itens já carregados de uma execução (identificada por run_key) da fonte"""
+    cur.execute(
+        "SELECT item FROM airdata.ingestion_checkpoint WHERE source = %s AND run_key = %s",
+        (source, run_key)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def add_checkpoint(cur, source: str, run_key: str, item: str):
+    """Registra um item como carregado (deve ser chamada na mesma transação da carga do item)"""
+    cur.execute(
+        """
+        INSERT INTO airdata.ingestion_checkpoint (source, run_key, item) VALUES (%s, %s, %s)
+        ON CONFLICT DO NOTHING
+        """,
+        (source, run_key, item)
+    )
+
+
+def clear_checkpoint(cur, source: str, run_key: str):
+    """Remove o checkpoint de uma execução concluída"""
+    cur.execute("DELETE FROM airdata.ingestion_checkpoint WHERE source = %s AND run_key = %s", (source, run_key))
@@ -0,0 +1,230 @@
+"""
+Cache HTTP em disco compartilhado pelas extrações do AirData.
+
+As respostas ficam em CACHE_DIR (um arquivo de corpo e um de metadados por URL). Cada endpoint
+tem um tempo de validade (TTL); vencido o TTL, a resposta é revalidada com requisição condicional
+(If-None-Match / If-Modified-Since) e só é baixada de novo se tiver mudado.
+
+O cache é limitado a MAX_CACHE_BYTES: no máximo uma vez a cada PURGE_INTERVAL, uma gravação
+verifica o tamanho total e remove as respostas usadas há mais tempo (LRU), inclusive as FOREVER,
+que são baixadas de novo se forem pedidas outra vez.
+
+Com a variável de ambiente AIRDATA_HTTP_OFFLINE=1 nenhuma requisição é feita: as respostas vêm
+apenas do cache (mesmo vencidas) e URLs ausentes geram CacheMissError.
+"""
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = os.environ.get("AIRDATA_HTTP_CACHE_DIR", "/opt/airflow/data/http_cache")
+OFFLINE = os.environ.get("AIRDATA_HTTP_OFFLINE", "0") == "1"
+
+# Tamanho máximo do cache em disco e intervalo mínimo (em segundos) entre duas verificações
+MAX_CACHE_BYTES = int(os.environ.get("AIRDATA_HTTP_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+PURGE_INTERVAL = 60 * 60
+
+# A resposta nunca expira (ex: dias históricos já consolidados)
+FOREVER = float("inf")
+
+# TTL padrão (em segundos) por prefixo de URL; URLs sem prefixo conhecido são sempre revalidadas
+ENDPOINT_TTLS = {
+    "https://mesonet.agron.iastate.edu/geojson/network/": 24 * 60 * 60,
+    "https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py": 0,
+    "https://sas.anac.gov.br/sas/vra_api/": 0,
+    "https://davidmegginson.github.io/ourairports-data/": 24 * 60 * 60,
+}
+
+
+class CacheMissError(Exception):
+    """URL não encontrada no cache em modo offline"""
+
+
+class CachedResponse:
+    """Resposta HTTP (da rede ou do cache) com a mesma interface básica de requests.Response"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: dict, from_cache: bool):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def default_ttl(url: str) -> float:
+    """TTL padrão do endpoint da URL"""
+    for prefix, ttl in ENDPOINT_TTLS.items():
+        if url.startswith(prefix):
+            return ttl
+    return 0
+
+
+def _paths(url: str, cache_dir: str) -> tuple[str, str]:
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(cache_dir, key[:2], key)
+    return f"{base}.body", f"{base}.json"
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_cached(url: str, cache_dir: str) -> tuple[dict | None, bytes | None]:
+    body_path, meta_path = _paths(url, cache_dir)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        with open(body_path, "rb") as file:
+            body = file.read()
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, None
+    return meta, body
+
+
+def _touch(url: str, cache_dir: str):
+    """Marca a resposta como usada agora (a data de modificação dos metadados ordena o LRU)"""
+    try:
+        os.utime(_paths(url, cache_dir)[1])
+    except OSError:
+        pass
+
+
+def _store(url: str, meta: dict, body: bytes | None, cache_dir: str):
+    body_path, meta_path = _paths(url, cache_dir)
+    if body is not None:
+        _write_atomic(body_path, body)
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+    if body is not None:
+        _maybe_purge(cache_dir)
+
+
+def _maybe_purge(cache_dir: str):
+    """Executa purge se a última verificação (marcador no diretório do cache) tiver mais de PURGE_INTERVAL"""
+    marker = os.path.join(cache_dir, ".last_purge")
+    try:
+        if time.time() - os.path.getmtime(marker) < PURGE_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    _write_atomic(marker, b"")
+    purge(cache_dir=cache_dir)
+
+
+def purge(max_bytes: int = MAX_CACHE_BYTES, cache_dir: str = CACHE_DIR) -> int:
+    """
+    Remove as respostas usadas há mais tempo até o cache caber em `max_bytes`.
+
+    Returns:
+        quantidade de respostas removidas
+    """
+    entries = []
+    total = 0
+    for dir_path, _, file_names in os.walk(cache_dir):
+        for file_name in file_names:
+            if not file_name.endswith(".json"):
+                continue
+            meta_path = os.path.join(dir_path, file_name)
+            body_path = f"{meta_path[:-len('.json')]}.body"
+            try:
+                used_at = os.path.getmtime(meta_path)
+                size = os.path.getsize(meta_path) + (os.path.getsize(body_path) if os.path.exists(body_path) else 0)
+            except FileNotFoundError:
+                continue # removida por outro processo
+            entries.append((used_at, size, meta_path, body_path))
+            total += size
+
+    removed = 0
+    for _, size, meta_path, body_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        # Metadados primeiro: sem eles a resposta já é tratada como ausente
+        for path in (meta_path, body_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    if removed:
+        print(f"[HTTP_CACHE] {removed} respostas antigas removidas ({total / 1024 ** 2:.0f} MB em cache)")
+    return removed
+
+
+def invalidate(url: str, cache_dir: str = CACHE_DIR):
+    """Remove a URL do cache (ex: resposta provisória que não deve ser reaproveitada)"""
+    for path in _paths(url, cache_dir):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def cached_get(url: str, ttl: float | None = None, timeout: float = 60, cache_dir: str = CACHE_DIR,
+               verbose: bool = True, client=None) -> CachedResponse:
+    """
+    GET com cache em disco e revalidação condicional.
+
+    Args:
+        url: URL requisitada
+        ttl: validade da resposta em segundos (None usa o TTL do endpoint; FOREVER nunca expira)
+        timeout: timeout da requisição em segundos
+        cache_dir: diretório do cache
+        client: HttpClient usado nas requisições (padrão: cliente compartilhado do processo)
+
+    Returns:
+        CachedResponse (respostas diferentes de 200 não são armazenadas)
+    """
+    from COMMON.http_client import get_default_client
+
+    if ttl is None:
+        ttl = default_ttl(url)
+
+    meta, body = _read_cached(url, cache_dir)
+    if meta is not None:
+        age = time.time() - meta["fetched_at"]
+        if age < ttl or OFFLINE:
+            if verbose:
+                print(f"[HTTP_CACHE] Resposta em cache ({age:.0f}s): {url}")
+            _touch(url, cache_dir)
+            return CachedResponse(url, meta["status_code"], body, meta["headers"], from_cache=True)
+    elif OFFLINE:
+        raise CacheMissError(f"URL não encontrada no cache (modo offline): {url}")
+
+    headers = {}
+    if meta is not None:
+        if meta["headers"].get("ETag"):
+            headers["If-None-Match"] = meta["headers"]["ETag"]
+        if meta["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+    response = (client or get_default_client()).get(url, headers=headers, timeout=timeout)
+    if verbose:
+        print(f"[HTTP_CACHE] {response.status_code} para {url}")
+
+    if response.status_code == 304 and meta is not None:
+        meta["fetched_at"] = time.time()
+        _store(url, meta, None, cache_dir)
+        return CachedResponse(url, meta["status_code"], body, meta["headers"], from_cache=True)
+
+    kept_headers = {
+        name: response.headers[name]
+        for name in ("ETag", "Last-Modified", "Content-Type", "Retry-After")
+        if name in response.headers
+    }
+    if response.status_code == 200:
+        _store(
+            url,
+            {"url": url, "status_code": 200, "headers": kept_headers, "fetched_at": time.time()},
+            response.content,
+            cache_dir
+        )
+    return CachedResponse(url, response.status_code, response.content, kept_headers, from_cache=False)
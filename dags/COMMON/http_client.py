@@ -0,0 +1,162 @@
+"""
+Cliente HTTP resiliente compartilhado pelas extrações do AirData.
+
+Todas as requisições têm timeout, são repetidas com recuo exponencial com jitter em falhas
+transitórias (erros de conexão, timeouts e status 429/5xx) e passam por um circuit breaker por
+host: depois de várias falhas seguidas o host é considerado fora do ar e as chamadas falham
+imediatamente (CircuitOpenError) até o fim do período de espera.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_TIMEOUT = 60
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HttpError(Exception):
+    """Requisição sem sucesso após todas as tentativas"""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(HttpError):
+    """Circuit breaker aberto: o host falhou repetidamente e as chamadas estão suspensas"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples: abre após `failure_threshold` falhas seguidas por `reset_timeout` segundos.
+    Depois da espera (meio-aberto) passa uma única requisição de prova; as demais falham imediatamente
+    até ela fechar o circuito (sucesso) ou reabri-lo (falha).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self, host: str):
+        """Falha imediatamente se o circuito estiver aberto ou se já houver uma prova em andamento"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit breaker aberto para {host}: muitas falhas seguidas")
+            # Prova sem resposta por mais de reset_timeout (ex: exceção inesperada) libera uma nova
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit breaker meio-aberto para {host}: aguardando a requisição de prova")
+            self._probe_started_at = now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probe_started_at = None
+
+
+# Um circuit breaker por host, compartilhado por todos os clientes do processo
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 120.0) -> float:
+    """Recuo exponencial com jitter completo para a tentativa `attempt` (a partir de 1)"""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class HttpClient:
+    """
+    Cliente HTTP com timeout, repetição com recuo exponencial e circuit breaker por host.
+
+    Args:
+        timeout: timeout (em segundos) de cada requisição
+        max_attempts: quantidade máxima de tentativas por requisição
+        retry_status: status HTTP considerados transitórios (repetidos)
+        backoff_base: base (em segundos) do recuo exponencial
+        backoff_max: recuo máximo (em segundos) entre tentativas
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_attempts: int = 5, retry_status: tuple = RETRY_STATUS,
+                 backoff_base: float = 1.0, backoff_max: float = 120.0):
+        import requests
+
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_status = retry_status
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+
+    def get(self, url: str, headers: dict | None = None, timeout: float | None = None):
+        """
+        GET com repetição e circuit breaker.
+
+        Returns:
+            requests.Response (status fora de `retry_status` são devolvidos a quem chamou)
+
+        Raises:
+            HttpError: falhas transitórias em todas as tentativas
+            CircuitOpenError: host com circuito aberto
+        """
+        import requests
+
+        host = urlparse(url).netloc
+        breaker = get_breaker(host)
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            breaker.before_call(host)
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                breaker.record_failure()
+                last_error = HttpError(f"Falha de conexão com {host}: {e}")
+                retry_after = None
+            else:
+                if response.status_code not in self.retry_status:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                last_error = HttpError(f"Erro {response.status_code} em {url}", response.status_code)
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_attempts:
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+                else:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                print(f"[HTTP] Tentativa {attempt}/{self.max_attempts} falhou ({last_error}). Nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+        raise last_error
+
+
+_default_client = None
+
+
+def get_default_client() -> HttpClient:
+    """Cliente padrão do processo (reaproveita a sessão e as conexões)"""
+    global _default_client
+    if _default_client is None:
+        _default_client = HttpClient()
+    return _default_client
@@ -0,0 +1,175 @@
+"""
+Instrumentação das tasks: tempo, linhas, bytes e memória por estágio.
+
+Uso:
+
+    metrics = Metrics('vra_extraction')
+
+    with metrics.stage('download') as record:      # context manager
+        content = baixar()
+        record.bytes = len(content)
+
+    Pipeline([...], metrics=metrics).run(items)    # estágios do pipeline medidos automaticamente
+
+    metrics.publish()
+
+`publish` imprime o resumo no log, envia as métricas pelo Stats do Airflow (StatsD ou
+OpenTelemetry, conforme a configuração [metrics] do Airflow) com o prefixo `airdata.<nome>.<estágio>`
+e grava o resumo no XCom da task (chave 'metrics').
+
+A memória vem de getrusage, que só informa o pico (ru_maxrss) do processo inteiro. Por estágio é
+registrado quanto as execuções do estágio elevaram esse pico (rss_growth_mb): com estágios em
+paralelo, o crescimento fica com o estágio que estava rodando quando o pico subiu. O resumo traz o
+pico do processo e o do maior processo filho já encerrado (ex: pool de parsing do METAR).
+"""
+import math
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+XCOM_KEY = 'metrics'
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Pico de memória residente (RSS) do processo (ou, com RUSAGE_CHILDREN, do maior filho encerrado), em MB"""
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentil `q` (0-100) pelo método do posto mais próximo"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(obj) -> tuple[int, int]:
+    """
+    Estima (linhas, bytes) de um resultado de estágio: DataFrames (linhas e memória), textos e
+    respostas HTTP (bytes), listas (linhas) e tuplas (soma dos elementos).
+    """
+    if obj is None:
+        return 0, 0
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):
+        return len(obj), int(obj.memory_usage(index=False).sum())
+    if isinstance(obj, (str, bytes, bytearray)):
+        return 0, len(obj)
+    if isinstance(getattr(obj, 'content', None), (bytes, bytearray)):
+        return 0, len(obj.content)
+    if isinstance(obj, list):
+        return len(obj), 0
+    if isinstance(obj, tuple):
+        rows, nbytes = 0, 0
+        for item in obj:
+            item_rows, item_bytes = measure(item)
+            rows += item_rows
+            nbytes += item_bytes
+        return rows, nbytes
+    return 0, 0
+
+
+class StageRecord:
+    """Linhas e bytes de uma execução de estágio (preenchidos por quem chama dentro do `with`)"""
+
+    def __init__(self, rows: int = 0, bytes: int = 0):
+        self.rows = rows
+        self.bytes = bytes
+
+
+class Metrics:
+    """Métricas por estágio de uma task (pode ser usada por várias threads)"""
+
+    def __init__(self, name: str, verbose: bool = True):
+        self.name = name
+        self.verbose = verbose
+        self.stages = {}
+        # Duração de cada execução por estágio (percentis de latência)
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+    def record(self, stage: str, seconds: float, rows: int = 0, bytes: int = 0, rss_growth_mb: float = 0.0):
+        """Soma uma execução ao estágio (com o quanto ela elevou o pico de RSS do processo)"""
+        with self._lock:
+            stats = self.stages.setdefault(
+                stage, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'rss_growth_mb': 0.0}
+            )
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['rows'] += rows
+            stats['bytes'] += bytes
+            stats['rss_growth_mb'] = round(stats['rss_growth_mb'] + rss_growth_mb, 1)
+            self._durations.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def stage(self, stage: str, rows: int = 0, bytes: int = 0):
+        """Mede o bloco como uma execução do estágio; linhas/bytes podem ser ajustados no registro retornado"""
+        record = StageRecord(rows, bytes)
+        rss_before = peak_rss_mb()
+        started_at = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.record(stage, time.perf_counter() - started_at, record.rows, record.bytes, peak_rss_mb() - rss_before)
+
+    def summary(self) -> dict:
+        """Resumo serializável (XCom): estágios (com percentis de latência), tempo total e picos de memória"""
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self.stages.items()}
+            for name, durations in self._durations.items():
+                for q in (50, 95, 99):
+                    stages[name][f'p{q}_ms'] = round(percentile(durations, q) * 1000, 3)
+        return {
+            'name': self.name,
+            'wall_seconds': round(time.monotonic() - self._started_at, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'children_peak_rss_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': stages,
+        }
+
+    def publish(self) -> dict:
+        """Imprime o resumo e o publica no Stats do Airflow e no XCom da task em execução"""
+        summary = self.summary()
+        if self.verbose:
+            print(f"[METRICS] {self.name}: {summary['wall_seconds']:.1f}s, pico de memória do processo "
+                  f"{summary['peak_rss_mb']:.0f} MB (filhos {summary['children_peak_rss_mb']:.0f} MB)")
+            for name, stats in summary['stages'].items():
+                throughput = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+                print(f"[METRICS]   {name:<16} {stats['seconds']:9.2f}s {stats['calls']:6d} chamadas "
+                      f"{stats['rows']:10d} linhas {stats['bytes'] / 1024 ** 2:9.1f} MB {throughput:10.0f} linhas/s "
+                      f"p50/p95/p99 {stats['p50_ms']:.0f}/{stats['p95_ms']:.0f}/{stats['p99_ms']:.0f} ms "
+                      f"(pico de RSS +{stats['rss_growth_mb']:.0f} MB)")
+        self._send_stats(summary)
+        self._push_xcom(summary)
+        return summary
+
+    def _send_stats(self, summary: dict):
+        from datetime import timedelta
+
+        try:
+            from airflow.stats import Stats
+        except ImportError:
+            return
+        prefix = f'airdata.{self.name}'
+        Stats.timing(f'{prefix}.duration', timedelta(seconds=summary['wall_seconds']))
+        Stats.gauge(f'{prefix}.peak_rss_mb', summary['peak_rss_mb'])
+        Stats.gauge(f'{prefix}.children_peak_rss_mb', summary['children_peak_rss_mb'])
+        for name, stats in summary['stages'].items():
+            Stats.timing(f'{prefix}.{name}.duration', timedelta(seconds=stats['seconds']))
+            Stats.gauge(f'{prefix}.{name}.rows', stats['rows'])
+            Stats.gauge(f'{prefix}.{name}.bytes', stats['bytes'])
+            Stats.gauge(f'{prefix}.{name}.rss_growth_mb', stats['rss_growth_mb'])
+            Stats.gauge(f'{prefix}.{name}.p95_ms', stats['p95_ms'])
+
+    def _push_xcom(self, summary: dict):
+        try:
+            from airflow.sdk import get_current_context
+
+            get_current_context()['ti'].xcom_push(key=XCOM_KEY, value=summary)
+        except Exception as e:
+            # Fora de uma task (ex: benchmarks) não há XCom
+            if self.verbose:
+                print(f'[METRICS] Resumo não enviado ao XCom: {e}')
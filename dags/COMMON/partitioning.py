@@ -0,0 +1,108 @@
+"""
+Particionamento mensal (declarativo, por RANGE) das tabelas do schema airdata.
+
+A função SQL `airdata.ensure_monthly_partitions` cria as partições que faltam para um
+intervalo de datas. As cargas usam `load_partitioned`, que anexa (ATTACH) uma partição
+nova já populada quando o mês ainda não existe, em vez de inserir linha a linha na tabela mãe.
+"""
+from datetime import date
+
+PARTITION_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION airdata.ensure_monthly_partitions(parent TEXT, start_date DATE, end_date DATE)
+RETURNS VOID LANGUAGE plpgsql AS $$
+DECLARE
+    month DATE := date_trunc('month', start_date)::DATE;
+    partition_name TEXT;
+BEGIN
+    WHILE month <= end_date LOOP
+        partition_name := format('%s_p%s', parent, to_char(month, 'YYYYMM'));
+        IF to_regclass(format('airdata.%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE airdata.%I PARTITION OF airdata.%I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month, (month + INTERVAL '1 month')::DATE
+            );
+        END IF;
+        month := (month + INTERVAL '1 month')::DATE;
+    END LOOP;
+END;
+$$;
+"""
+
+
+def partition_name(table: str, month: date) -> str:
+    """Nome da partição mensal de uma tabela (mesmo padrão de airdata.ensure_monthly_partitions)"""
+    return f"{table}_p{month.strftime('%Y%m')}"
+
+
+def next_month(month: date) -> date:
+    """Primeiro dia do mês seguinte"""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def ensure_monthly_partitions(cur, table: str, start_date: date, end_date: date):
+    """Cria as partições mensais de airdata.<table> que cobrem o intervalo informado"""
+    cur.execute("SELECT airdata.ensure_monthly_partitions(%s, %s, %s)", (table, start_date, end_date))
+
+
+def load_partitioned(cur, df, table: str, partition_column: str, key_columns: list[str]) -> int:
+    """
+    Carrega um DataFrame em uma tabela particionada mensalmente por `partition_column`.
+
+    Para cada mês presente no DataFrame:
+    - se a partição ainda não existe, os dados são copiados (COPY) para uma tabela avulsa,
+      que recebe a CHECK constraint do intervalo e é anexada com ATTACH PARTITION;
+    - se a partição já existe, os dados passam por uma tabela temporária e são inseridos
+      com ON CONFLICT DO NOTHING sobre a chave única da tabela.
+
+    Args:
+        cur: cursor psycopg2 (a transação fica a cargo de quem chama)
+        df: DataFrame com as colunas da tabela
+        table: nome da tabela no schema airdata (sem o schema)
+        partition_column: coluna de particionamento (datetime)
+        key_columns: colunas da chave única, usadas para remover duplicatas do lote
+
+    Returns:
+        quantidade de linhas enviadas ao banco
+    """
+    import pandas as pd
+    from COMMON.db import copy_dataframe
+
+    df = df.dropna(subset=[partition_column]).drop_duplicates(subset=key_columns)
+    if df.empty:
+        return 0
+
+    months = pd.to_datetime(df[partition_column]).dt.to_period("M")
+    total = 0
+    for period, month_df in df.groupby(months):
+        month = period.start_time.date()
+        name = partition_name(table, month)
+        lower, upper = month.isoformat(), next_month(month).isoformat()
+
+        cur.execute("SELECT to_regclass(%s)", (f"airdata.{name}",))
+        if cur.fetchone()[0] is None:
+            print(f"Criando e anexando a partição airdata.{name} ({len(month_df)} linhas)")
+            cur.execute(f"CREATE TABLE airdata.{name} (LIKE airdata.{table} INCLUDING DEFAULTS)")
+            copy_dataframe(cur, month_df, f"airdata.{name}")
+            # A CHECK constraint evita que o ATTACH precise varrer a partição para validá-la
+            cur.execute(
+                f"ALTER TABLE airdata.{name} ADD CONSTRAINT {name}_bounds "
+                f"CHECK ({partition_column} IS NOT NULL AND {partition_column} >= %s AND {partition_column} < %s)",
+                (lower, upper)
+            )
+            cur.execute(
+                f"ALTER TABLE airdata.{table} ATTACH PARTITION airdata.{name} FOR VALUES FROM (%s) TO (%s)",
+                (lower, upper)
+            )
+            cur.execute(f"ALTER TABLE airdata.{name} DROP CONSTRAINT {name}_bounds")
+        else:
+            print(f"Inserindo {len(month_df)} linhas na partição existente airdata.{name}")
+            stage = f"{name}_stage"
+            cur.execute(f"CREATE TEMP TABLE {stage} (LIKE airdata.{table} INCLUDING DEFAULTS)")
+            copy_dataframe(cur, month_df, stage)
+            columns = ", ".join(f'"{column.lower()}"' for column in month_df.columns)
+            cur.execute(
+                f"INSERT INTO airdata.{table} ({columns}) SELECT {columns} FROM {stage} ON CONFLICT DO NOTHING"
+            )
+            cur.execute(f"DROP TABLE {stage}")
+        total += len(month_df)
+    return total
@@ -0,0 +1,236 @@
+"""
+Motor de pipeline produtor/consumidor usado pelas DAGs de extração.
+
+Uma extração é descrita como uma sequência de estágios (ex: download -> parsing -> carga). Cada
+estágio roda em `workers` threads e é ligado ao seguinte por uma fila limitada (`queue_size`):
+quando um estágio fica para trás, a fila enche e os anteriores esperam (backpressure). Assim o
+download do próximo item acontece enquanto o anterior está sendo convertido ou inserido.
+
+Exemplo:
+
+    Pipeline([
+        Stage('download', download, workers=4),
+        Stage('parse', parse, workers=2),
+        Stage('load', load, ordered=True),
+    ]).run(items)
+
+- Um estágio que retorna None descarta o item (os estágios seguintes não o recebem).
+- Um estágio com `ordered=True` (e um único worker) processa os itens na ordem da origem. O buffer
+  de reordenação é limitado a `queue_size` itens: o estágio anterior espera para entregar itens
+  muito à frente do próximo da sequência (ex: download de um item lento em recuo).
+- Um estágio pode lançar StopPipeline para parar de consumir a origem (ex: última página de uma
+  API paginada); os itens já em andamento são concluídos.
+- Qualquer outra exceção interrompe o pipeline e é relançada por `run`.
+- Com `metrics` (COMMON.metrics.Metrics), cada execução de estágio é registrada com tempo,
+  linhas e bytes do resultado e o quanto elevou o pico de memória do processo.
+"""
+import queue
+import threading
+import time
+
+_END = object()    # fim dos itens de um estágio
+_SKIP = object()   # item descartado (mantém a sequência para estágios ordenados)
+_POLL_SECONDS = 0.2
+
+
+class StopPipeline(Exception):
+    """Lançada por um estágio para encerrar a leitura da origem; `result` (se houver) segue adiante"""
+
+    def __init__(self, result=None):
+        super().__init__()
+        self.result = result
+
+
+class Stage:
+    """
+    Estágio do pipeline.
+
+    Args:
+        name: nome do estágio (usado nos logs)
+        fn: função que recebe um item e retorna o item transformado (ou None para descartá-lo)
+        workers: quantidade de threads do estágio
+        queue_size: tamanho máximo da fila de entrada do estágio
+        ordered: processa os itens na ordem da origem (exige workers=1)
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = 8, ordered: bool = False):
+        if ordered and workers != 1:
+            raise ValueError(f"Estágio '{name}': ordered=True exige workers=1")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ordered = ordered
+
+
+class Pipeline:
+    """Executa uma sequência de estágios ligados por filas limitadas"""
+
+    def __init__(self, stages: list[Stage], verbose: bool = True, metrics=None):
+        self.stages = stages
+        self.verbose = verbose
+        self.metrics = metrics
+        self.stats = {}
+
+    def print(self, *args, **kwargs):
+        if self.verbose:
+            print(*args, **kwargs)
+
+    def run(self, source) -> dict:
+        """
+        Consome a origem (iterável) passando cada item por todos os estágios.
+
+        Returns:
+            estatísticas por estágio: {'nome': {'items': int, 'dropped': int, 'busy_seconds': float}}
+        """
+        self._abort = threading.Event()
+        self._stop = threading.Event()
+        self._errors = []
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self.stats = {stage.name: {'items': 0, 'dropped': 0, 'busy_seconds': 0.0} for stage in self.stages}
+
+        self._locks = [threading.Lock() for _ in self.stages]
+        self._remaining = [stage.workers for stage in self.stages]
+        # Próxima sequência esperada por cada estágio ordenado (janela de reordenação)
+        self._next_sequence = [0 for _ in self.stages]
+        self._order_conditions = [threading.Condition() for _ in self.stages]
+
+        threads = [threading.Thread(target=self._feed, args=(source,), name='pipeline-source', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(index,),
+                    name=f'pipeline-{stage.name}-{worker}',
+                    daemon=True
+                ))
+
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            stage_name, error = self._errors[0]
+            self.print(f'[PIPELINE] Falha no estágio {stage_name}: {error!r}')
+            raise error
+
+        self.print(f'[PIPELINE] Concluído em {time.monotonic() - started_at:.1f}s')
+        for name, stats in self.stats.items():
+            self.print(f'[PIPELINE] {name}: {stats["items"]} itens, {stats["dropped"]} descartados, '
+                       f'{stats["busy_seconds"]:.1f}s de processamento')
+        return self.stats
+
+    def _put(self, index: int, message) -> bool:
+        """Coloca uma mensagem na fila de entrada do estágio `index` (False se o pipeline foi abortado)"""
+        if index >= len(self._queues):
+            return True
+        stage = self.stages[index]
+        if stage.ordered and message is not _END:
+            # Só entrega dentro da janela: o item esperado sempre passa, os muito à frente aguardam
+            with self._order_conditions[index]:
+                while message[0] >= self._next_sequence[index] + stage.queue_size:
+                    if self._abort.is_set():
+                        return False
+                    self._order_conditions[index].wait(_POLL_SECONDS)
+        while not self._abort.is_set():
+            try:
+                self._queues[index].put(message, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, index: int):
+        while not self._abort.is_set():
+            try:
+                return self._queues[index].get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return None
+
+    def _feed(self, source):
+        try:
+            for sequence, item in enumerate(source):
+                if self._stop.is_set() or not self._put(0, (sequence, item)):
+                    break
+        except Exception as e:
+            self._fail('source', e)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._put(0, _END)
+
+    def _fail(self, stage_name: str, error: Exception):
+        self._errors.append((stage_name, error))
+        self._abort.set()
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        pending = {}        # buffer de reordenação (estágios ordenados)
+        next_sequence = 0
+
+        while True:
+            message = self._get(index)
+            if message is None:
+                return
+            if message is _END:
+                break
+
+            if stage.ordered:
+                pending[message[0]] = message[1]
+                ready = []
+                while next_sequence in pending:
+                    ready.append((next_sequence, pending.pop(next_sequence)))
+                    next_sequence += 1
+                if ready:
+                    with self._order_conditions[index]:
+                        self._next_sequence[index] = next_sequence
+                        self._order_conditions[index].notify_all()
+            else:
+                ready = [message]
+
+            for sequence, item in ready:
+                result = self._process(index, item)
+                if not self._put(index + 1, (sequence, result)):
+                    return
+
+        # O último worker do estágio a terminar sinaliza o fim para o estágio seguinte
+        with self._locks[index]:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self._put(index + 1, _END)
+
+    def _process(self, index: int, item):
+        if item is _SKIP:
+            return _SKIP
+        stage = self.stages[index]
+        if self.metrics is not None:
+            from COMMON.metrics import peak_rss_mb
+
+            rss_before = peak_rss_mb()
+        started_at = time.monotonic()
+        try:
+            result = stage.fn(item)
+        except StopPipeline as stop:
+            self._stop.set()
+            result = stop.result
+        except Exception as e:
+            self._fail(stage.name, e)
+            result = None
+
+        elapsed = time.monotonic() - started_at
+        if self.metrics is not None:
+            from COMMON.metrics import measure, peak_rss_mb
+
+            self.metrics.record(stage.name, elapsed, *measure(result), rss_growth_mb=peak_rss_mb() - rss_before)
+        with self._locks[index]:
+            stats = self.stats[stage.name]
+            stats['busy_seconds'] += elapsed
+            if result is None:
+                stats['dropped'] += 1
+            else:
+                stats['items'] += 1
+        return _SKIP if result is None else result
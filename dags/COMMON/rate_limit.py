@@ -0,0 +1,78 @@
+"""Limitação de taxa (token bucket) com recuo adaptativo para APIs externas."""
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: permite `rate` requisições por segundo, com rajadas de até `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket cuja taxa se adapta às respostas do servidor (AIMD): cai pela metade a cada
+    resposta de limitação (429/503) e volta a subir aos poucos a cada resposta bem-sucedida, até
+    `max_rate` (por padrão o dobro da taxa inicial).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, min_rate: float = 0.05, max_rate: float | None = None,
+                 increase: float = 0.05):
+        super().__init__(rate, capacity)
+        if max_rate is None:
+            max_rate = 2 * rate
+        if max_rate < rate:
+            raise ValueError(f"max_rate ({max_rate}) menor que a taxa inicial ({rate})")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._blocked_until = 0.0
+
+    def acquire(self):
+        """Aguarda o fim de um recuo em andamento e então consome um token"""
+        wait = self._blocked_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        super().acquire()
+
+    def succeeded(self):
+        """Registra uma resposta bem-sucedida (aumento aditivo da taxa)"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, attempt: int, retry_after: float | None = None):
+        """
+        Registra uma resposta de limitação do servidor (redução multiplicativa da taxa) e
+        bloqueia novas requisições pelo tempo indicado em Retry-After ou por um recuo
+        exponencial com jitter.
+        """
+        delay = retry_after if retry_after is not None else min(300.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        print(f"[RATE_LIMIT] Servidor limitando requisições. Nova taxa: {self.rate:.2f} req/s, recuo de {delay:.1f}s")
@@ -0,0 +1,189 @@
+"""
+Validação de qualidade dos dados antes da carga.
+
+Cada fonte declara uma lista de regras (faixa de valores, ordem entre colunas, unicidade, não nulo).
+As regras são avaliadas de forma vetorizada sobre o DataFrame do lote inteiro, gerando uma máscara
+booleana por regra. Linhas que falham em alguma regra não são carregadas: vão para
+airdata.quarantine (com o nome das regras violadas e a linha original em JSON), via COPY, na mesma
+transação da carga do lote.
+
+Exemplo:
+
+    validator = Validator('vra', [
+        NotNull('dt_referencia', 'nr_voo'),
+        Ordering('dt_partida_real', 'dt_chegada_real'),
+    ])
+    result = validator.validate(df)
+    with conn, conn.cursor() as cur:
+        quarantine(cur, 'vra', result.rejected)
+        load(cur, result.valid)
+"""
+from typing import NamedTuple
+
+# Tabela de quarentena compartilhada pelas fontes
+QUARANTINE_SQL = """
+CREATE TABLE IF NOT EXISTS airdata.quarantine (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,
+    rules TEXT[] NOT NULL,              -- regras violadas pela linha
+    payload JSONB NOT NULL,             -- linha original
+    quarantined_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS quarantine_source_idx ON airdata.quarantine (source, quarantined_at);
+"""
+
+
+class Rule:
+    """
+    Regra de validação: `failures(df)` retorna a máscara booleana das linhas que falham.
+    Regras com `after_others` são avaliadas só sobre as linhas aprovadas pelas demais.
+    """
+    name: str = None
+    after_others: bool = False
+
+    def failures(self, df):
+        raise NotImplementedError
+
+
+class NotNull(Rule):
+    """As colunas não podem ser nulas"""
+
+    def __init__(self, *columns: str, name: str | None = None):
+        self.columns = list(columns)
+        self.name = name or f"not_null_{'_'.join(columns)}"
+
+    def failures(self, df):
+        return df[self.columns].isna().any(axis=1)
+
+
+class Range(Rule):
+    """Valores da coluna entre `minimum` e `maximum` (inclusive); nulos são aceitos"""
+
+    def __init__(self, column: str, minimum=None, maximum=None, name: str | None = None):
+        self.column = column
+        self.minimum = minimum
+        self.maximum = maximum
+        self.name = name or f'range_{column}'
+
+    def failures(self, df):
+        import pandas as pd
+
+        values = pd.to_numeric(df[self.column], errors='coerce')
+        failed = pd.Series(False, index=df.index)
+        if self.minimum is not None:
+            failed |= (values < self.minimum).fillna(False)
+        if self.maximum is not None:
+            failed |= (values > self.maximum).fillna(False)
+        return failed
+
+
+class Ordering(Rule):
+    """`before` <= `after` + `tolerance` (datas ou números); linhas com algum dos dois nulo são aceitas"""
+
+    def __init__(self, before: str, after: str, tolerance=0, name: str | None = None):
+        self.before = before
+        self.after = after
+        self.tolerance = tolerance
+        self.name = name or f'ordering_{before}_{after}'
+
+    @staticmethod
+    def _values(series):
+        import pandas as pd
+
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        return pd.to_datetime(series, errors='coerce')
+
+    def failures(self, df):
+        before = self._values(df[self.before])
+        after = self._values(df[self.after])
+        if self.tolerance:
+            after = after + self.tolerance
+        return (before > after).fillna(False).astype(bool)
+
+
+class Unique(Rule):
+    """
+    Combinação de colunas única no lote: a primeira ocorrência aprovada pelas demais regras é
+    mantida e as repetições falham (uma cópia inválida não impede a carga de uma válida)
+    """
+    after_others = True
+
+    def __init__(self, *columns: str, name: str | None = None):
+        self.columns = list(columns)
+        self.name = name or f"unique_{'_'.join(columns)}"
+
+    def failures(self, df):
+        return df.duplicated(subset=self.columns, keep='first')
+
+
+class ValidationResult(NamedTuple):
+    """Resultado da validação de um lote"""
+    valid: object           # DataFrame das linhas aprovadas
+    rejected: object        # DataFrame das linhas reprovadas, com a coluna 'rules' (lista de regras)
+    counts: dict            # quantidade de linhas reprovadas por regra
+
+
+class Validator:
+    """Conjunto de regras de uma fonte"""
+
+    def __init__(self, source: str, rules: list[Rule]):
+        self.source = source
+        self.rules = rules
+
+    def validate(self, df, verbose: bool = True) -> ValidationResult:
+        """Avalia todas as regras no lote e separa as linhas aprovadas das reprovadas"""
+        import numpy as np
+
+        # Regras que usam colunas ausentes no lote são ignoradas
+        rules = [rule for rule in self.rules if self._applies(rule, df)]
+        if df.empty or not rules:
+            return ValidationResult(df, df.iloc[0:0].assign(rules=None), {})
+
+        masks = np.zeros((len(df), len(rules)), dtype=bool)
+        for i, rule in enumerate(rules):
+            if not rule.after_others:
+                masks[:, i] = rule.failures(df).to_numpy(dtype=bool)
+        passed = ~masks.any(axis=1)
+        for i, rule in enumerate(rules):
+            if rule.after_others:
+                masks[passed, i] = rule.failures(df[passed]).to_numpy(dtype=bool)
+        failed = masks.any(axis=1)
+        counts = {rule.name: int(count) for rule, count in zip(rules, masks.sum(axis=0)) if count}
+
+        rejected = df[failed].copy()
+        names = np.array([rule.name for rule in rules])
+        rejected['rules'] = [list(names[row]) for row in masks[failed]]
+        if verbose and counts:
+            detail = ', '.join(f'{name}={count}' for name, count in counts.items())
+            print(f'[VALIDATION] {self.source}: {len(rejected)} de {len(df)} linhas em quarentena ({detail})')
+        return ValidationResult(df[~failed], rejected, counts)
+
+    @staticmethod
+    def _applies(rule: Rule, df) -> bool:
+        columns = getattr(rule, 'columns', None) or [
+            getattr(rule, attribute) for attribute in ('column', 'before', 'after') if hasattr(rule, attribute)
+        ]
+        return all(column in df.columns for column in columns)
+
+
+def quarantine(cur, source: str, rejected) -> int:
+    """
+    Grava as linhas reprovadas em airdata.quarantine usando COPY (a transação fica a cargo de quem chama).
+
+    Returns:
+        quantidade de linhas gravadas
+    """
+    import pandas as pd
+    from COMMON.db import copy_dataframe
+
+    if rejected is None or rejected.empty:
+        return 0
+
+    payload = rejected.drop(columns=['rules']).to_json(orient='records', lines=True, date_format='iso')
+    rows = pd.DataFrame({
+        'source': source,
+        'rules': ['{' + ','.join(rules) + '}' for rules in rejected['rules']],
+        'payload': payload.splitlines(),
+    })
+    return copy_dataframe(cur, rows, 'airdata.quarantine')
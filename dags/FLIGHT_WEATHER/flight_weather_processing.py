@@ -0,0 +1,305 @@
+from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
+from airflow.sdk import dag, task
+
+from COMMON.db import INGESTION_STATE_SQL
+from COMMON.partitioning import PARTITION_FUNCTIONS_SQL
+from METAR.metar_schema import sky_cover_case
+from METAR.stations import STATIONS_SQL
+
+# Os horários do VRA estão no horário de Brasília, enquanto o METAR (IEM) está em UTC
+VRA_TIMEZONE = 'America/Sao_Paulo'
+# Janela máxima (antes/depois do horário do voo) para buscar a observação METAR mais próxima
+METAR_WINDOW = '3 hours'
+# Turtle com aeródromos e estações geolocalizados para o índice GeoSPARQL do Fuseki (DAG turtle_processing)
+GEO_TTL_NAME = 'aerodromes_geo.ttl'
+NEW_TTLS_DIR = '/opt/airflow/turtles/new_ttls'
+PROCESSED_TTLS_DIR = '/opt/airflow/turtles/processed_ttls'
+
+# Para cada voo dos dias informados, busca a observação METAR mais próxima no tempo na origem
+# (partida) e no destino (chegada). Aeródromos sem METAR próprio usam a estação mais próxima
+# (airdata.aerodrome_station, calculada pela task map_stations). Cada LATERAL faz duas buscas limitadas pelo índice único
+# (station, valid) da airdata.metar — a última observação antes e a primeira depois do horário —
+# e fica com a mais próxima, sem varrer as observações da estação.
+REFRESH_SQL = """
+WITH voos AS (
+    SELECT
+        v.*,
+        (COALESCE(v.dt_partida_real, v.dt_partida_prevista) AT TIME ZONE %(tz)s) AT TIME ZONE 'UTC' AS partida_utc,
+        (COALESCE(v.dt_chegada_real, v.dt_chegada_prevista) AT TIME ZONE %(tz)s) AT TIME ZONE 'UTC' AS chegada_utc,
+        COALESCE(so.station, v.sg_icao_origem) AS origem_station,
+        so.distance_km AS origem_station_km,
+        COALESCE(sd.station, v.sg_icao_destino) AS destino_station,
+        sd.distance_km AS destino_station_km
+    FROM airdata.vra v
+    LEFT JOIN airdata.aerodrome_station so ON so.aerodrome = v.sg_icao_origem
+    LEFT JOIN airdata.aerodrome_station sd ON sd.aerodrome = v.sg_icao_destino
+    WHERE v.dt_referencia = ANY(%(days)s::DATE[])
+)
+INSERT INTO airdata.flight_weather
+SELECT
+    voos.id,
+    voos.dt_referencia,
+    voos.sg_empresa_icao,
+    voos.nr_voo,
+    voos.sg_icao_origem,
+    voos.dt_partida_prevista,
+    voos.dt_partida_real,
+    EXTRACT(EPOCH FROM voos.dt_partida_real - voos.dt_partida_prevista) / 60,
+    voos.sg_icao_destino,
+    voos.dt_chegada_prevista,
+    voos.dt_chegada_real,
+    EXTRACT(EPOCH FROM voos.dt_chegada_real - voos.dt_chegada_prevista) / 60,
+    voos.ds_situacao_voo,
+    origem.valid, origem.tmpc, origem.dwpc, origem.drct, origem.sknt, origem.gust,
+    origem.vsby, origem.skyc1, origem.skyl1, origem.wxcodes, origem.metar,
+    destino.valid, destino.tmpc, destino.dwpc, destino.drct, destino.sknt, destino.gust,
+    destino.vsby, destino.skyc1, destino.skyl1, destino.wxcodes, destino.metar,
+    voos.origem_station, voos.origem_station_km, voos.destino_station, voos.destino_station_km
+FROM voos
+LEFT JOIN LATERAL (
+    SELECT c.* FROM (
+        (SELECT * FROM airdata.metar m
+         WHERE m.station = voos.origem_station
+           AND m.valid <= voos.partida_utc AND m.valid >= voos.partida_utc - %(window)s::INTERVAL
+         ORDER BY m.valid DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM airdata.metar m
+         WHERE m.station = voos.origem_station
+           AND m.valid > voos.partida_utc AND m.valid <= voos.partida_utc + %(window)s::INTERVAL
+         ORDER BY m.valid ASC LIMIT 1)
+    ) c
+    ORDER BY ABS(EXTRACT(EPOCH FROM c.valid - voos.partida_utc))
+    LIMIT 1
+) origem ON TRUE
+LEFT JOIN LATERAL (
+    SELECT c.* FROM (
+        (SELECT * FROM airdata.metar m
+         WHERE m.station = voos.destino_station
+           AND m.valid <= voos.chegada_utc AND m.valid >= voos.chegada_utc - %(window)s::INTERVAL
+         ORDER BY m.valid DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM airdata.metar m
+         WHERE m.station = voos.destino_station
+           AND m.valid > voos.chegada_utc AND m.valid <= voos.chegada_utc + %(window)s::INTERVAL
+         ORDER BY m.valid ASC LIMIT 1)
+    ) c
+    ORDER BY ABS(EXTRACT(EPOCH FROM c.valid - voos.chegada_utc))
+    LIMIT 1
+) destino ON TRUE;
+"""
+
+
+@dag(dag_id='flight_weather_processing', schedule='0 8 * * *', max_active_runs=1)
+def flight_weather_processing():
+    """DAG de processamento que relaciona cada voo da VRA ao METAR mais próximo na origem e no destino"""
+
+    # Task para criar a tabela de voos x meteorologia se não existir
+    create_table = SQLExecuteQueryOperator(
+        task_id='create_table',
+        conn_id='postgres',
+        sql=PARTITION_FUNCTIONS_SQL + INGESTION_STATE_SQL + STATIONS_SQL + """
+          CREATE TABLE IF NOT EXISTS airdata.flight_weather (
+            vra_id INTEGER NOT NULL,                -- id do voo em airdata.vra
+            dt_referencia DATE NOT NULL,
+            sg_empresa_icao VARCHAR(10),
+            nr_voo VARCHAR(10),
+            sg_icao_origem VARCHAR(10),
+            dt_partida_prevista TIMESTAMP,
+            dt_partida_real TIMESTAMP,
+            atraso_partida_min REAL,                -- atraso da partida em minutos (real - prevista)
+            sg_icao_destino VARCHAR(10),
+            dt_chegada_prevista TIMESTAMP,
+            dt_chegada_real TIMESTAMP,
+            atraso_chegada_min REAL,                -- atraso da chegada em minutos (real - prevista)
+            ds_situacao_voo TEXT,
+            origem_valid TIMESTAMP,                 -- horário (UTC) do METAR mais próximo da partida
+            origem_tmpc REAL,
+            origem_dwpc REAL,
+            origem_drct REAL,
+            origem_sknt REAL,
+            origem_gust REAL,
+            origem_vsby REAL,
+            origem_skyc1 SMALLINT,              -- código em airdata.metar_sky_cover
+            origem_skyl1 REAL,
+            origem_wxcodes TEXT,
+            origem_metar TEXT,
+            destino_valid TIMESTAMP,                -- horário (UTC) do METAR mais próximo da chegada
+            destino_tmpc REAL,
+            destino_dwpc REAL,
+            destino_drct REAL,
+            destino_sknt REAL,
+            destino_gust REAL,
+            destino_vsby REAL,
+            destino_skyc1 SMALLINT,
+            destino_skyl1 REAL,
+            destino_wxcodes TEXT,
+            destino_metar TEXT,
+            origem_station TEXT,                    -- estação METAR usada na origem (a própria ou a mais próxima)
+            origem_station_km REAL,                 -- distância entre o aeródromo de origem e a estação
+            destino_station TEXT,
+            destino_station_km REAL,
+            PRIMARY KEY (vra_id, dt_referencia)
+          ) PARTITION BY RANGE (dt_referencia);
+
+          CREATE INDEX IF NOT EXISTS flight_weather_origem_idx ON airdata.flight_weather (sg_icao_origem, dt_partida_prevista);
+          CREATE INDEX IF NOT EXISTS flight_weather_destino_idx ON airdata.flight_weather (sg_icao_destino, dt_chegada_prevista);
+
+          -- Tabelas criadas antes do mapeamento aeródromo -> estação
+          ALTER TABLE airdata.flight_weather
+            ADD COLUMN IF NOT EXISTS origem_station TEXT,
+            ADD COLUMN IF NOT EXISTS origem_station_km REAL,
+            ADD COLUMN IF NOT EXISTS destino_station TEXT,
+            ADD COLUMN IF NOT EXISTS destino_station_km REAL;
+
+          -- Tabelas criadas antes dos tipos compactos do METAR: cobertura de nuvens em texto vira código
+          DO $$
+          BEGIN
+            IF EXISTS (
+              SELECT 1 FROM information_schema.columns
+              WHERE table_schema = 'airdata' AND table_name = 'flight_weather'
+                AND column_name = 'origem_skyc1' AND data_type = 'text'
+            ) THEN
+              ALTER TABLE airdata.flight_weather
+                ALTER COLUMN origem_skyc1 TYPE SMALLINT USING """ + sky_cover_case('origem_skyc1') + """,
+                ALTER COLUMN destino_skyc1 TYPE SMALLINT USING """ + sky_cover_case('destino_skyc1') + """;
+            END IF;
+          END $$;
+        """
+    )
+
+    @task
+    def get_touched_days() -> dict:
+        """
+        Task para obter os dias de voo que precisam ser recalculados: dias carregados na VRA
+        e dias vizinhos aos carregados no METAR desde o último processamento.
+        """
+        from datetime import timedelta
+        from COMMON.db import get_connection, get_watermark
+
+        conn = get_connection()
+        with conn, conn.cursor() as cur:
+            # Marca d'água: id de transação a partir do qual ainda há cargas não lidas. Todas as
+            # transações abaixo do xmin do snapshot atual já terminaram, então nenhuma carga com
+            # commit atrasado fica para trás; as acima dele são lidas na próxima execução.
+            last_processed = get_watermark(cur, 'flight_weather')
+            since, legacy = 0, None
+            if last_processed and last_processed.isdigit():
+                since = int(last_processed)
+            elif last_processed:
+                legacy = last_processed # instante de loaded_at (marca d'água de versões anteriores)
+            cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            until = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT source, day, load_txid FROM airdata.ingestion_touched_days
+                WHERE source IN ('vra', 'metar') AND load_txid >= %s AND load_txid < %s
+                  AND (load_txid > 0 OR %s::TIMESTAMP IS NULL OR loaded_at > %s::TIMESTAMP)
+                """,
+                (since, until, legacy, legacy)
+            )
+            rows = cur.fetchall()
+        conn.close()
+
+        if not rows:
+            print('Nenhum dia novo carregado desde o último processamento.')
+            return {'days': [], 'watermark': None}
+
+        days = set()
+        for source, day, _ in rows:
+            days.add(day)
+            if source == 'metar':
+                # Uma observação do dia D pode ser a mais próxima de voos de D-1 e D+1
+                days.update([day - timedelta(days=1), day + timedelta(days=1)])
+
+        print(f'Dias a recalcular: {len(days)}')
+        return {
+            'days': sorted(day.isoformat() for day in days),
+            'watermark': str(until)
+        }
+
+    @task
+    def map_stations() -> int:
+        """
+        Task para atualizar a base de aeródromos (coordenadas), recalcular a estação METAR de cada
+        aeródromo (índice espacial em memória) e exportar os pontos para o índice GeoSPARQL do Fuseki
+        """
+        import os
+
+        from COMMON.db import get_connection, upsert_dataframe
+        from COMMON.http_cache import cached_get
+        from METAR.stations import AERODROMES_URL, geo_turtle, map_aerodromes, parse_aerodromes_csv
+
+        # Sem a base de aeródromos (fonte fora do ar), o recálculo segue com o mapeamento atual
+        try:
+            response = cached_get(AERODROMES_URL, verbose=False)
+            if response.status_code != 200:
+                raise RuntimeError(f'Erro {response.status_code} ao baixar a base de aeródromos: {AERODROMES_URL}')
+            aerodromes = parse_aerodromes_csv(response.text)
+        except Exception as e:
+            print(f'Base de aeródromos indisponível, mantendo airdata.aerodrome_station atual: {e}')
+            aerodromes = None
+
+        conn = get_connection()
+        with conn, conn.cursor() as cur:
+            if aerodromes is None:
+                cur.execute("SELECT COUNT(*) FROM airdata.aerodrome_station")
+                mapped = cur.fetchone()[0]
+            else:
+                upsert_dataframe(cur, aerodromes, 'airdata.aerodrome', ['icao'], touch_column='updated_at')
+                mapped = map_aerodromes(cur)
+                content = geo_turtle(cur)
+        conn.close()
+        if aerodromes is None:
+            return mapped
+        if not mapped:
+            return 0
+
+        # Só gera um novo arquivo para o Fuseki se os pontos mudaram desde a última carga
+        processed = os.path.join(PROCESSED_TTLS_DIR, GEO_TTL_NAME)
+        if os.path.exists(processed):
+            with open(processed, 'r', encoding='utf-8') as file:
+                if file.read() == content:
+                    print('Geometrias dos aeródromos inalteradas no Fuseki')
+                    return mapped
+        os.makedirs(NEW_TTLS_DIR, exist_ok=True)
+        with open(os.path.join(NEW_TTLS_DIR, GEO_TTL_NAME), 'w', encoding='utf-8') as file:
+            file.write(content)
+        print(f'Geometrias dos aeródromos gravadas em {NEW_TTLS_DIR}/{GEO_TTL_NAME}')
+        return mapped
+
+    @task
+    def refresh_flight_weather(touched: dict):
+        """Task para recalcular airdata.flight_weather apenas para os dias afetados pelas últimas cargas"""
+        from datetime import date
+        from COMMON.db import get_connection, set_watermark
+        from COMMON.partitioning import ensure_monthly_partitions
+
+        days = [date.fromisoformat(day) for day in touched['days']]
+        if not days:
+            print('Nada a recalcular.')
+            return
+
+        conn = get_connection()
+        # Uma transação por mês, para não manter uma única transação gigante em reprocessamentos
+        months = sorted({day.replace(day=1) for day in days})
+        for month in months:
+            month_days = [day for day in days if day.replace(day=1) == month]
+            print(f'Recalculando {len(month_days)} dias de {month.strftime("%m/%Y")}')
+            with conn, conn.cursor() as cur:
+                ensure_monthly_partitions(cur, 'flight_weather', month, month)
+                cur.execute(
+                    "DELETE FROM airdata.flight_weather WHERE dt_referencia = ANY(%s::DATE[])",
+                    (month_days,)
+                )
+                cur.execute(REFRESH_SQL, {'days': month_days, 'tz': VRA_TIMEZONE, 'window': METAR_WINDOW})
+                print(f'Voos recalculados: {cur.rowcount}')
+
+        with conn, conn.cursor() as cur:
+            set_watermark(cur, 'flight_weather', touched['watermark'])
+        conn.close()
+
+    touched_days = get_touched_days()
+    create_table >> map_stations() >> touched_days >> refresh_flight_weather(touched_days)
+
+
+flight_weather_processing()
@@ -0,0 +1,194 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import requests
+from requests.auth import HTTPBasicAuth
+
+# Consultas de prova: contagem total e um padrão típico (predicados mais usados)
+PROBE_QUERIES = [
+    "SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }",
+    "SELECT ?p (COUNT(*) AS ?n) WHERE { ?s ?p ?o } GROUP BY ?p ORDER BY DESC(?n) LIMIT 20",
+]
+
+
+class FusekiAdmin:
+    """
+    Classe para manutenção de um dataset TDB2 do Apache Jena Fuseki: compactação pela API
+    administrativa ($/compact), estatísticas do otimizador (stats.opt), tamanho do armazenamento
+    e latência de consultas de prova.
+    """
+
+    def __init__(self, fuseki_url: str = "http://localhost:3030", dataset: str = "airdata",
+                 auth_user: str = "admin", auth_pass: str = "admin123",
+                 database_dir: str = "/fuseki/databases/airdata", verbose: bool = True):
+        """
+        Inicializa o administrador do dataset.
+
+        Args:
+            fuseki_url: URL base do servidor Fuseki (padrão: http://localhost:3030)
+            dataset: Nome do dataset no Fuseki (padrão: airdata)
+            database_dir: diretório TDB2 do dataset (volume fuseki-data montado no Airflow)
+        """
+        self.fuseki_url = fuseki_url.rstrip('/')
+        self.dataset = dataset
+        self.query_endpoint = f"{self.fuseki_url}/{dataset}/query"
+        self.auth = HTTPBasicAuth(auth_user, auth_pass) if auth_user and auth_pass else None
+        self.database_dir = database_dir
+        self.verbose = verbose
+
+    def print(self, *args, **kwargs):
+        if self.verbose:
+            print(*args, **kwargs)
+
+    def store_size(self) -> Dict[str, Any]:
+        """
+        Tamanho do armazenamento TDB2 (todas as gerações Data-NNNN e arquivos de controle).
+
+        Returns:
+            dict com o total em bytes e o tamanho de cada geração
+        """
+        generations = {}
+        total = 0
+        for dir, _, file_names in os.walk(self.database_dir):
+            size = sum(os.path.getsize(os.path.join(dir, file_name)) for file_name in file_names)
+            total += size
+            relative = os.path.relpath(dir, self.database_dir).split(os.sep)[0]
+            if relative.startswith('Data-'):
+                generations[relative] = generations.get(relative, 0) + size
+        self.print(f'Armazenamento {self.database_dir}: {total / 1024 ** 2:.1f} MB em {len(generations)} gerações')
+        return {"bytes": total, "generations": generations}
+
+    def current_generation(self) -> Optional[str]:
+        """Diretório da geração em uso (o Data-NNNN mais recente)"""
+        generations = sorted(name for name in os.listdir(self.database_dir) if name.startswith('Data-'))
+        return os.path.join(self.database_dir, generations[-1]) if generations else None
+
+    def probe(self, queries: list = PROBE_QUERIES, repeat: int = 5) -> Dict[str, Any]:
+        """
+        Latência das consultas de prova (cada uma executada `repeat` vezes).
+
+        Returns:
+            dict com p50/p95 (ms) de todas as execuções e a contagem de triplas
+        """
+        durations = []
+        triples = None
+        for query in queries:
+            for _ in range(repeat):
+                started_at = time.perf_counter()
+                response = requests.get(
+                    self.query_endpoint,
+                    params={'query': query},
+                    headers={'Accept': 'application/sparql-results+json'},
+                    auth=self.auth,
+                    timeout=600
+                )
+                durations.append((time.perf_counter() - started_at) * 1000)
+                response.raise_for_status()
+                if triples is None:
+                    bindings = response.json()['results']['bindings']
+                    triples = int(bindings[0]['n']['value']) if bindings else 0
+
+        durations.sort()
+        result = {
+            "p50_ms": round(durations[len(durations) // 2], 1),
+            "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 1),
+            "triples": triples,
+        }
+        self.print(f"Consultas de prova: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, {triples} triplas")
+        return result
+
+    def compact(self, delete_old: bool = True, timeout: float = 3600, poll_interval: float = 5) -> Dict[str, Any]:
+        """
+        Compacta o dataset ($/compact) e aguarda o fim da tarefa no servidor ($/tasks).
+
+        Args:
+            delete_old: apaga a geração anterior após a compactação (libera o espaço)
+            timeout: tempo máximo de espera (em segundos)
+            poll_interval: intervalo entre as consultas ao estado da tarefa
+
+        Returns:
+            dict com status da operação e a duração da compactação
+        """
+        started_at = time.monotonic()
+        self.print(f'Compactando o dataset {self.dataset} (deleteOld={delete_old})')
+        response = requests.post(
+            f"{self.fuseki_url}/$/compact/{self.dataset}",
+            params={'deleteOld': 'true'} if delete_old else {},
+            auth=self.auth,
+            timeout=60
+        )
+        if response.status_code not in [200, 202]:
+            return {
+                "success": False,
+                "message": f"Erro ao iniciar a compactação: {response.text}",
+                "status_code": response.status_code
+            }
+
+        task_id = response.json().get('taskId')
+        while time.monotonic() - started_at < timeout:
+            time.sleep(poll_interval)
+            status = requests.get(f"{self.fuseki_url}/$/tasks/{task_id}", auth=self.auth, timeout=60).json()
+            if 'finished' in status:
+                seconds = round(time.monotonic() - started_at, 1)
+                success = status.get('success', True)
+                self.print(f'Compactação finalizada em {seconds}s (sucesso: {success})')
+                return {
+                    "success": success,
+                    "message": "Compactação concluída" if success else "Compactação falhou no servidor",
+                    "task_id": task_id,
+                    "seconds": seconds
+                }
+        return {
+            "success": False,
+            "message": f"Compactação não terminou em {timeout}s (tarefa {task_id})",
+            "task_id": task_id
+        }
+
+    def predicate_counts(self) -> Dict[str, int]:
+        """Quantidade de triplas por predicado (base das estatísticas do otimizador)"""
+        response = requests.get(
+            self.query_endpoint,
+            params={'query': "SELECT ?p (COUNT(*) AS ?n) WHERE { ?s ?p ?o } GROUP BY ?p"},
+            headers={'Accept': 'application/sparql-results+json'},
+            auth=self.auth,
+            timeout=3600
+        )
+        response.raise_for_status()
+        return {
+            binding['p']['value']: int(binding['n']['value'])
+            for binding in response.json()['results']['bindings']
+        }
+
+    def write_stats(self, counts: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Grava o stats.opt (formato de estatísticas do otimizador do TDB) na geração em uso.
+        O TDB2 lê o arquivo ao abrir o armazenamento (reinício do Fuseki ou próxima compactação).
+
+        Returns:
+            dict com status da operação e o caminho do arquivo
+        """
+        generation = self.current_generation()
+        if generation is None:
+            return {"success": False, "message": f"Nenhuma geração Data-NNNN em {self.database_dir}"}
+
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        lines = [
+            '(stats',
+            '  (meta',
+            f'    (timestamp "{timestamp}"^^<http://www.w3.org/2001/XMLSchema#dateTime>)',
+            f'    (count {sum(counts.values())}))',
+        ]
+        # Predicados mais frequentes primeiro (o otimizador ordena os padrões pela seletividade)
+        lines += [f'  (<{predicate}> {count})' for predicate, count in sorted(counts.items(), key=lambda item: -item[1])]
+        lines += ['  (other 0)', ')']
+
+        path = os.path.join(generation, 'stats.opt')
+        try:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            return {"success": False, "message": f"Erro ao gravar {path}: {e}"}
+        self.print(f'Estatísticas de {len(counts)} predicados gravadas em {path}')
+        return {"success": True, "message": f"Estatísticas gravadas em {path}", "predicates": len(counts)}
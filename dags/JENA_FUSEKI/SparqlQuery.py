@@ -1,35 +1,115 @@
-import requests
-from typing import List, Dict, Any, Optional
+import unicodedata
+from typing import List, Dict, Any, Iterator, Optional
 
-from requests.auth import HTTPBasicAuth
+# Propriedades com índice textual no Fuseki (fuseki-config/airdata.ttl): campo do índice -> predicado
+TEXT_FIELDS = {
+    'label': 'http://www.w3.org/2000/01/rdf-schema#label',
+    'empresa': 'http://airdata.org/ontology#nm_empresa',
+    'aerodromo_origem': 'http://airdata.org/ontology#nm_aerodromo_origem',
+    'aerodromo_destino': 'http://airdata.org/ontology#nm_aerodromo_destino',
+    'callsign': 'http://airdata.org/ontology#Flight-aircraftIdentification',
+}
+
+# Caracteres especiais da sintaxe de consulta do Lucene
+LUCENE_SPECIAL = set('+-&|!(){}[]^"~*?:\\/')
+
+
+def escape_lucene(text: str) -> str:
+    """Escapa os caracteres especiais do Lucene (o texto é buscado literalmente)"""
+    return ''.join('\\' + char if char in LUCENE_SPECIAL else char for char in text)
+
+
+def text_query_pattern(text: str, field: Optional[str] = None, limit: Optional[int] = None,
+                       subject: str = '?s', score: str = '?score', literal: str = '?literal',
+                       prefix: bool = False, raw: bool = False) -> str:
+    """
+    Monta o padrão `text:query` (jena-text) para uma busca no índice textual.
+
+    Args:
+        text: termos buscados
+        field: campo de TEXT_FIELDS ou IRI de uma propriedade indexada (None: campo padrão, rdfs:label)
+        limit: máximo de resultados do índice
+        prefix: busca por prefixo de cada termo ("guarul" encontra "Guarulhos")
+        raw: `text` já está na sintaxe do Lucene (sem escape, sem prefixo)
+
+    Returns:
+        padrão de tripla para o WHERE (requer PREFIX text: <http://jena.apache.org/text#>)
+    """
+    if not raw:
+        if prefix:
+            # Termos com curinga não passam pelo analisador do índice: minúsculas e sem acento aqui
+            text = ''.join(char for char in unicodedata.normalize('NFKD', text.lower())
+                           if not unicodedata.combining(char))
+        terms = [escape_lucene(term) for term in text.split()]
+        # Todos os termos devem aparecer (o operador padrão do Lucene é OR)
+        text = ' AND '.join(term + '*' if prefix else term for term in terms)
+    # Literal SPARQL: escapa barras invertidas e aspas
+    arguments = ['"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"']
+    if field:
+        arguments.insert(0, f'<{TEXT_FIELDS.get(field, field)}>')
+    if limit:
+        arguments.append(str(int(limit)))
+    return f"({subject} {score} {literal}) text:query ({' '.join(arguments)}) ."
 
 
 class SparqlQuery:
     """
-    Classe para executar consultas SPARQL no Apache Jena Fuseki
+    Classe para executar consultas SPARQL no Apache Jena Fuseki (ou em outro backend de
+    JENA_FUSEKI.rdf_backends, como o armazenamento embarcado do Oxigraph)
     """
 
     def __init__(self, fuseki_url: str = "http://localhost:3030", dataset: str = "airdata",
-                 auth_user: str = "admin", auth_pass: str = "admin123"):
+                 auth_user: str = "admin", auth_pass: str = "admin123", backend=None):
         """
         Inicializa o executor de queries.
 
         Args:
             fuseki_url: URL base do servidor Fuseki (padrão: http://localhost:3030)
             dataset: Nome do dataset no Fuseki (padrão: ds)
+            backend: instância de backend (FusekiBackend, OxigraphBackend, VirtualGraphBackend) ou nome
+                ('fuseki', 'oxigraph', 'postgres'); padrão: o Fuseki em `fuseki_url`
         """
+        from JENA_FUSEKI.rdf_backends import get_backend
+
         self.fuseki_url = fuseki_url.rstrip('/')
         self.dataset = dataset
         self.query_endpoint = f"{self.fuseki_url}/{dataset}/query"
         self.update_endpoint = f"{self.fuseki_url}/{dataset}/update"
-        self.auth = HTTPBasicAuth(auth_user, auth_pass) if auth_user and auth_pass else None
+        self.backend = get_backend(backend, fuseki_url=fuseki_url, dataset=dataset,
+                                   auth_user=auth_user, auth_pass=auth_pass)
         print('Instância de SparqlQuery criada!')
         print('Informações do objeto:')
+        print(f'{self.backend.name=}')
         print(f'{self.fuseki_url=}')
         print(f'{self.dataset=}')
         print(f'{self.query_endpoint=}')
         print(f'{self.update_endpoint=}')
 
+    @staticmethod
+    def _failure(e: Exception, prefix: str) -> Dict[str, Any]:
+        """Resultado de erro no mesmo formato para todos os backends"""
+        from JENA_FUSEKI.rdf_backends import BackendError, BackendUnavailable
+
+        if isinstance(e, BackendUnavailable):
+            return {
+                "success": False,
+                "message": "Não foi possível conectar ao Fuseki. Verifique se está rodando.",
+                "error": str(e)
+            }
+        if isinstance(e, BackendError):
+            return {
+                "success": False,
+                "message": f"{prefix}: {str(e)}",
+                "status_code": e.status_code
+            }
+        import traceback
+        return {
+            "success": False,
+            "message": f"Erro inesperado: {str(e)}",
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+
     def select(self, query: str) -> Dict[str, Any]:
         """
         Executa uma query SELECT SPARQL.
@@ -40,52 +120,33 @@ class SparqlQuery:
         Returns:
             dict com resultados e metadados
         """
-        headers = {
-            'Accept': 'application/sparql-results+json'
-        }
-
-        params = {
-            'query': query
-        }
-
         try:
             print('Fazendo a operação SELECT')
             print(f'Query utilizada:\n{query}')
-            response = requests.get(
-                self.query_endpoint,
-                params=params,
-                headers=headers
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "results": data.get('results', {}).get('bindings', []),
-                    "variables": data.get('head', {}).get('vars', []),
-                    "count": len(data.get('results', {}).get('bindings', []))
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Erro na query: {response.text}",
-                    "status_code": response.status_code
-                }
-
-        except requests.exceptions.ConnectionError as e:
+            data = self.backend.select(query)
             return {
-                "success": False,
-                "message": "Não foi possível conectar ao Fuseki. Verifique se está rodando.",
-                "error": str(e)
+                "success": True,
+                "results": data.get('results', {}).get('bindings', []),
+                "variables": data.get('head', {}).get('vars', []),
+                "count": len(data.get('results', {}).get('bindings', []))
             }
+
         except Exception as e:
-            import traceback
-            return {
-                "success": False,
-                "message": f"Erro inesperado: {str(e)}",
-                "error": str(e),
-                "traceback": traceback.format_exc()
-            }
+            return self._failure(e, 'Erro na query')
+
+    def select_stream(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Resultados de um SELECT um a um, sem acumular tudo em memória quando o backend lê em lotes
+        (grafo virtual do Postgres); nos demais backends, percorre o resultado completo.
+
+        Erros do backend (BackendError) são propagados em vez de retornados em dict.
+        """
+        print(f'Fazendo a operação SELECT (streaming)\nQuery utilizada:\n{query}')
+        if hasattr(self.backend, 'select_stream'):
+            _, bindings = self.backend.select_stream(query)
+            yield from bindings
+        else:
+            yield from self.backend.select(query).get('results', {}).get('bindings', [])
 
     def ask(self, query: str) -> Dict[str, Any]:
         """
@@ -97,45 +158,17 @@ class SparqlQuery:
         Returns:
             dict com resultado booleano
         """
-        headers = {
-            'Accept': 'application/sparql-results+json'
-        }
-
-        params = {
-            'query': query
-        }
-
         try:
             print('Fazendo a operação ASK')
             print(f'Query utilizada:\n{query}')
-            response = requests.get(
-                self.query_endpoint,
-                params=params,
-                headers=headers
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "result": data.get('boolean', False)
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Erro na query: {response.text}",
-                    "status_code": response.status_code
-                }
-
-        except Exception as e:
-            import traceback
             return {
-                "success": False,
-                "message": f"Erro inesperado: {str(e)}",
-                "error": str(e),
-                "traceback": traceback.format_exc()
+                "success": True,
+                "result": self.backend.ask(query)
             }
 
+        except Exception as e:
+            return self._failure(e, 'Erro na query')
+
     def construct(self, query: str) -> Dict[str, Any]:
         """
         Executa uma query CONSTRUCT SPARQL (retorna grafo RDF).
@@ -146,42 +179,18 @@ class SparqlQuery:
         Returns:
             dict com grafo resultante em formato Turtle
         """
-        headers = {
-            'Accept': 'text/turtle'
-        }
-
-        params = {
-            'query': query
-        }
-
         try:
             print('Fazendo a operação CONSTRUCT')
             print(f'Query utilizada:\n{query}')
-            response = requests.get(
-                self.query_endpoint,
-                params=params,
-                headers=headers
-            )
-
-            if response.status_code == 200:
-                return {
-                    "success": True,
-                    "graph": response.text,
-                    "format": "turtle"
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Erro na query: {response.text}",
-                    "status_code": response.status_code
-                }
-
-        except Exception as e:
             return {
-                "success": False,
-                "message": f"Erro inesperado: {str(e)}"
+                "success": True,
+                "graph": self.backend.construct(query),
+                "format": "turtle"
             }
 
+        except Exception as e:
+            return self._failure(e, 'Erro na query')
+
     def update(self, query: str) -> Dict[str, Any]:
         """
         Executa uma operação SPARQL UPDATE (INSERT, DELETE, etc).
@@ -192,38 +201,86 @@ class SparqlQuery:
         Returns:
             dict com status da operação
         """
-        headers = {
-            'Content-Type': 'application/sparql-update'
-        }
-
         try:
             print('Fazendo a operação UPDATE')
             print(f'Query utilizada:\n{query}')
-            response = requests.post(
-                self.update_endpoint,
-                data=query.encode('utf-8'),
-                headers=headers,
-                auth=self.auth
-            )
-
-            if response.status_code in [200, 204]:
-                return {
-                    "success": True,
-                    "message": "Update executado com sucesso"
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Erro no update: {response.text}",
-                    "status_code": response.status_code
-                }
-
-        except Exception as e:
+            self.backend.update(query)
             return {
-                "success": False,
-                "message": f"Erro inesperado: {str(e)}"
+                "success": True,
+                "message": "Update executado com sucesso"
             }
 
+        except Exception as e:
+            return self._failure(e, 'Erro no update')
+
+    def text_search(self, text: str, field: Optional[str] = None, limit: int = 100, where: str = '',
+                    prefixes: str = '', prefix: bool = False, raw: bool = False) -> Dict[str, Any]:
+        """
+        Busca no índice textual (nomes de aeródromos e empresas, indicativos de voo) com `text:query`,
+        em vez de FILTER(regex(...)) sobre todos os literais do dataset.
+
+        Args:
+            text: termos buscados
+            field: campo de TEXT_FIELDS ('label', 'empresa', 'aerodromo_origem', 'aerodromo_destino',
+                'callsign') ou IRI de uma propriedade indexada
+            limit: máximo de resultados
+            where: padrões adicionais sobre ?s (ex.: '?s a ad:Flight .')
+            prefixes: declarações PREFIX usadas em `where`
+            prefix: busca por prefixo de cada termo
+            raw: `text` já está na sintaxe do Lucene
+
+        Returns:
+            dict com resultados (?s, ?score, ?literal) ordenados pela relevância
+        """
+        pattern = text_query_pattern(text, field=field, limit=limit, prefix=prefix, raw=raw)
+        query = f"""
+        PREFIX text: <http://jena.apache.org/text#>
+        {prefixes}
+        SELECT ?s ?score ?literal
+        WHERE {{
+            {pattern}
+            {where}
+        }}
+        ORDER BY DESC(?score)
+        LIMIT {int(limit)}
+        """
+
+        print(f'Busca textual: {text!r} (campo: {field or "label"})')
+        return self.select(query)
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float = 50, limit: int = 10,
+               where: str = '', prefixes: str = '') -> Dict[str, Any]:
+        """
+        Aeródromos/estações METAR em um raio ao redor do ponto, pelo índice espacial GeoSPARQL
+        (spatial:nearby), em vez de calcular a distância de cada geometria na consulta. Exige o Fuseki
+        com o módulo GeoSPARQL e o <#geo_dataset> habilitado em fuseki-config/airdata.ttl.
+
+        Args:
+            latitude, longitude: ponto em graus
+            radius_km: raio da busca em km
+            limit: máximo de resultados
+            where: padrões adicionais sobre ?feature
+            prefixes: declarações PREFIX usadas em `where`
+
+        Returns:
+            dict com resultados (?feature, ?label)
+        """
+        query = f"""
+        PREFIX spatial: <http://jena.apache.org/spatial#>
+        PREFIX units: <http://www.opengis.net/def/uom/OGC/1.0/>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        {prefixes}
+        SELECT ?feature ?label
+        WHERE {{
+            ?feature spatial:nearby ({float(latitude)} {float(longitude)} {float(radius_km)} units:kilometre {int(limit)}) .
+            OPTIONAL {{ ?feature rdfs:label ?label }}
+            {where}
+        }}
+        """
+
+        print(f'Busca espacial: ({latitude}, {longitude}) em {radius_km} km')
+        return self.select(query)
+
     def get_all_triples(self, limit: Optional[int] = None) -> Dict[str, Any]:
         """
         Recupera todas as triplas do dataset (útil para testes).
@@ -1,9 +1,82 @@
 import os
 import sys
+from contextlib import nullcontext
 
-import requests
 from typing import Optional
-from requests.auth import HTTPBasicAuth
+
+# Linhas do manifesto gravadas por transação / lidas por vez
+MANIFEST_BATCH = 500
+
+
+class ResultManifest:
+    """
+    Manifesto dos resultados de uma carga (um arquivo SQLite, uma linha por arquivo Turtle).
+
+    Fica fora do XCom: apenas o caminho do manifesto e as contagens passam entre as tasks, e o
+    resultado de cada arquivo (mensagens e tracebacks do Fuseki) é lido em lotes por quem precisa.
+    """
+
+    def __init__(self, path: str):
+        import sqlite3
+
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Uma nova tentativa da task recomeça o manifesto
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE results (
+                file_path TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                status_code INTEGER,
+                message TEXT,
+                error TEXT,
+                traceback TEXT
+            )
+        """)
+        self._rows = []
+
+    def add(self, file_path: str, result: dict):
+        self._rows.append((
+            file_path,
+            int(bool(result.get('success'))),
+            result.get('status_code'),
+            result.get('message'),
+            result.get('error'),
+            result.get('traceback'),
+        ))
+        if len(self._rows) >= MANIFEST_BATCH:
+            self.flush()
+
+    def flush(self):
+        with self.conn:
+            self.conn.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)', self._rows)
+        self._rows = []
+
+    def close(self) -> dict:
+        """Grava as linhas pendentes e retorna a referência ao manifesto (caminho e contagens)"""
+        self.flush()
+        files, succeeded = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(success), 0) FROM results').fetchone()
+        self.conn.close()
+        return {'manifest': self.path, 'files': files, 'succeeded': succeeded, 'failed': files - succeeded}
+
+
+def read_manifest(path: str, batch_size: int = MANIFEST_BATCH):
+    """Lê o manifesto em lotes de `batch_size` resultados (gerador de listas de dicts)"""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute('SELECT * FROM results ORDER BY rowid')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+    finally:
+        conn.close()
 
 
 class TurtleLoader:
@@ -12,32 +85,71 @@ class TurtleLoader:
     """
 
     def __init__(self, fuseki_url: str = "http://localhost:3030", dataset: str = "airdata",
-                 auth_user: str = "admin", auth_pass: str = "admin123", verbose: bool = True):
+                 auth_user: str = "admin", auth_pass: str = "admin123", verbose: bool = True,
+                 metrics=None, ontology_path: Optional[str] = None, backend=None):
         """
         Inicializa o loader com a URL do Fuseki e o dataset.
 
         Args:
             fuseki_url: URL base do servidor Fuseki (padrão: http://localhost:3030)
             dataset: Nome do dataset no Fuseki (padrão: ds)
+            metrics: COMMON.metrics.Metrics opcional (tempo/bytes de leitura e de envio ao Fuseki)
+            ontology_path: ontologia (.ttl) para materializar o fecho RDFS de cada arquivo na carga
+                (JENA_FUSEKI.rdfs_inference); se None, carrega só as triplas declaradas
+            backend: instância de backend (FusekiBackend, OxigraphBackend) ou nome ('fuseki', 'oxigraph');
+                padrão: o Fuseki em `fuseki_url`
         """
+        from JENA_FUSEKI.rdf_backends import get_backend
+
         self.fuseki_url = fuseki_url.rstrip('/')
         self.dataset = dataset
         self.data_endpoint = f"{self.fuseki_url}/{dataset}/data"
-        self.auth = HTTPBasicAuth(auth_user, auth_pass) if auth_user and auth_pass else None
+        self.backend = get_backend(backend, fuseki_url=fuseki_url, dataset=dataset,
+                                   auth_user=auth_user, auth_pass=auth_pass)
         self.verbose = verbose
+        self.metrics = metrics
+        self.ontology_index = None
+        self.inferred_triples = 0
+        if ontology_path:
+            from JENA_FUSEKI.rdfs_inference import load_index
+
+            with self.stage('ontology_index', rows=1, bytes=os.path.getsize(ontology_path)):
+                self.ontology_index = load_index(ontology_path)
         print('Instância da classe TurtleLoader criada!')
         print('informações do objeto:')
+        print(f'{self.backend.name=}')
         print(f'{self.fuseki_url=}')
         print(f'{self.dataset=}')
         print(f'{self.data_endpoint=}')
         print(f'{self.verbose=}')
+        print(f'{ontology_path=}')
 
     def print(self, *args, **kwargs):
         if self.verbose:
             print(*args, **kwargs)
 
-    def load_from_directory(self, dir_path: str, graph_uri: Optional[str] = None) -> dict:
+    def stage(self, name: str, rows: int = 0, bytes: int = 0):
+        """Mede o bloco como um estágio das métricas (sem métricas, não faz nada)"""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.stage(name, rows=rows, bytes=bytes)
+
+    def load_from_directory(self, dir_path: str, graph_uri: Optional[str] = None,
+                            manifest_path: Optional[str] = None) -> dict:
+        """
+        Carrega todos os arquivos .ttl do diretório (e subdiretórios não ocultos) no Fuseki.
+
+        Args:
+            dir_path: diretório dos arquivos .ttl
+            graph_uri: URI do grafo nomeado (opcional)
+            manifest_path: se informado, os resultados vão para um manifesto SQLite nesse caminho
+                (ResultManifest) e o retorno é só a referência a ele
+
+        Returns:
+            resultados por campo (listas) ou, com `manifest_path`, {'manifest', 'files', 'succeeded', 'failed'}
+        """
         self.print(f'Arquivos serão carregados pelo diretório {dir_path}')
+        manifest = ResultManifest(manifest_path) if manifest_path else None
 
         # estrutura "total" de result = {
         #     'success': bool,
@@ -47,21 +159,30 @@ class TurtleLoader:
         #     'traceback': str
         # }
         total_result = {
+            'file_path': [],
             'success': [],
             'message': [],
             'status_code': [],
             'error': [],
             'traceback': []
         }
-        for dir, _, file_names in os.walk(dir_path):
-            for file_name in file_names:
+        for dir, dir_names, file_names in os.walk(dir_path):
+            # Diretórios ocultos (ex: caches) não são percorridos e só arquivos .ttl são carregados
+            dir_names[:] = sorted(name for name in dir_names if not name.startswith('.'))
+            for file_name in sorted(file_names):
+                if file_name.startswith('.') or not file_name.endswith('.ttl'):
+                    continue
                 file_path = os.path.join(dir, file_name)
                 self.print(f'Arquivo selecionado: {file_path}')
                 result = self.load_from_file(file_path=file_path, graph_uri=graph_uri)
                 self.print(result)
 
+                if manifest:
+                    manifest.add(file_path, result)
+                    continue
+                total_result['file_path'].append(file_path)
                 # Armazena os resultados de todas as inserções
-                possible_fields = ['succes', 'message', 'status_code', 'error', 'traceback']
+                possible_fields = ['success', 'message', 'status_code', 'error', 'traceback']
                 for field in possible_fields:
                     if field in result.keys():
                         total_result[field].append(result[field])
@@ -69,6 +190,8 @@ class TurtleLoader:
                         total_result[field].append(None)
 
         self.print('Arquivos carregados com sucesso, retornando resultados')
+        if manifest:
+            return manifest.close()
         return total_result
 
     def load_from_file(self, file_path: str, graph_uri: Optional[str] = None) -> dict:
@@ -83,9 +206,10 @@ class TurtleLoader:
             dict com status da operação
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                ttl_content = file.read()
-                self.print('Arquivo lido!')
+            with self.stage('read', rows=1, bytes=os.path.getsize(file_path)):
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    ttl_content = file.read()
+            self.print('Arquivo lido!')
             return self.load_from_string(ttl_content, graph_uri)
 
         except FileNotFoundError:
@@ -111,47 +235,57 @@ class TurtleLoader:
             dict com status da operação
         """
         self.print(f'String lida {ttl_content[:300]}')
-        headers = {
-            'Content-Type': 'text/turtle; charset=utf-8'
-        }
-
-        # Se especificar graph_uri, usa named graph
-        params = {}
-        if graph_uri:
-            params['graph'] = graph_uri
+        content_type = 'text/turtle'
 
-        try:
-            self.print('Fazendo a requisição!')
-            response = requests.post(
-                self.data_endpoint,
-                data=ttl_content.encode('utf-8'),
-                headers=headers,
-                params=params,
-                auth=self.auth
-            )
+        # Fecho RDFS do arquivo em relação à ontologia, enviado junto com as triplas declaradas
+        if self.ontology_index is not None:
+            from JENA_FUSEKI.rdfs_inference import materialize_turtle
 
-            if response.status_code in [200, 201, 204]:
-                self.print('Dados carregados com sucesso!')
-                return {
-                    "success": True,
-                    "message": "Dados carregados com sucesso",
-                    "status_code": response.status_code
-                }
-            else:
-                self.print(f'Código de resposta não positivo. Código: {response.status_code}')
+            try:
+                with self.stage('inference', rows=1, bytes=len(ttl_content)):
+                    ttl_content, asserted, inferred = materialize_turtle(ttl_content, self.ontology_index)
+            except Exception as e:
+                import traceback
                 return {
                     "success": False,
-                    "message": f"Erro ao carregar dados: {response.text}",
-                    "status_code": response.status_code
+                    "message": f"Erro na inferência RDFS: {str(e)}",
+                    "error": str(e),
+                    "traceback": traceback.format_exc()
                 }
+            self.inferred_triples += inferred
+            self.print(f'Inferência RDFS: {asserted} triplas declaradas, {inferred} inferidas')
+            content_type = 'application/n-triples'
+
+        from JENA_FUSEKI.rdf_backends import BackendError, BackendUnavailable
+
+        try:
+            self.print('Fazendo a requisição!')
+            data = ttl_content.encode('utf-8')
+            # Se especificar graph_uri, usa named graph
+            with self.stage(f'{self.backend.name}_write', rows=1, bytes=len(data)):
+                status_code = self.backend.load(data, content_type, graph_uri)
+
+            self.print('Dados carregados com sucesso!')
+            return {
+                "success": True,
+                "message": "Dados carregados com sucesso",
+                "status_code": status_code
+            }
 
-        except requests.exceptions.ConnectionError as e:
+        except BackendUnavailable as e:
             self.print('Não foi possivel conectar ao Fuseki')
             return {
                 "success": False,
                 "message": "Não foi possível conectar ao Fuseki. Verifique se está rodando.",
                 "error": str(e)
             }
+        except BackendError as e:
+            self.print(f'Código de resposta não positivo. Código: {e.status_code}')
+            return {
+                "success": False,
+                "message": f"Erro ao carregar dados: {str(e)}",
+                "status_code": e.status_code
+            }
         except Exception as e:
             self.print('Erro inesperado!!')
             import traceback
@@ -172,8 +306,7 @@ class TurtleLoader:
         Returns:
             dict com status da operação
         """
-        # Endpoint de update (não de data)
-        update_endpoint = f"{self.fuseki_url}/{self.dataset}/update"
+        from JENA_FUSEKI.rdf_backends import BackendError
 
         # Construir a query SPARQL DELETE apropriada
         if graph_uri:
@@ -194,38 +327,28 @@ class TurtleLoader:
             }
             """
 
-        headers = {
-            'Content-Type': 'application/sparql-update'
-        }
-
         try:
             self.print('Realizando a requisição da limpeza do dataset')
             self.print(f'Query:\n{sparql_update}')
-            response = requests.post(
-                update_endpoint,
-                data=sparql_update.encode('utf-8'),
-                headers=headers,
-                auth=self.auth
-            )
+            self.backend.update(sparql_update)
 
-            if response.status_code in [200, 204]:
-                if graph_uri:
-                    msg = f"Grafo <{graph_uri}> limpo com sucesso"
-                else:
-                    msg = "Dataset (grafo padrão) limpo com sucesso"
-                self.print(f'{msg}')
-                return {
-                    "success": True,
-                    "message": msg
-                }
+            if graph_uri:
+                msg = f"Grafo <{graph_uri}> limpo com sucesso"
             else:
-                self.print(f"Erro ao limpar dataset: {response.text}")
-                return {
-                    "success": False,
-                    "message": f"Erro ao limpar dataset: {response.text}",
-                    "status_code": response.status_code
-                }
+                msg = "Dataset (grafo padrão) limpo com sucesso"
+            self.print(f'{msg}')
+            return {
+                "success": True,
+                "message": msg
+            }
 
+        except BackendError as e:
+            self.print(f"Erro ao limpar dataset: {str(e)}")
+            return {
+                "success": False,
+                "message": f"Erro ao limpar dataset: {str(e)}",
+                "status_code": e.status_code
+            }
         except Exception as e:
             import traceback
             return {
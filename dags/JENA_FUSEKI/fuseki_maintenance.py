@@ -0,0 +1,114 @@
+from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
+from airflow.sdk import dag, task
+
+# Fuseki na rede jena-network (nome do container) e diretório TDB2 do dataset (volume fuseki-data)
+FUSEKI_URL = "http://jena-fuseki:3030"
+JENA_FUSEKI_DATABASE = "airdata"
+DATABASE_DIR = "/fuseki/databases/airdata"
+AUTH_USER = "admin"
+AUTH_PASS = "admin123"
+
+
+def get_admin():
+    from JENA_FUSEKI.FusekiAdmin import FusekiAdmin
+
+    return FusekiAdmin(
+        fuseki_url=FUSEKI_URL,
+        dataset=JENA_FUSEKI_DATABASE,
+        auth_user=AUTH_USER,
+        auth_pass=AUTH_PASS,
+        database_dir=DATABASE_DIR
+    )
+
+
+@dag(dag_id='fuseki_maintenance', schedule='0 3 * * 0', max_active_runs=1)
+def fuseki_maintenance():
+    """
+    Manutenção semanal do TDB2 do Fuseki: compactação (libera o espaço das gerações antigas) e
+    estatísticas do otimizador (stats.opt). Tamanho do armazenamento e latência das consultas de
+    prova são medidos antes e depois e registrados em airdata.fuseki_maintenance.
+    """
+    # Task para criar a tabela de histórico da manutenção se não existir
+    create_table = SQLExecuteQueryOperator(
+        task_id='create_table',
+        conn_id='postgres',
+        sql="""
+        CREATE TABLE IF NOT EXISTS airdata.fuseki_maintenance (
+            id SERIAL PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            triples BIGINT,                      -- triplas no dataset
+            store_bytes_before BIGINT,           -- tamanho do diretório TDB2 antes da compactação
+            store_bytes_after BIGINT,            -- tamanho depois da compactação
+            generations_before INTEGER,          -- gerações Data-NNNN antes da compactação
+            probe_p50_ms_before REAL,            -- latência das consultas de prova antes
+            probe_p95_ms_before REAL,
+            probe_p50_ms_after REAL,             -- latência das consultas de prova depois
+            probe_p95_ms_after REAL,
+            compact_seconds REAL,                -- duração da compactação
+            compacted BOOLEAN NOT NULL,
+            stats_predicates INTEGER             -- predicados no stats.opt gravado
+        );
+        CREATE INDEX IF NOT EXISTS fuseki_maintenance_run_at_idx ON airdata.fuseki_maintenance (dataset, run_at);
+        """
+    )
+
+    @task
+    def measure() -> dict:
+        """Task para medir o tamanho do armazenamento e a latência das consultas de prova"""
+        admin = get_admin()
+        size = admin.store_size()
+        probe = admin.probe()
+        return {"bytes": size['bytes'], "generations": len(size['generations']), **probe}
+
+    @task
+    def compact() -> dict:
+        """Task para compactar o dataset (apagando a geração anterior)"""
+        result = get_admin().compact(delete_old=True)
+        if not result['success']:
+            raise RuntimeError(result['message'])
+        return result
+
+    @task
+    def update_stats() -> dict:
+        """Task para regenerar as estatísticas do otimizador (stats.opt) a partir das contagens por predicado"""
+        admin = get_admin()
+        result = admin.write_stats(admin.predicate_counts())
+        # Sem permissão de escrita no volume a manutenção segue, só sem as estatísticas
+        print(result['message'])
+        return result
+
+    @task
+    def record(before: dict, compaction: dict, stats: dict, after: dict):
+        """Task para registrar a execução em airdata.fuseki_maintenance"""
+        from COMMON.db import get_connection
+
+        conn = get_connection()
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO airdata.fuseki_maintenance (
+                    dataset, triples, store_bytes_before, store_bytes_after, generations_before,
+                    probe_p50_ms_before, probe_p95_ms_before, probe_p50_ms_after, probe_p95_ms_after,
+                    compact_seconds, compacted, stats_predicates
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    JENA_FUSEKI_DATABASE, after['triples'], before['bytes'], after['bytes'], before['generations'],
+                    before['p50_ms'], before['p95_ms'], after['p50_ms'], after['p95_ms'],
+                    compaction.get('seconds'), compaction['success'], stats.get('predicates'),
+                )
+            )
+        conn.close()
+        print(f"Armazenamento: {before['bytes'] / 1024 ** 2:.1f} MB -> {after['bytes'] / 1024 ** 2:.1f} MB")
+        print(f"Consultas de prova (p95): {before['p95_ms']} ms -> {after['p95_ms']} ms")
+
+    before = measure.override(task_id='measure_before')()
+    compaction = compact()
+    stats = update_stats()
+    after = measure.override(task_id='measure_after')()
+    create_table >> before >> compaction >> stats >> after
+    record(before, compaction, stats, after)
+
+
+fuseki_maintenance()
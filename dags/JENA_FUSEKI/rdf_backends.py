@@ -0,0 +1,201 @@
+"""
+Backends RDF usados por SparqlQuery e TurtleLoader.
+
+    FusekiBackend     Apache Jena Fuseki por HTTP (SPARQL Protocol e Graph Store Protocol)
+    OxigraphBackend   armazenamento embarcado no processo (pyoxigraph), em memória ou em disco
+    VirtualGraphBackend  (JENA_FUSEKI.virtual_graph) SELECT traduzido em SQL sobre as tabelas do Postgres
+
+Os dois expõem a mesma interface (select, ask, construct, update, load, dump) e devolvem os mesmos
+formatos (resultados SPARQL em JSON, grafos em Turtle), então as classes e as DAGs funcionam com
+qualquer um. O backend embarcado não paga serialização HTTP por chamada, roda sem servidor (testes,
+análises pequenas) e pode servir de réplica de leitura de um Fuseki para jobs com muitas consultas:
+
+    replica = OxigraphBackend('/tmp/airdata-replica')
+    replicate(FusekiBackend('http://jena-fuseki:3030'), replica)
+    SparqlQuery(backend=replica).select('SELECT ...')
+
+Um armazenamento em disco do Oxigraph só pode ser aberto para escrita por um processo de cada vez.
+"""
+import json
+import os
+from typing import Any, Dict, Optional
+
+# Diretório padrão do armazenamento embarcado (sem valor: em memória)
+OXIGRAPH_PATH = os.environ.get('AIRDATA_OXIGRAPH_PATH')
+
+
+class BackendError(Exception):
+    """Operação recusada pelo backend (status HTTP do Fuseki ou erro do armazenamento embarcado)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BackendUnavailable(BackendError):
+    """Backend inacessível (ex: Fuseki fora do ar)"""
+
+
+class FusekiBackend:
+    """Dataset de um Apache Jena Fuseki acessado por HTTP"""
+
+    name = 'fuseki'
+
+    def __init__(self, fuseki_url: str = "http://localhost:3030", dataset: str = "airdata",
+                 auth_user: str = "admin", auth_pass: str = "admin123"):
+        from requests.auth import HTTPBasicAuth
+
+        self.fuseki_url = fuseki_url.rstrip('/')
+        self.dataset = dataset
+        self.query_endpoint = f"{self.fuseki_url}/{dataset}/query"
+        self.update_endpoint = f"{self.fuseki_url}/{dataset}/update"
+        self.data_endpoint = f"{self.fuseki_url}/{dataset}/data"
+        self.auth = HTTPBasicAuth(auth_user, auth_pass) if auth_user and auth_pass else None
+
+    def _request(self, method: str, url: str, ok: tuple = (200,), **kwargs):
+        import requests
+
+        try:
+            response = requests.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            raise BackendUnavailable(f"Não foi possível conectar ao Fuseki ({e}). Verifique se está rodando.")
+        if response.status_code not in ok:
+            raise BackendError(response.text, response.status_code)
+        return response
+
+    def select(self, query: str) -> Dict[str, Any]:
+        """Resultados de um SELECT no formato SPARQL JSON ({'head': ..., 'results': {'bindings': ...}})"""
+        return self._request('GET', self.query_endpoint, params={'query': query},
+                             headers={'Accept': 'application/sparql-results+json'}).json()
+
+    def ask(self, query: str) -> bool:
+        return self._request('GET', self.query_endpoint, params={'query': query},
+                             headers={'Accept': 'application/sparql-results+json'}).json().get('boolean', False)
+
+    def construct(self, query: str) -> str:
+        """Grafo resultante em Turtle"""
+        return self._request('GET', self.query_endpoint, params={'query': query},
+                             headers={'Accept': 'text/turtle'}).text
+
+    def update(self, query: str) -> int:
+        return self._request('POST', self.update_endpoint, ok=(200, 204), data=query.encode('utf-8'),
+                             headers={'Content-Type': 'application/sparql-update'}, auth=self.auth).status_code
+
+    def load(self, data: bytes, content_type: str = 'text/turtle', graph_uri: Optional[str] = None) -> int:
+        """Acrescenta triplas (Turtle, N-Triples...) ao grafo padrão ou a `graph_uri`; retorna o status HTTP"""
+        return self._request('POST', self.data_endpoint, ok=(200, 201, 204), data=data,
+                             headers={'Content-Type': f'{content_type}; charset=utf-8'},
+                             params={'graph': graph_uri} if graph_uri else {}, auth=self.auth).status_code
+
+    def dump(self) -> bytes:
+        """Todo o dataset (grafo padrão e grafos nomeados) em N-Quads"""
+        return self._request('GET', f"{self.fuseki_url}/{self.dataset}", headers={'Accept': 'application/n-quads'},
+                             auth=self.auth, timeout=3600).content
+
+
+class OxigraphBackend:
+    """Armazenamento RDF embarcado (pyoxigraph): em memória ou persistido em `path`"""
+
+    name = 'oxigraph'
+
+    def __init__(self, path: Optional[str] = OXIGRAPH_PATH, read_only: bool = False):
+        """
+        Args:
+            path: diretório do armazenamento (None: em memória, descartado ao fim do processo)
+            read_only: abre um armazenamento existente só para leitura (vários processos ao mesmo tempo)
+        """
+        from pyoxigraph import Store
+
+        self.path = path
+        if path and read_only:
+            self.store = Store.read_only(path)
+        else:
+            self.store = Store(path) if path else Store()
+
+    @staticmethod
+    def _format(content_type: str):
+        from pyoxigraph import RdfFormat
+
+        rdf_format = RdfFormat.from_media_type(content_type.split(';')[0].strip())
+        if rdf_format is None:
+            raise BackendError(f"Formato RDF não suportado: {content_type}", 415)
+        return rdf_format
+
+    def _query(self, query: str):
+        try:
+            return self.store.query(query)
+        except (SyntaxError, ValueError, OSError) as e:
+            raise BackendError(str(e), 400)
+
+    def select(self, query: str) -> Dict[str, Any]:
+        from pyoxigraph import QueryResultsFormat
+
+        return json.loads(self._query(query).serialize(format=QueryResultsFormat.JSON))
+
+    def ask(self, query: str) -> bool:
+        return bool(self._query(query))
+
+    def construct(self, query: str) -> str:
+        from pyoxigraph import RdfFormat
+
+        return self._query(query).serialize(format=RdfFormat.TURTLE).decode('utf-8')
+
+    def update(self, query: str) -> int:
+        try:
+            self.store.update(query)
+        except (SyntaxError, ValueError, OSError) as e:
+            raise BackendError(str(e), 400)
+        return 204
+
+    def load(self, data: bytes, content_type: str = 'text/turtle', graph_uri: Optional[str] = None) -> int:
+        from pyoxigraph import NamedNode
+
+        try:
+            if graph_uri:
+                self.store.load(data, self._format(content_type), to_graph=NamedNode(graph_uri))
+            else:
+                self.store.load(data, self._format(content_type))
+        except (SyntaxError, ValueError, OSError) as e:
+            raise BackendError(str(e), 400)
+        return 200
+
+    def dump(self) -> bytes:
+        from pyoxigraph import RdfFormat
+
+        return self.store.dump(format=RdfFormat.N_QUADS)
+
+
+def get_backend(backend=None, **fuseki_kwargs):
+    """
+    Backend a partir de uma instância, de um nome ('fuseki', 'oxigraph', 'postgres') ou de None (Fuseki).
+    `fuseki_kwargs` (fuseki_url, dataset, auth_user, auth_pass) configuram o FusekiBackend.
+    """
+    if backend is None or backend == 'fuseki':
+        return FusekiBackend(**fuseki_kwargs)
+    if backend == 'oxigraph':
+        return OxigraphBackend()
+    if backend == 'postgres':
+        from JENA_FUSEKI.virtual_graph import VirtualGraphBackend
+
+        return VirtualGraphBackend()
+    if isinstance(backend, str):
+        raise ValueError(f"Backend RDF desconhecido: {backend}")
+    return backend
+
+
+def replicate(source, target: OxigraphBackend) -> int:
+    """
+    Copia todo o dataset de `source` (ex: Fuseki) para o armazenamento embarcado, substituindo o conteúdo.
+
+    Returns:
+        quantidade de quads no armazenamento embarcado
+    """
+    from pyoxigraph import RdfFormat
+
+    data = source.dump()
+    target.store.clear()
+    target.store.bulk_load(data, RdfFormat.N_QUADS)
+    target.store.optimize()
+    count = len(target.store)
+    print(f'[RDF] Réplica de {source.name} em {target.path or "memória"}: {count} quads')
+    return count
@@ -0,0 +1,178 @@
+"""
+Materialização RDFS na carga dos arquivos Turtle.
+
+Em vez de deixar o Fuseki inferir na consulta (modelos de inferência ou caminhos como
+`rdf:type/rdfs:subClassOf*`, lentos), cada lote recebe na carga o fecho RDFS em relação à
+ontologia, e as consultas por classe ou superpropriedade viram buscas simples por padrão de tripla.
+
+A ontologia é pré-indexada uma única vez (OntologyIndex, com os fechos transitivos já calculados)
+e o índice fica em cache em memória e em disco (pickle, pela hash do arquivo da ontologia, da
+versão do índice e dos termos excluídos, em ONTOLOGY_CACHE_DIR, fora dos diretórios de Turtle
+lidos pela carga). Para cada
+tripla do lote, em uma única passada:
+
+    rdfs7   (s p o), p ⊑ q                    → (s q o)
+    rdfs2   (s p o), p (ou superprop.) domain C  → (s rdf:type C e superclasses de C)
+    rdfs3   (s p o), p (ou superprop.) range C   → (o rdf:type C e superclasses de C), o não literal
+    rdfs9   (s rdf:type C), C ⊑ D             → (s rdf:type D)
+
+Exemplo:
+
+    index = load_index('/opt/airflow/turtles/ontology/ontology_airdata.ttl')
+    content, asserted, inferred = materialize_turtle(ttl_content, index)
+"""
+import hashlib
+import os
+import pickle
+from typing import NamedTuple
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS_SUBCLASSOF = 'http://www.w3.org/2000/01/rdf-schema#subClassOf'
+RDFS_SUBPROPERTYOF = 'http://www.w3.org/2000/01/rdf-schema#subPropertyOf'
+RDFS_DOMAIN = 'http://www.w3.org/2000/01/rdf-schema#domain'
+RDFS_RANGE = 'http://www.w3.org/2000/01/rdf-schema#range'
+
+# Superclasses e superpropriedades universais que não são materializadas (todo indivíduo é owl:Thing e
+# toda relação é owl:topObjectProperty/owl:topDataProperty: só aumentariam o dataset)
+EXCLUDED_TERMS = {
+    'http://www.w3.org/2002/07/owl#Thing',
+    'http://www.w3.org/2002/07/owl#topObjectProperty',
+    'http://www.w3.org/2002/07/owl#topDataProperty',
+}
+
+# Versão do formato do índice: incrementar ao mudar build_index/OntologyIndex (invalida os caches)
+INDEX_VERSION = 2
+
+# Cache em disco dos índices da ontologia
+ONTOLOGY_CACHE_DIR = os.environ.get('AIRDATA_ONTOLOGY_CACHE_DIR', '/opt/airflow/data/ontology_cache')
+
+# Índices em memória por hash da ontologia (reaproveitados entre arquivos e lotes do mesmo processo)
+_INDEX_CACHE = {}
+
+
+class OntologyIndex(NamedTuple):
+    """Ontologia pré-indexada: fechos transitivos e domínios/imagens já expandidos"""
+    super_properties: dict      # propriedade -> superpropriedades (fecho de rdfs:subPropertyOf)
+    super_classes: dict         # classe -> superclasses (fecho de rdfs:subClassOf)
+    domains: dict               # propriedade -> classes do sujeito (com superpropriedades e superclasses)
+    ranges: dict                # propriedade -> classes do objeto (com superpropriedades e superclasses)
+
+
+def _closure(edges: dict) -> dict:
+    """Fecho transitivo (sem o próprio nó) de um grafo {nó: {vizinhos}}"""
+    closure = {}
+    for start in edges:
+        seen = set()
+        stack = list(edges[start])
+        while stack:
+            node = stack.pop()
+            if node in seen or node == start:
+                continue
+            seen.add(node)
+            stack.extend(edges.get(node, ()))
+        closure[start] = seen
+    return closure
+
+
+def build_index(ontology, excluded: set = EXCLUDED_TERMS) -> OntologyIndex:
+    """Pré-indexa uma ontologia (rdflib.Graph)"""
+    from rdflib import URIRef
+
+    excluded = {URIRef(term) for term in excluded}
+
+    def edges(predicate: str) -> dict:
+        result = {}
+        for subject, obj in ontology.subject_objects(URIRef(predicate)):
+            if isinstance(subject, URIRef) and isinstance(obj, URIRef) and obj not in excluded:
+                result.setdefault(subject, set()).add(obj)
+        return result
+
+    super_properties = _closure(edges(RDFS_SUBPROPERTYOF))
+    super_classes = _closure(edges(RDFS_SUBCLASSOF))
+
+    def expanded(predicate: str) -> dict:
+        # Domínio/imagem de uma propriedade valem também para as suas subpropriedades
+        direct = edges(predicate)
+        result = {}
+        for prop in set(direct) | set(super_properties):
+            classes = set()
+            for source in {prop} | super_properties.get(prop, set()):
+                classes |= direct.get(source, set())
+            for cls in list(classes):
+                classes |= super_classes.get(cls, set())
+            if classes:
+                result[prop] = classes
+        return result
+
+    return OntologyIndex(super_properties, super_classes, expanded(RDFS_DOMAIN), expanded(RDFS_RANGE))
+
+
+def load_index(ontology_path: str, cache_dir: str | None = None) -> OntologyIndex:
+    """
+    Índice da ontologia, do cache em memória, do cache em disco (`cache_dir`, padrão:
+    ONTOLOGY_CACHE_DIR) ou, se a ontologia mudou, construído e gravado no cache.
+    """
+    with open(ontology_path, 'rb') as file:
+        content = file.read()
+    # Índices gravados por outra versão de build_index ou com outros termos excluídos não servem
+    digest = hashlib.sha256(content)
+    digest.update(f'{INDEX_VERSION}\n{sorted(EXCLUDED_TERMS)}'.encode('utf-8'))
+    digest = digest.hexdigest()
+    if digest in _INDEX_CACHE:
+        return _INDEX_CACHE[digest]
+
+    cache_dir = cache_dir or ONTOLOGY_CACHE_DIR
+    cache_path = os.path.join(cache_dir, f'ontology_{digest[:16]}.pickle')
+    try:
+        with open(cache_path, 'rb') as file:
+            index = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        from rdflib import Graph
+
+        index = build_index(Graph().parse(data=content, format='turtle'))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, 'wb') as file:
+                pickle.dump(index, file)
+        except OSError as e:
+            print(f'[RDFS] Índice da ontologia não gravado em cache: {e}')
+    _INDEX_CACHE[digest] = index
+    return index
+
+
+def materialize(graph, index: OntologyIndex) -> set:
+    """Triplas inferidas pelas regras RDFS (rdfs2, rdfs3, rdfs7, rdfs9) que ainda não estão no grafo"""
+    from rdflib import Literal, URIRef
+
+    rdf_type = URIRef(RDF_TYPE)
+    inferred = set()
+    for subject, predicate, obj in graph:
+        for super_property in index.super_properties.get(predicate, ()):
+            inferred.add((subject, super_property, obj))
+        for cls in index.domains.get(predicate, ()):
+            inferred.add((subject, rdf_type, cls))
+        if not isinstance(obj, Literal):
+            for cls in index.ranges.get(predicate, ()):
+                inferred.add((obj, rdf_type, cls))
+        if predicate == rdf_type:
+            for cls in index.super_classes.get(obj, ()):
+                inferred.add((subject, rdf_type, cls))
+    return {triple for triple in inferred if triple not in graph}
+
+
+def materialize_turtle(content: str, index: OntologyIndex) -> tuple[str, int, int]:
+    """
+    Acrescenta o fecho RDFS a um conteúdo Turtle.
+
+    Returns:
+        (N-Triples com as triplas declaradas e inferidas, quantidade declarada, quantidade inferida)
+    """
+    from rdflib import Graph
+
+    graph = Graph().parse(data=content, format='turtle')
+    asserted = len(graph)
+    inferred = materialize(graph, index)
+    for triple in inferred:
+        graph.add(triple)
+    # N-Triples em um único documento: nós em branco mantêm a identidade entre declaradas e inferidas
+    return graph.serialize(format='nt'), asserted, len(inferred)
@@ -0,0 +1,809 @@
+"""
+Grafo virtual: consultas SPARQL com o vocabulário ad: respondidas direto nas tabelas do Postgres.
+
+Materializar cada linha de airdata.metar, airdata.vra e airdata.taticflow como triplas multiplicaria
+o armazenamento. Em vez disso, um mapeamento no estilo R2RML (MAPPING: tabela -> classes ad:, colunas
+-> propriedades ad:, IRIs montadas por templates com as colunas-chave) traduz um subconjunto de
+consultas SELECT em SQL:
+
+    - padrões de tripla (BGP) com predicado fixo, inclusive `a <classe>`, com ';' e ','
+    - FILTER com comparações (=, !=, <, <=, >, >=) entre variáveis e constantes, && e ||
+    - DISTINCT, ORDER BY, LIMIT e OFFSET
+
+Cada combinação de mapeamentos possível para os sujeitos vira um ramo de UNION ALL. Nós do mesmo
+registro (ex: o METAR, seu vento e seu horário, IRIs com a mesma chave) usam a mesma linha da tabela,
+sem autojunção, e constantes e filtros viram condições sobre as colunas originais (índices como
+(station, valid) do METAR são usados). O resultado volta no formato SPARQL JSON, lido em lotes por um
+cursor do lado do servidor.
+
+    backend = VirtualGraphBackend()
+    SparqlQuery(backend=backend).select('''
+        PREFIX ad: <http://airdata.org/ontology#>
+        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+        SELECT ?valid ?temp WHERE {
+            ?w ad:WeatherCondition-aerodrome <http://airdata.org/resource/aerodrome/SBGR> ;
+               ad:WeatherCondition-time ?t ; ad:WeatherCondition-airTemperatureC ?temp .
+            ?t ad:DateTime-value ?valid .
+            FILTER(?valid >= "2025-01-01T00:00:00"^^xsd:dateTime && ?valid < "2025-01-02T00:00:00"^^xsd:dateTime)
+        } ORDER BY ?valid LIMIT 100
+    ''')
+
+Consultas fora do subconjunto (OPTIONAL, UNION, predicados variáveis, funções...) geram UnsupportedQuery.
+Os horários do VRA estão no horário de Brasília e os do METAR/Tatic Flow em UTC, como nas tabelas.
+"""
+import itertools
+import re
+import uuid
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+AD = 'http://airdata.org/ontology#'
+RESOURCE = 'http://airdata.org/resource/'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# Limite de ramos (combinações de mapeamentos) de uma consulta
+MAX_BRANCHES = 64
+# Linhas lidas por vez do cursor do lado do servidor
+FETCH_SIZE = 5000
+
+
+class UnsupportedQuery(ValueError):
+    """Consulta fora do subconjunto de SPARQL traduzido para SQL"""
+
+
+class PredicateMap(NamedTuple):
+    """
+    Propriedade de um TriplesMap: o objeto é uma coluna (literal), um template de literal
+    ('{sg_empresa_icao}{nr_voo}') ou, com iri=True, um template de IRI (outro nó)
+    """
+    predicate: str
+    column: Optional[str] = None
+    template: Optional[str] = None
+    datatype: Optional[str] = None
+    iri: bool = False
+
+
+class TriplesMap(NamedTuple):
+    """Mapeamento de uma tabela: IRI do sujeito (template com colunas que identificam a linha), classes e propriedades"""
+    name: str
+    table: str
+    subject: str
+    classes: tuple
+    predicates: tuple
+
+    def maps_for(self, predicate: str) -> list:
+        return [predicate_map for predicate_map in self.predicates if predicate_map.predicate == predicate]
+
+
+def _metar_maps() -> list:
+    """METAR (airdata.metar): condição meteorológica, horário, vento, visibilidade, condição do aeródromo e nuvens"""
+    row = RESOURCE + 'metar/{station}/{valid}'
+    clouds = [
+        TriplesMap(f'metar_cloud{layer}', 'airdata.metar', row + f'/cloud{layer}', (AD + 'Cloud',), (
+            PredicateMap(AD + 'Cloud-baseFeet', f'cloud{layer}_base_ft', datatype=XSD + 'integer'),
+            PredicateMap(AD + 'Cloud-type', f'cloud{layer}_type', datatype=XSD + 'string'),
+        ))
+        for layer in range(1, 5)
+    ]
+    return [
+        TriplesMap('metar', 'airdata.metar', row, (AD + 'WeatherCondition',), (
+            PredicateMap(AD + 'WeatherCondition-aerodrome', template=RESOURCE + 'aerodrome/{station}', iri=True),
+            PredicateMap(AD + 'WeatherCondition-time', template=row + '/time', iri=True),
+            PredicateMap(AD + 'WeatherCondition-wind', template=row + '/wind', iri=True),
+            PredicateMap(AD + 'WeatherCondition-visibility', template=row + '/visibility', iri=True),
+            PredicateMap(AD + 'WeatherCondition-aerodromeCondition', template=row + '/condition', iri=True),
+            *[PredicateMap(AD + 'WeatherCondition-cloud', template=row + f'/cloud{layer}', iri=True)
+              for layer in range(1, 5)],
+            PredicateMap(AD + 'WeatherCondition-airTemperatureC', 'tmpc', datatype=XSD + 'decimal'),
+            PredicateMap(AD + 'WeatherCondition-dewpointTemperatureC', 'dwpc', datatype=XSD + 'decimal'),
+            PredicateMap(AD + 'WeatherCondition-reportType', 'report_type', datatype=XSD + 'string'),
+            PredicateMap(AD + 'WeatherCondition-changeIndicator', 'change_indicator', datatype=XSD + 'string'),
+            PredicateMap(RDFS_LABEL, 'metar', datatype=XSD + 'string'),
+        )),
+        TriplesMap('metar_time', 'airdata.metar', row + '/time', (AD + 'DateTime',), (
+            PredicateMap(AD + 'DateTime-value', 'valid', datatype=XSD + 'dateTime'),
+        )),
+        TriplesMap('metar_wind', 'airdata.metar', row + '/wind', (AD + 'Wind',), (
+            PredicateMap(AD + 'Wind-windDirectionDegrees', 'drct', datatype=XSD + 'decimal'),
+            PredicateMap(AD + 'Wind-windSpeedKt', 'sknt', datatype=XSD + 'decimal'),
+            PredicateMap(AD + 'Wind-windGustKt', 'gust', datatype=XSD + 'decimal'),
+        )),
+        TriplesMap('metar_visibility', 'airdata.metar', row + '/visibility', (AD + 'Visibility',), (
+            PredicateMap(AD + 'Visibility-prevailingVisibilityMeters', 'visibility_m', datatype=XSD + 'integer'),
+        )),
+        TriplesMap('metar_condition', 'airdata.metar', row + '/condition', (AD + 'AerodromeCondition',), (
+            PredicateMap(AD + 'AerodromeCondition-qnhHpa', 'qnh_hpa', datatype=XSD + 'decimal'),
+            PredicateMap(AD + 'SignificantWeather', 'significant_weather', datatype=XSD + 'string'),
+            PredicateMap(AD + 'SignificantWeatherIntensity', 'wx_intensity', datatype=XSD + 'string'),
+        )),
+        *clouds,
+    ]
+
+
+def _flight_maps(name: str, table: str, row: str, callsign: PredicateMap, origin: str, destination: str,
+                 flight_type: str, off_block: str, take_off: Optional[str], landing: Optional[str],
+                 in_block: Optional[str]) -> list:
+    """Voo (ad:Flight, operações de partida e chegada) e os eventos com horário de uma tabela de voos"""
+    events = [
+        ('offblock', 'DepartureOperations-offBlock', 'OffBlock', 'offblock', off_block),
+        ('takeoff', 'DepartureOperations-takeOff', 'TakeOff', 'takeoff', take_off),
+        ('landing', 'ArrivalOperations-landing', 'Landing', 'landing', landing),
+        ('inblock', 'ArrivalOperations-inBlock', 'InBlock', 'inblock', in_block),
+    ]
+    events = [event for event in events if event[-1]]
+    return [
+        TriplesMap(name, table, row, (AD + 'Flight', AD + 'DepartureOperations', AD + 'ArrivalOperations'), (
+            callsign,
+            PredicateMap(AD + 'Flight-departureAerodrome', template=RESOURCE + 'aerodrome/{' + origin + '}', iri=True),
+            PredicateMap(AD + 'Flight-destinationAerodrome', template=RESOURCE + 'aerodrome/{' + destination + '}',
+                         iri=True),
+            PredicateMap(AD + 'Flight-type', flight_type, datatype=XSD + 'string'),
+            *[PredicateMap(AD + link, template=f'{row}/{suffix}', iri=True) for suffix, link, _, _, _ in events],
+        )),
+        *[
+            TriplesMap(f'{name}_{suffix}', table, f'{row}/{suffix}', (AD + cls,), (
+                PredicateMap(AD + prop, column, datatype=XSD + 'dateTime'),
+            ))
+            for suffix, _, cls, prop, column in events
+        ],
+    ]
+
+
+MAPPING = [
+    *_metar_maps(),
+    *_flight_maps(
+        'vra', 'airdata.vra', RESOURCE + 'vra/{dt_referencia}/{id}',
+        PredicateMap(AD + 'Flight-aircraftIdentification', template='{sg_empresa_icao}{nr_voo}',
+                     datatype=XSD + 'string'),
+        origin='sg_icao_origem', destination='sg_icao_destino', flight_type='cd_tipo_linha',
+        off_block='dt_partida_real', take_off=None, landing=None, in_block='dt_chegada_real',
+    ),
+    *_flight_maps(
+        'taticflow', 'airdata.taticflow', RESOURCE + 'taticflow/{flowid}',
+        PredicateMap(AD + 'Flight-aircraftIdentification', 'callsign', datatype=XSD + 'string'),
+        origin='adep', destination='ades', flight_type='flighttype',
+        off_block='cpush', take_off='dep', landing='arr', in_block=None,
+    ),
+    TriplesMap('aerodrome', 'airdata.aerodrome', RESOURCE + 'aerodrome/{icao}', (AD + 'Aerodrome',), (
+        PredicateMap(RDFS_LABEL, 'name', datatype=XSD + 'string'),
+    )),
+]
+
+
+# ---------------------------------------------------------------------------------------------
+# Parser do subconjunto de SPARQL
+# ---------------------------------------------------------------------------------------------
+
+TOKEN_RE = re.compile(r'''
+      (?P<ws>\s+|\#[^\n]*)
+    | (?P<iri><[^<>"{}|^`\\\s]*>)
+    | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    | (?P<var>[?$][A-Za-z_]\w*)
+    | (?P<number>[+-]?(?:\d*\.\d+|\d+)(?:[eE][+-]?\d+)?)
+    | (?P<pname>(?:[A-Za-z][\w-]*)?:(?:[\w-]+(?:\.[\w-]+)*)?)
+    | (?P<op>&&|\|\||<=|>=|!=|\^\^|[=<>!])
+    | (?P<punct>[{}().;,*\[\]])
+    | (?P<lang>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+    | (?P<word>[A-Za-z_]\w*)
+''', re.X)
+
+COMPARISONS = {'=', '!=', '<', '<=', '>', '>='}
+
+
+class Term(NamedTuple):
+    """Termo de um padrão ou filtro: kind = 'var', 'iri' ou 'literal'"""
+    kind: str
+    value: str
+    datatype: Optional[str] = None
+
+
+class Query(NamedTuple):
+    variables: Optional[list]          # None: SELECT *
+    distinct: bool
+    patterns: list                     # (sujeito, predicado, objeto)
+    filters: list
+    order: list                        # (variável, descendente)
+    limit: Optional[int]
+    offset: Optional[int]
+
+
+def _unescape(text: str) -> str:
+    escapes = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+    return re.sub(r'\\(.)', lambda match: escapes.get(match.group(1), match.group(1)), text)
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = []
+        position = 0
+        while position < len(text):
+            match = TOKEN_RE.match(text, position)
+            if not match:
+                raise UnsupportedQuery(f'Trecho não reconhecido na consulta: {text[position:position + 30]!r}')
+            position = match.end()
+            if match.lastgroup != 'ws':
+                self.tokens.append((match.lastgroup, match.group()))
+        self.position = 0
+        self.prefixes = {'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#', 'xsd': XSD,
+                         'rdfs': 'http://www.w3.org/2000/01/rdf-schema#'}
+
+    def peek(self, offset: int = 0) -> tuple:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else ('eof', '')
+
+    def next(self) -> tuple:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def keyword(self, *words: str) -> bool:
+        kind, value = self.peek()
+        return kind == 'word' and value.upper() in words
+
+    def expect(self, value: str):
+        token = self.next()
+        if token[1] != value and not (token[0] == 'word' and token[1].upper() == value):
+            raise UnsupportedQuery(f'Esperado {value!r}, encontrado {token[1]!r}')
+
+    def iri(self, token: tuple) -> str:
+        kind, value = token
+        if kind == 'iri':
+            return value[1:-1]
+        if kind == 'pname':
+            prefix, local = value.split(':', 1)
+            if prefix not in self.prefixes:
+                raise UnsupportedQuery(f'Prefixo não declarado: {prefix}')
+            return self.prefixes[prefix] + local
+        raise UnsupportedQuery(f'IRI esperada, encontrado {value!r}')
+
+    def parse(self) -> Query:
+        while self.keyword('PREFIX'):
+            self.next()
+            name = self.next()[1]
+            self.prefixes[name[:-1]] = self.iri(self.next())
+        if not self.keyword('SELECT'):
+            raise UnsupportedQuery('Apenas consultas SELECT são suportadas')
+        self.next()
+        distinct = False
+        if self.keyword('DISTINCT', 'REDUCED'):
+            distinct = self.next()[1].upper() == 'DISTINCT'
+        variables = []
+        if self.peek()[1] == '*':
+            self.next()
+            variables = None
+        else:
+            while self.peek()[0] == 'var':
+                variables.append(self.next()[1][1:])
+            if not variables:
+                raise UnsupportedQuery('Projeções com expressões não são suportadas')
+        if self.keyword('WHERE'):
+            self.next()
+        patterns, filters = self.group()
+
+        order, limit, offset = [], None, None
+        while self.peek()[0] != 'eof':
+            if self.keyword('ORDER'):
+                self.next()
+                self.expect('BY')
+                while self.keyword('ASC', 'DESC') or self.peek()[0] == 'var':
+                    descending = False
+                    if self.peek()[0] == 'word':
+                        descending = self.next()[1].upper() == 'DESC'
+                        self.expect('(')
+                        order.append((self.next()[1][1:], descending))
+                        self.expect(')')
+                    else:
+                        order.append((self.next()[1][1:], descending))
+            elif self.keyword('LIMIT'):
+                self.next()
+                limit = int(self.next()[1])
+            elif self.keyword('OFFSET'):
+                self.next()
+                offset = int(self.next()[1])
+            else:
+                raise UnsupportedQuery(f'Modificador não suportado: {self.peek()[1]!r}')
+        return Query(variables, distinct, patterns, filters, order, limit, offset)
+
+    def group(self) -> tuple:
+        self.expect('{')
+        patterns, filters = [], []
+        while self.peek()[1] != '}':
+            if self.peek()[0] == 'eof':
+                raise UnsupportedQuery('Grupo não fechado')
+            if self.keyword('FILTER'):
+                self.next()
+                self.expect('(')
+                filters.append(self.expression())
+                self.expect(')')
+            elif self.peek()[0] == 'word' and self.peek()[1] != 'a':
+                raise UnsupportedQuery(f'{self.peek()[1].upper()} não é suportado')
+            elif self.peek()[1] in ('{', '['):
+                raise UnsupportedQuery('Grupos aninhados e nós em branco não são suportados')
+            else:
+                patterns += self.triples()
+            if self.peek()[1] == '.':
+                self.next()
+        self.next()
+        return patterns, filters
+
+    def triples(self) -> list:
+        subject = self.term()
+        if subject.kind == 'literal':
+            raise UnsupportedQuery('Sujeito literal')
+        patterns = []
+        while True:
+            kind, value = self.next()
+            if kind == 'var':
+                raise UnsupportedQuery('Predicados variáveis não são suportados')
+            predicate = RDF_TYPE if (kind, value) == ('word', 'a') else self.iri((kind, value))
+            while True:
+                patterns.append((subject, predicate, self.term()))
+                if self.peek()[1] != ',':
+                    break
+                self.next()
+            if self.peek()[1] != ';':
+                return patterns
+            self.next()
+            if self.peek()[1] in ('.', '}'):
+                return patterns
+
+    def term(self) -> Term:
+        kind, value = self.next()
+        if kind == 'var':
+            return Term('var', value[1:])
+        if kind in ('iri', 'pname'):
+            return Term('iri', self.iri((kind, value)))
+        if kind == 'number':
+            datatype = 'double' if 'e' in value.lower() else 'decimal' if '.' in value else 'integer'
+            return Term('literal', value, XSD + datatype)
+        if kind == 'word' and value in ('true', 'false'):
+            return Term('literal', value, XSD + 'boolean')
+        if kind == 'string':
+            text = _unescape(value[1:-1])
+            if self.peek()[0] == 'lang':
+                self.next()
+                return Term('literal', text, XSD + 'string')
+            if self.peek()[1] == '^^':
+                self.next()
+                return Term('literal', text, self.iri(self.next()))
+            return Term('literal', text, XSD + 'string')
+        raise UnsupportedQuery(f'Termo não suportado: {value!r}')
+
+    def expression(self):
+        operands = [self.conjunction()]
+        while self.peek()[1] == '||':
+            self.next()
+            operands.append(self.conjunction())
+        return ('or', operands) if len(operands) > 1 else operands[0]
+
+    def conjunction(self):
+        operands = [self.relational()]
+        while self.peek()[1] == '&&':
+            self.next()
+            operands.append(self.relational())
+        return ('and', operands) if len(operands) > 1 else operands[0]
+
+    def relational(self):
+        if self.peek()[1] == '(':
+            self.next()
+            expression = self.expression()
+            self.expect(')')
+            return expression
+        if self.peek()[1] == '!':
+            self.next()
+            return ('not', self.relational())
+        left = self.term()
+        operator = self.next()[1]
+        if operator not in COMPARISONS:
+            raise UnsupportedQuery(f'Operador não suportado no FILTER: {operator!r}')
+        return ('cmp', operator, left, self.term())
+
+
+def parse_query(text: str) -> Query:
+    """Converte o texto de uma consulta SELECT do subconjunto suportado na estrutura Query"""
+    return _Parser(text).parse()
+
+
+# ---------------------------------------------------------------------------------------------
+# Tradução para SQL
+# ---------------------------------------------------------------------------------------------
+
+TEMPLATE_RE = re.compile(r'\{(\w+)\}')
+
+# Conversão das constantes SPARQL para os tipos do Postgres
+CASTS = {
+    XSD + 'dateTime': 'TIMESTAMP',
+    XSD + 'date': 'DATE',
+    XSD + 'integer': 'NUMERIC',
+    XSD + 'decimal': 'NUMERIC',
+    XSD + 'double': 'DOUBLE PRECISION',
+    XSD + 'boolean': 'BOOLEAN',
+    XSD + 'string': 'TEXT',
+}
+
+
+def template_columns(template: str) -> list:
+    return TEMPLATE_RE.findall(template)
+
+
+def template_shape(template: str) -> tuple:
+    """Partes constantes do template (templates com a mesma forma geram IRIs comparáveis coluna a coluna)"""
+    return tuple(TEMPLATE_RE.split(template)[::2])
+
+
+def match_template(template: str, iri: str) -> Optional[dict]:
+    """Valores das colunas de uma IRI gerada pelo template (None se a IRI não vem dele)"""
+    parts = TEMPLATE_RE.split(template)
+    pattern = ''.join(re.escape(part) if i % 2 == 0 else f'(?P<{part}>[^/]+)' for i, part in enumerate(parts))
+    match = re.fullmatch(pattern, iri)
+    if not match:
+        return None
+    # Horários nas IRIs usam 'T' entre data e hora (xsd:dateTime)
+    return {column: value.replace('T', ' ') if re.fullmatch(r'\d{4}-\d\d-\d\dT[\d:.]+', value) else value
+            for column, value in match.groupdict().items()}
+
+
+def _quote(text: str) -> str:
+    return "'" + text.replace("'", "''").replace('%', '%%') + "'"
+
+
+def _text(expression: str, datetime: bool = True) -> str:
+    """Valor de uma coluna como texto no formato SPARQL (horários com 'T' entre data e hora)"""
+    return f"REPLACE(({expression})::TEXT, ' ', 'T')" if datetime else f'({expression})::TEXT'
+
+
+class _Value(NamedTuple):
+    """Valor de um termo em um ramo: IRI (template) ou literal (coluna ou template) de um nó"""
+    node: int
+    iri: bool
+    template: Optional[str] = None
+    column: Optional[str] = None
+    datatype: Optional[str] = None
+    subject_of: Optional[int] = None     # índice do nó quando é a IRI do próprio sujeito
+
+
+class _Branch:
+    """Um ramo da tradução: uma escolha de TriplesMap por sujeito e de PredicateMap por padrão"""
+
+    def __init__(self, maps: list):
+        self.maps = maps
+        self.parent = list(range(len(maps)))
+        self.conditions = []       # (função alias -> SQL, parâmetros)
+        self.values = {}           # variável -> [_Value]
+
+    def root(self, node: int) -> int:
+        while self.parent[node] != node:
+            node = self.parent[node]
+        return node
+
+    def alias(self, node: int) -> str:
+        return f't{self.root(node)}'
+
+    def column(self, node: int, column: str) -> str:
+        return f'{self.alias(node)}."{column}"'
+
+    def sql_of(self, value: _Value) -> str:
+        """Expressão SQL (tipada) de um valor"""
+        if value.column:
+            return self.column(value.node, value.column)
+        parts = TEMPLATE_RE.split(value.template)
+        # Colunas de IRIs são chaves (códigos, números, datas e horários); as de literais ficam como estão
+        pieces = [_quote(part) if i % 2 == 0 else _text(self.column(value.node, part), value.iri)
+                  for i, part in enumerate(parts) if i % 2 or part]
+        return '(' + ' || '.join(pieces) + ')' if len(pieces) > 1 else pieces[0]
+
+    def text_of(self, value: _Value) -> str:
+        if value.template:
+            return self.sql_of(value)
+        return _text(self.sql_of(value), value.datatype == XSD + 'dateTime')
+
+    def columns_of(self, value: _Value) -> list:
+        return [value.column] if value.column else template_columns(value.template)
+
+    def add(self, sql, params: tuple = ()):
+        self.conditions.append((sql, params))
+
+    def not_null(self, value: _Value):
+        for column in self.columns_of(value):
+            self.add(lambda node=value.node, column=column: f'{self.column(node, column)} IS NOT NULL')
+
+    def bind_iri(self, value: _Value, iri: str) -> bool:
+        columns = match_template(value.template, iri)
+        if columns is None:
+            return False
+        for column, constant in columns.items():
+            self.add(lambda node=value.node, column=column: f'{self.column(node, column)} = %s', (constant,))
+        return True
+
+    def bind_literal(self, value: _Value, term: Term, operator: str = '='):
+        cast = CASTS.get(term.datatype, 'TEXT')
+        self.add(lambda value=value: f'{self.sql_of(value)} {operator} %s::{cast}', (term.value,))
+
+    def unify(self, first: _Value, other: _Value) -> bool:
+        """Mesma variável em dois lugares: mesma linha (nós do mesmo registro) ou igualdade das colunas"""
+        if first.iri != other.iri:
+            return False
+        if not first.iri:
+            self.add(lambda: f'{self.sql_of(first)} = {self.sql_of(other)}')
+            return True
+        if template_shape(first.template) != template_shape(other.template):
+            return False
+        first_columns, other_columns = template_columns(first.template), template_columns(other.template)
+        for a, b in ((first, other), (other, first)):
+            # IRI do sujeito de um nó (colunas que identificam a linha) referenciada pelas mesmas colunas
+            # na mesma tabela: é a mesma linha, sem junção
+            if a.subject_of is not None and self.maps[a.node].table == self.maps[b.node].table \
+                    and first_columns == other_columns:
+                self.parent[self.root(a.node)] = self.root(b.node)
+                return True
+        for a_column, b_column in zip(first_columns, other_columns):
+            self.add(lambda a_column=a_column, b_column=b_column:
+                     f'{self.column(first.node, a_column)} = {self.column(other.node, b_column)}')
+        return True
+
+    def condition(self, expression) -> tuple:
+        """FILTER -> (SQL, parâmetros)"""
+        kind = expression[0]
+        if kind in ('and', 'or'):
+            parts = [self.condition(operand) for operand in expression[1]]
+            joiner = ' AND ' if kind == 'and' else ' OR '
+            return '(' + joiner.join(sql for sql, _ in parts) + ')', tuple(p for _, params in parts for p in params)
+        if kind == 'not':
+            sql, params = self.condition(expression[1])
+            return f'NOT {sql}', params
+        _, operator, left, right = expression
+        if left.kind != 'var':
+            left, right = right, left
+            operator = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}.get(operator, operator)
+        if left.kind != 'var':
+            raise UnsupportedQuery('FILTER sem variável')
+        value = self.values[left.value][0] if left.value in self.values else None
+        if value is None:
+            return 'FALSE', ()
+        if right.kind == 'var':
+            other = self.values.get(right.value, [None])[0]
+            if other is None:
+                return 'FALSE', ()
+            if value.iri or other.iri:
+                return f'{self.text_of(value)} {operator} {self.text_of(other)}', ()
+            return f'{self.sql_of(value)} {operator} {self.sql_of(other)}', ()
+        if value.iri:
+            if right.kind != 'iri' or operator not in ('=', '!='):
+                raise UnsupportedQuery('IRIs só podem ser comparadas por = ou != com outra IRI')
+            columns = match_template(value.template, right.value)
+            if columns is None:
+                return ('FALSE' if operator == '=' else 'TRUE'), ()
+            sql = ' AND '.join(f'{self.column(value.node, column)} = %s' for column in columns)
+            return (f'({sql})' if operator == '=' else f'NOT ({sql})'), tuple(columns.values())
+        if right.kind != 'literal':
+            raise UnsupportedQuery('Literais só podem ser comparados com literais')
+        return f'{self.sql_of(value)} {operator} %s::{CASTS.get(right.datatype, "TEXT")}', (right.value,)
+
+
+class Translation(NamedTuple):
+    sql: Optional[str]                 # None: nenhum mapeamento atende a consulta (resultado vazio)
+    params: tuple
+    variables: list
+
+
+def translate(text: str, mapping: list = MAPPING) -> Translation:
+    """Traduz uma consulta SELECT do subconjunto suportado em uma única consulta SQL"""
+    query = parse_query(text)
+
+    # Sujeitos (nós) e seus padrões
+    nodes = []
+    for subject, _, _ in query.patterns:
+        if subject not in nodes:
+            nodes.append(subject)
+    classes = {node: set() for node in nodes}
+    properties = []
+    for subject, predicate, obj in query.patterns:
+        if predicate == RDF_TYPE:
+            if obj.kind != 'iri':
+                raise UnsupportedQuery('rdf:type com classe variável não é suportado')
+            classes[subject].add(obj.value)
+        else:
+            properties.append((subject, predicate, obj))
+
+    variables = query.variables
+    if variables is None:
+        variables = []
+        for pattern in query.patterns:
+            for term in pattern[::2]:
+                if term.kind == 'var' and term.value not in variables:
+                    variables.append(term.value)
+
+    candidates = [
+        [tm for tm in mapping if classes[node] <= set(tm.classes)
+         and all(tm.maps_for(predicate) for subject, predicate, _ in properties if subject == node)]
+        for node in nodes
+    ]
+
+    branches = []
+    for maps in itertools.product(*candidates):
+        choices = [maps[nodes.index(subject)].maps_for(predicate) for subject, predicate, _ in properties]
+        for predicate_maps in itertools.product(*choices):
+            branch = _build_branch(nodes, list(maps), properties, predicate_maps, query.filters)
+            if branch is not None:
+                branches.append(branch)
+            if len(branches) > MAX_BRANCHES:
+                raise UnsupportedQuery(f'A consulta gera mais de {MAX_BRANCHES} combinações de mapeamentos')
+    if not branches:
+        return Translation(None, (), variables)
+
+    order_variables = [variable for variable, _ in query.order]
+    selects, params = [], []
+    for branch in branches:
+        sql, branch_params = _branch_sql(branch, variables, order_variables)
+        selects.append(sql)
+        params += branch_params
+
+    sql = 'SELECT ' + ('DISTINCT ' if query.distinct else '') + '* FROM (\n' + '\nUNION ALL\n'.join(selects) + '\n) q'
+    if query.order:
+        sql += '\nORDER BY ' + ', '.join(f'"o_{variable}"' + (' DESC' if descending else '')
+                                         for variable, descending in query.order)
+    if query.limit is not None:
+        sql += f'\nLIMIT {int(query.limit)}'
+    if query.offset:
+        sql += f'\nOFFSET {int(query.offset)}'
+    return Translation(sql, tuple(params), variables)
+
+
+def _build_branch(nodes: list, maps: list, properties: list, predicate_maps: tuple, filters: list):
+    """Monta um ramo; None se a combinação de mapeamentos não pode produzir resultados"""
+    branch = _Branch(maps)
+    occurrences = []
+    for index, (node, tm) in enumerate(zip(nodes, maps)):
+        value = _Value(index, True, template=tm.subject, subject_of=index)
+        if node.kind == 'iri':
+            if not branch.bind_iri(value, node.value):
+                return None
+        else:
+            occurrences.append((node.value, value))
+
+    for (subject, _, obj), predicate_map in zip(properties, predicate_maps):
+        node = nodes.index(subject)
+        value = _Value(node, predicate_map.iri, template=predicate_map.template, column=predicate_map.column,
+                       datatype=predicate_map.datatype)
+        # Coluna nula não gera tripla (R2RML)
+        branch.not_null(value)
+        if obj.kind == 'var':
+            occurrences.append((obj.value, value))
+        elif obj.kind == 'iri':
+            if not value.iri or not branch.bind_iri(value, obj.value):
+                return None
+        else:
+            if value.iri:
+                return None
+            branch.bind_literal(value, obj)
+
+    for variable, value in occurrences:
+        if variable in branch.values:
+            if not branch.unify(branch.values[variable][0], value):
+                return None
+        branch.values.setdefault(variable, []).append(value)
+
+    for expression in filters:
+        sql, params = branch.condition(expression)
+        branch.add(lambda sql=sql: sql, params)
+    return branch
+
+
+def _branch_sql(branch: _Branch, variables: list, order_variables: list) -> tuple:
+    """SELECT de um ramo: para cada variável, texto, tipo do termo e datatype (e a chave de ordenação)"""
+    columns = []
+    for variable in variables:
+        value = branch.values.get(variable, [None])[0]
+        if value is None:
+            columns += [f'NULL::TEXT AS "v_{variable}"', f'NULL::TEXT AS "k_{variable}"', f'NULL::TEXT AS "d_{variable}"']
+        else:
+            columns += [
+                f'{branch.text_of(value)} AS "v_{variable}"',
+                f"'{'uri' if value.iri else 'literal'}'::TEXT AS \"k_{variable}\"",
+                (_quote(value.datatype) if value.datatype and not value.iri else 'NULL') + f'::TEXT AS "d_{variable}"',
+            ]
+    for variable in order_variables:
+        value = branch.values.get(variable, [None])[0]
+        columns.append((branch.sql_of(value) if value is not None else 'NULL') + f' AS "o_{variable}"')
+
+    tables = sorted({branch.root(node) for node in range(len(branch.maps))})
+    from_clause = ', '.join(f'{branch.maps[node].table} t{node}' for node in tables)
+    conditions, params = [], []
+    for sql, condition_params in branch.conditions:
+        text = sql()
+        if text not in conditions or condition_params:
+            conditions.append(text)
+            params += condition_params
+    sql = f'SELECT {", ".join(columns)}\nFROM {from_clause}'
+    if conditions:
+        sql += '\nWHERE ' + '\n  AND '.join(conditions)
+    return sql, params
+
+
+def _binding(value, kind, datatype) -> Optional[dict]:
+    if value is None:
+        return None
+    if kind == 'uri':
+        return {'type': 'uri', 'value': value}
+    binding = {'type': 'literal', 'value': value}
+    if datatype and datatype != XSD + 'string':
+        binding['datatype'] = datatype
+    return binding
+
+
+class VirtualGraphBackend:
+    """
+    Backend (mesma interface de JENA_FUSEKI.rdf_backends) que responde SELECT nas tabelas do Postgres
+    pelo mapeamento; só leitura.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, mapping: list = MAPPING, conn=None, fetch_size: int = FETCH_SIZE):
+        """
+        Args:
+            mapping: TriplesMaps (padrão: MAPPING, METAR/VRA/Tatic Flow/aeródromos)
+            conn: conexão psycopg2 (padrão: COMMON.db.get_connection())
+            fetch_size: linhas lidas por vez do cursor do lado do servidor
+        """
+        self.mapping = mapping
+        self._conn = conn
+        self.fetch_size = fetch_size
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            from COMMON.db import get_connection
+
+            self._conn = get_connection()
+        return self._conn
+
+    def explain(self, query: str) -> str:
+        """SQL gerado para a consulta (com os parâmetros já substituídos)"""
+        translation = translate(query, self.mapping)
+        if translation.sql is None:
+            return '-- nenhum mapeamento atende a consulta'
+        with self.conn.cursor() as cur:
+            return cur.mogrify(translation.sql, translation.params).decode('utf-8')
+
+    def select_stream(self, query: str) -> tuple[list, Iterator[Dict[str, Any]]]:
+        """
+        Variáveis e um iterador dos resultados (bindings no formato SPARQL JSON), lidos em lotes de
+        `fetch_size` linhas por um cursor do lado do servidor.
+        """
+        from JENA_FUSEKI.rdf_backends import BackendError
+
+        try:
+            translation = translate(query, self.mapping)
+        except UnsupportedQuery as e:
+            raise BackendError(f'Consulta não suportada no grafo virtual: {e}', 400)
+
+        def rows():
+            if translation.sql is None:
+                return
+            with self.conn:
+                # Nome único: vários iteradores podem estar abertos na mesma conexão
+                with self.conn.cursor(name=f'virtual_graph_{uuid.uuid4().hex}') as cur:
+                    cur.itersize = self.fetch_size
+                    cur.execute(translation.sql, translation.params)
+                    for row in cur:
+                        binding = {}
+                        for i, variable in enumerate(translation.variables):
+                            term = _binding(*row[i * 3:i * 3 + 3])
+                            if term is not None:
+                                binding[variable] = term
+                        yield binding
+
+        return translation.variables, rows()
+
+    def select(self, query: str) -> Dict[str, Any]:
+        variables, bindings = self.select_stream(query)
+        return {'head': {'vars': variables}, 'results': {'bindings': list(bindings)}}
+
+    def _read_only(self, *args, **kwargs):
+        from JENA_FUSEKI.rdf_backends import BackendError
+
+        raise BackendError('O grafo virtual só responde consultas SELECT', 501)
+
+    ask = construct = update = load = dump = _read_only
@@ -0,0 +1,125 @@
+"""
+Planejamento e execução das requisições ao endpoint asos.py do IEM (Iowa Environmental Mesonet).
+
+Em vez de uma única URL com todas as estações da rede BR__ASOS (~600 parâmetros `&station=`),
+as estações são agrupadas em lotes e o período em janelas, e as requisições resultantes passam
+por um token bucket adaptativo que recua quando o servidor responde 429/503.
+"""
+import os
+from datetime import date, timedelta
+from typing import NamedTuple
+
+# Configurável para apontar para um servidor local (ex: benchmarks)
+ASOS_URL = os.environ.get("AIRDATA_ASOS_URL", "https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py")
+
+# Parâmetros ajustados para o limite do servidor do IEM
+STATIONS_PER_REQUEST = 20       # estações por requisição
+DAYS_PER_REQUEST = 366          # tamanho máximo da janela de datas por requisição
+MAX_WORKERS = 4                 # requisições simultâneas
+REQUESTS_PER_SECOND = 1.0       # taxa inicial do token bucket (sobe até o dobro sem limitação)
+MAX_ATTEMPTS = 6                # tentativas por requisição antes de desistir
+THROTTLE_STATUS = (429, 503)
+
+
+class AsosRequest(NamedTuple):
+    """Uma requisição planejada: lote de estações e janela de datas"""
+    stations: tuple
+    start_date: date
+    end_date: date
+
+    @property
+    def url(self) -> str:
+        return build_asos_url(list(self.stations), self.start_date, self.end_date)
+
+    @property
+    def key(self) -> str:
+        """Identificador da requisição usado no checkpoint de progresso"""
+        return f"{self.start_date}:{self.end_date}:{','.join(self.stations)}"
+
+
+def build_asos_url(stations: list, start_date: date, end_date: date) -> str:
+    """Monta a URL do asos.py para as estações e o período informados"""
+    stations_request_str = "".join([f"&station={station}" for station in stations])
+    return f'{ASOS_URL}?network=BR__ASOS{stations_request_str}&data=all&' \
+           f'year1={start_date.year}&month1={start_date.month}&day1={start_date.day}' \
+           f'&year2={end_date.year}&month2={end_date.month}&day2={end_date.day}' \
+           f'&tz=Etc%2FUTC&format=onlycomma&latlon=no&elev=no&missing=null&trace=T&direct=no&report_type=3&report_type=4'
+
+
+def plan_requests(stations: list, start_date: date, end_date: date,
+                  stations_per_request: int = STATIONS_PER_REQUEST,
+                  days_per_request: int = DAYS_PER_REQUEST) -> list[AsosRequest]:
+    """Divide estações em lotes e o período em janelas, gerando a lista de requisições"""
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(end_date, window_start + timedelta(days=days_per_request - 1))
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+
+    batches = [
+        tuple(stations[i:i + stations_per_request])
+        for i in range(0, len(stations), stations_per_request)
+    ]
+    return [AsosRequest(batch, window_start, window_end) for window_start, window_end in windows for batch in batches]
+
+
+def fetch_request(request: AsosRequest, limiter, client=None) -> str:
+    """
+    Executa uma requisição planejada respeitando o limitador de taxa.
+
+    Returns:
+        conteúdo CSV da resposta
+
+    Raises:
+        RuntimeError: se o servidor não responder 200 após MAX_ATTEMPTS tentativas
+    """
+    from COMMON.http_cache import FOREVER, cached_get
+    from COMMON.http_client import HttpClient
+
+    # 429/503 não são repetidos pelo cliente: quem recua nesses casos é o limitador de taxa
+    client = client or HttpClient(timeout=600, retry_status=(500, 502, 504))
+    # Janelas que terminaram há mais de dois dias não mudam mais: a resposta fica no cache para sempre
+    ttl = FOREVER if request.end_date < date.today() - timedelta(days=2) else None
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.acquire()
+        response = cached_get(request.url, ttl=ttl, timeout=600, verbose=False, client=client)
+        if response.status_code == 200:
+            if not response.from_cache:
+                limiter.succeeded()
+            return response.text
+        if response.status_code in THROTTLE_STATUS:
+            retry_after = response.headers.get("Retry-After")
+            limiter.throttled(attempt, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            continue
+        raise RuntimeError(f"Erro {response.status_code} na requisição ao asos.py: {request.url}")
+    raise RuntimeError(f"Servidor continuou limitando após {MAX_ATTEMPTS} tentativas: {request.url}")
+
+
+def pending_requests(stations: list, start_date: date, end_date: date, done: set | None = None) -> list[AsosRequest]:
+    """Requisições planejadas, sem as que já foram carregadas (chave em `done`) em uma execução anterior"""
+    requests = plan_requests(stations, start_date, end_date)
+    print(f'[ASOS] {len(requests)} requisições planejadas para {len(stations)} estações')
+    if done:
+        requests = [request for request in requests if request.key not in done]
+        print(f'[ASOS] Retomando execução anterior: {len(requests)} requisições pendentes')
+    return requests
+
+
+class AsosFetcher:
+    """
+    Executa requisições planejadas compartilhando um limitador de taxa e um cliente HTTP
+    (pode ser chamado de várias threads ao mesmo tempo).
+    """
+
+    def __init__(self, requests_per_second: float = REQUESTS_PER_SECOND, burst: int = MAX_WORKERS):
+        from COMMON.http_client import HttpClient
+        from COMMON.rate_limit import AdaptiveRateLimiter
+
+        self.limiter = AdaptiveRateLimiter(rate=requests_per_second, capacity=burst)
+        # 429/503 não são repetidos pelo cliente: quem recua nesses casos é o limitador de taxa
+        self.client = HttpClient(timeout=600, retry_status=(500, 502, 504))
+
+    def __call__(self, request: AsosRequest) -> tuple[AsosRequest, str]:
+        return request, fetch_request(request, self.limiter, self.client)
+
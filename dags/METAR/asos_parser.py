@@ -0,0 +1,127 @@
+"""
+Parsing do CSV retornado pelo asos.py, em um processo ou distribuído em um pool de processos.
+
+No modo paralelo o CSV é copiado uma única vez para memória compartilhada e dividido em faixas
+de bytes alinhadas em quebras de linha; cada processo lê apenas a sua faixa, converte em
+DataFrame e devolve o resultado serializado em Arrow IPC (um buffer contíguo, sem pickling de
+DataFrames). As partes são concatenadas na ordem original.
+"""
+import io
+import os
+
+# Representações de valor ausente no CSV (parâmetro missing=null da requisição)
+NA_VALUES = ['null', '"null"', "'null'"]
+
+# Abaixo deste tamanho o parsing em um único processo é mais rápido que distribuir o CSV
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Tamanho aproximado de cada faixa enviada a um processo
+CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def parse_csv(content: str | bytes, columns: list | None = None):
+    """Converte CSV do asos.py em DataFrame de strings ('null' vira nulo)"""
+    import pandas as pd
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if not content.strip():
+        return pd.DataFrame(columns=columns)
+    return pd.read_csv(
+        io.BytesIO(content),
+        names=columns,
+        header=None if columns else 'infer',
+        dtype=str,
+        na_values=NA_VALUES,
+        keep_default_na=False
+    )
+
+
+def split_ranges(buffer, start: int, chunk_bytes: int = CHUNK_BYTES) -> list[tuple[int, int]]:
+    """Divide buffer[start:] em faixas de ~chunk_bytes terminadas em quebra de linha"""
+    ranges = []
+    size = len(buffer)
+    while start < size:
+        end = min(size, start + chunk_bytes)
+        if end < size:
+            newline = bytes(buffer[end:min(size, end + 64 * 1024)]).find(b'\n')
+            while newline < 0 and end < size:
+                end = min(size, end + 64 * 1024)
+                newline = bytes(buffer[end:min(size, end + 64 * 1024)]).find(b'\n')
+            end = size if newline < 0 else end + newline + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _parse_range(shm_name: str, start: int, end: int, columns: list) -> bytes:
+    """Executado no processo do pool: converte uma faixa do CSV e devolve o resultado em Arrow IPC"""
+    from multiprocessing.shared_memory import SharedMemory
+    import pyarrow as pa
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        chunk = bytes(shm.buf[start:end])
+    finally:
+        shm.close()
+
+    df = parse_csv(chunk, columns)
+    # Esquema explícito: uma coluna toda nula em uma faixa continua sendo string
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def process_pool(workers: int | None = None):
+    """
+    Pool de processos para o parsing (um processo por núcleo por padrão).
+    Usa 'spawn': os pipelines de extração têm threads ativas, e fork com threads pode travar.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+
+
+def parse_csv_parallel(content: str | bytes, executor, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Converte CSV do asos.py em DataFrame distribuindo faixas de bytes entre os processos de `executor`.
+
+    Args:
+        content: CSV completo (com cabeçalho)
+        executor: ProcessPoolExecutor (ver process_pool)
+        chunk_bytes: tamanho aproximado de cada faixa
+
+    Returns:
+        DataFrame igual ao de parse_csv(content)
+    """
+    from multiprocessing.shared_memory import SharedMemory
+    import pyarrow as pa
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if len(content) < PARALLEL_MIN_BYTES:
+        return parse_csv(content)
+
+    header_end = content.find(b'\n') + 1
+    columns = content[:header_end].decode('utf-8').strip().split(',')
+
+    shm = SharedMemory(create=True, size=len(content))
+    try:
+        shm.buf[:len(content)] = content
+        ranges = split_ranges(shm.buf, header_end, chunk_bytes)
+        parts = list(executor.map(
+            _parse_range,
+            [shm.name] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+            [columns] * len(ranges)
+        ))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    tables = [pa.ipc.open_stream(pa.py_buffer(part)).read_all() for part in parts]
+    return pa.concat_tables(tables).to_pandas()
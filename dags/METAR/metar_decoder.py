@@ -0,0 +1,109 @@
+"""
+Decodificador vetorizado de mensagens METAR cruas (coluna `metar` do asos.py).
+
+Cada campo é extraído por uma única regex compilada aplicada à série inteira (pandas .str),
+sem laço Python por mensagem. As observações (RMK) e a tendência (BECMG/TEMPO/NOSIG) são
+separadas antes, para que nuvens, tempo presente e QNH venham só do corpo principal.
+
+Colunas geradas (unidades métricas):
+    report_type          METAR/SPECI (quando presente na mensagem)
+    visibility_m         visibilidade predominante em metros (CAVOK = 10000)
+    cavok                CAVOK presente
+    cloudN_amount        cobertura da camada N (FEW/SCT/BKN/OVC/VV), N = 1..4
+    cloudN_base_ft       base da camada N em pés
+    cloudN_type          tipo de nuvem da camada N (CB/TCU)
+    qnh_hpa              QNH em hPa (grupos Q em hPa e A em polegadas de mercúrio)
+    significant_weather  grupos de tempo presente separados por espaço (ex: '-TSRA BR')
+    wx_intensity         intensidade do primeiro grupo (LIGHT/MODERATE/HEAVY/VICINITY)
+    change_indicator     primeiro indicador de tendência (NOSIG/BECMG/TEMPO)
+"""
+import re
+
+from METAR.metar_schema import CLOUD_LAYERS, DECODED_COLUMNS
+
+INHG_TO_HPA = 33.8639
+STATUTE_MILE_M = 1609.344
+
+_REPORT_TYPE = re.compile(r'^\s*(METAR|SPECI)\b')
+_REMARKS = re.compile(r'\sRMK\b.*$')
+_TREND = re.compile(r'\s(?:NOSIG|BECMG|TEMPO)\b.*$')
+_CHANGE = re.compile(r'\s(NOSIG|BECMG|TEMPO)(?=\s|$)')
+_VISIBILITY = re.compile(
+    r'(?:KT|MPS)(?:\s+\d{3}V\d{3})?\s+(CAVOK|\d{4}|M?\d{1,2}(?:\s\d/\d)?SM|M?\d/\dSM)(?:NDV)?(?=\s|$)'
+)
+_CLOUD = r'(FEW|SCT|BKN|OVC|VV)(\d{3}|///)(CB|TCU|///)?(?=\s|$)'
+# Camadas contíguas (como no METAR): uma extração só preenche as 4 camadas
+_CLOUDS = re.compile(r'\s' + _CLOUD + (r'(?:\s' + _CLOUD + r')?') * (CLOUD_LAYERS - 1))
+_QNH = re.compile(r'\s([QA])(\d{4})(?=\s|$)')
+_PHENOMENA = 'DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS'
+_DESCRIPTORS = 'MI|PR|BC|DR|BL|SH|TS|FZ'
+_WEATHER = re.compile(
+    rf'(?<=\s)((?:[-+]|VC)?(?:(?:{_DESCRIPTORS})(?:{_PHENOMENA})*|(?:{_PHENOMENA})+))(?=\s|$)'
+)
+_INTENSITY = {'-': 'LIGHT', '+': 'HEAVY', 'VC': 'VICINITY', '': 'MODERATE'}
+
+def _statute_miles_to_m(value: str) -> float:
+    """'10SM', '1 1/2SM', 'M1/4SM' -> metros"""
+    miles = 0.0
+    for part in value.rstrip('SM').lstrip('M').split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            miles += int(numerator) / int(denominator)
+        else:
+            miles += int(part)
+    return round(miles * STATUTE_MILE_M)
+
+
+def decode_metar(raw):
+    """
+    Decodifica uma série de mensagens METAR.
+
+    Args:
+        raw: pandas.Series com as mensagens cruas (nulos permitidos)
+
+    Returns:
+        DataFrame com as colunas de DECODED_COLUMNS, alinhado ao índice de `raw`
+    """
+    import pandas as pd
+
+    text = raw.astype('string')
+    decoded = pd.DataFrame(index=raw.index)
+    decoded['report_type'] = text.str.extract(_REPORT_TYPE, expand=False)
+
+    text = text.str.replace(_REMARKS, '', regex=True)
+    decoded['change_indicator'] = text.str.extract(_CHANGE, expand=False)
+    body = text.str.replace(_TREND, '', regex=True)
+
+    # Visibilidade: 4 dígitos em metros, CAVOK ou milhas terrestres (SM)
+    visibility = body.str.extract(_VISIBILITY, expand=False)
+    decoded['cavok'] = (visibility == 'CAVOK').astype('boolean')
+    meters = pd.to_numeric(visibility.where(visibility.str.fullmatch(r'\d{4}', na=False)), errors='coerce')
+    meters = meters.mask(decoded['cavok'].fillna(False), 10000)
+    statute = visibility[visibility.str.endswith('SM', na=False)]
+    if not statute.empty:
+        # Poucos valores distintos: converte cada um uma única vez
+        meters.loc[statute.index] = statute.map({value: _statute_miles_to_m(value) for value in statute.unique()})
+    decoded['visibility_m'] = meters.round().astype('Int32')
+
+    # Nuvens: grupos 1..4 da extração (cobertura, altura em centenas de pés, tipo)
+    clouds = body.str.extract(_CLOUDS)
+    for layer in range(CLOUD_LAYERS):
+        amount, height, cloud_type = (clouds[3 * layer + offset] for offset in range(3))
+        decoded[f'cloud{layer + 1}_amount'] = amount
+        decoded[f'cloud{layer + 1}_base_ft'] = (pd.to_numeric(height, errors='coerce') * 100).astype('Int32')
+        decoded[f'cloud{layer + 1}_type'] = cloud_type.where(cloud_type != '///')
+
+    # QNH: Qdddd em hPa, Adddd em centésimos de polegada de mercúrio
+    qnh = body.str.extract(_QNH)
+    # Float64 antes do where: o Int64 do to_numeric não comporta a conversão de inHg em hPa
+    value = pd.to_numeric(qnh[1], errors='coerce').astype('Float64')
+    in_hpa = (qnh[0] == 'Q').fillna(False)
+    decoded['qnh_hpa'] = value.where(in_hpa, (value / 100 * INHG_TO_HPA).round(1)).astype('Float32')
+
+    # Tempo presente: todos os grupos do corpo; intensidade do primeiro
+    weather = body.str.findall(_WEATHER).str.join(' ')
+    decoded['significant_weather'] = weather.where(weather != '')
+    first = decoded['significant_weather'].str.extract(r'^(\+|-|VC)?', expand=False)
+    decoded['wx_intensity'] = first.fillna('').map(_INTENSITY).where(decoded['significant_weather'].notna())
+
+    return decoded[list(DECODED_COLUMNS)]
@@ -1,77 +1,172 @@
+import os
+
 from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
 from airflow.sdk import dag, task
 from datetime import date
 
+from COMMON.db import INGESTION_STATE_SQL
+from COMMON.partitioning import PARTITION_FUNCTIONS_SQL
+from COMMON.validation import QUARANTINE_SQL, NotNull, Ordering, Range
+from METAR.metar_schema import DECODED_COLUMNS_SQL, METAR_SCHEMA_SQL
+from METAR.stations import STATIONS_SQL
 
-def make_request(
-        stations: list = None,
-        start_date: date = date(day=1, month=1, year=1990),
-        end_date: date = date.today(),
-):
-    import requests
-    from collections import defaultdict
-    from pandas import DataFrame
+# Lista de estações da rede BR__ASOS (configurável para apontar para um servidor local, ex: benchmarks)
+STATIONS_URL = os.environ.get(
+    'AIRDATA_ASOS_STATIONS_URL', 'https://mesonet.agron.iastate.edu/geojson/network/BR__ASOS.geojson?only_online=0'
+)
 
-    if not stations:
-        stations = get_all_stations()
-    stations_request_str = "".join([f"&station={station}" for station in stations])
-
-    start_day = start_date.day
-    start_month = start_date.month
-    start_year = start_date.year
-
-    end_day = end_date.day
-    end_month = end_date.month
-    end_year = end_date.year
-
-    print(stations_request_str)
-    url = fr'https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?network=BR__ASOS{stations_request_str}&data=all&' \
-          f'year1={start_year}&month1={start_month}&day1={start_day}&year2={end_year}&month2={end_month}&day2={end_day}' \
-          f'&tz=Etc%2FUTC&format=onlycomma&latlon=no&elev=no&missing=null&trace=T&direct=no&report_type=3&report_type=4'
-
-    print(f'URL utilizado: {url}')
-    print('Fazendo a requisição...')
-    response = requests.get(url)
-
-    print(f"Código de resposta: {response.status_code}")
-
-    if response.status_code == 200:
-        conteudo = response.content.decode('utf-8')
-        # print(conteudo)
-        linhas = conteudo.split('\n')
-        cabecalho = linhas[0].split(',')
-        # print(f'Quantidade de campos no cabeçalho: {len(cabecalho)}')
-        dados = [linha.split(',') for linha in linhas[1:]]
-        # print(f'Quantidade de dados em uma linha: {sum([len(linha) for linha in dados])/len(dados)}')
-
-        df_scheme = defaultdict(list)
-        for i, titulo in enumerate(cabecalho):
-            # print(f'Analisando o titulo: {titulo}, com i={i}')
-            for linha in dados:
-                # print(cabecalho)
-                if len(linha) != 1:
-                    if type(linha[i]) == str:
-                        if linha[i] in ['null', '"null"', "'null'"]:
-                            linha[i] = None
-                    # print(linha[i])
-                    df_scheme[titulo].append(linha[i])
-            # print('Titulo analisado!')
-        dataframe = DataFrame(df_scheme)
-        return dataframe
-    else:
-        return None
+# Regras de qualidade de cada lote (linhas reprovadas vão para airdata.quarantine)
+METAR_RULES = [
+    NotNull('station', 'valid'),
+    Range('tmpf', -130, 140),
+    Range('tmpc', -90, 60),
+    Range('dwpc', -90, 40),
+    Range('relh', 0, 100),
+    Range('drct', 0, 360),
+    Range('sknt', 0, 250),
+    Range('gust', 0, 300),
+    Range('alti', 25, 32.5),
+    Range('mslp', 850, 1090),
+    Range('qnh_hpa', 850, 1090),
+    Range('vsby', 0, 100),
+    Range('visibility_m', 0, 10000),
+    # Ponto de orvalho acima da temperatura (com folga para arredondamentos)
+    Ordering('dwpc', 'tmpc', tolerance=0.5, name='ordering_dewpoint_temperature'),
+]
+
+
+# Tabela METAR (particionada mensalmente por 'valid'), com migração da tabela antiga e tipos compactos
+METAR_TABLE_SQL = PARTITION_FUNCTIONS_SQL + INGESTION_STATE_SQL + QUARANTINE_SQL + """
+    -- Tabelas criadas antes do particionamento são renomeadas e migradas abaixo
+    DO $$
+    BEGIN
+      IF EXISTS (
+        SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'airdata' AND c.relname = 'metar' AND c.relkind = 'r'
+      ) THEN
+        ALTER TABLE airdata.metar RENAME TO metar_legacy;
+      END IF;
+    END $$;
+
+    CREATE TABLE IF NOT EXISTS airdata.metar (
+      station TEXT NOT NULL,               -- código ICAO do aeródromo
+      valid TIMESTAMP NOT NULL,             -- datetime em questão
+      tmpf REAL,                           -- temperatura em fahrenheit do ar
+      tmpc REAL,                           -- temperatura em celsius do ar
+      dwpf REAL,                           -- dew point em fahrenheit
+      dwpc REAL,                           -- dew point em celsius
+      relh REAL,                           -- umidade relativa (porcentagem)
+      feel REAL,                           -- heat index/wind chill em fahrenheit
+      drct REAL,                           -- direção do vento em ângulo
+      sknt REAL,                           -- velocidade do vento em nós
+      sped REAL,                           -- velocidade do vento em milhas por hora
+      alti REAL,                           -- altímetro em polegadas
+      mslp REAL,                           -- pressão ao nível do mar em mb
+      p01m REAL,                           -- precipitações em uma hora (mm)
+      p01i REAL,                           -- precipitações em uma hora (polegadas)
+      vsby REAL,                           -- visibilidade em milhas
+      gust REAL,                           -- rajada de vento em nós
+      gustMph REAL,                        -- rajada de vento em milhas por hora
+      skyc1 TEXT,                          -- cobertura de nuvem no nível 1
+      skyc2 TEXT,                          -- cobertura de nuvem no nível 2
+      skyc3 TEXT,                          -- cobertura de nuvem no nível 3
+      skyc4 TEXT,                          -- cobertura de nuvem no nível 4
+      skyl1 REAL,                          -- altura das nuvens no nível 1 (pés)
+      skyl2 REAL,                          -- altura das nuvens no nível 2 (pés)
+      skyl3 REAL,                          -- altura das nuvens no nível 3 (pés)
+      skyl4 REAL,                          -- altura das nuvens no nível 4 (pés)
+      wxCodes TEXT,                        -- código de clima presente
+      ice_accretion_1hr TEXT,                -- gelo acumulado em uma hora (float | string)
+      ice_accretion_3hr TEXT,                -- gelo acumulado em três horas (float | string)
+      ice_accretion_6hr TEXT,                -- gelo acumulado em seis horas (float | string)
+      peak_wind_gust REAL,                   -- pico de rajada de vento em nós
+      peak_wind_drct REAL,                   -- ângulo da rajada de vento de pico em graus
+      peak_wind_time TIMESTAMP,              -- horário do pico de rajada de vento
+      snowdepth REAL,                      -- profundidade da neve (não especificado)
+      metar TEXT                           -- mensagem METAR crua
+    ) PARTITION BY RANGE (valid);
+
+    -- Consultas "estação X entre t1 e t2" e MAX(valid) por estação
+    CREATE UNIQUE INDEX IF NOT EXISTS metar_station_valid_key ON airdata.metar (station, valid);
+    -- Consultas de marca d'água (MAX(valid)) e recortes por tempo em todas as estações
+    CREATE INDEX IF NOT EXISTS metar_valid_idx ON airdata.metar (valid);
+
+    -- Campos decodificados da mensagem METAR crua (ver METAR/metar_decoder.py)
+    """ + DECODED_COLUMNS_SQL + """
+
+    -- Partições do mês corrente e do próximo
+    SELECT airdata.ensure_monthly_partitions(
+      'metar', CURRENT_DATE, (CURRENT_DATE + INTERVAL '1 month')::DATE
+    );
+
+    -- Migração dos dados da tabela antiga (não particionada), se existir
+    DO $$
+    DECLARE
+      first_valid TIMESTAMP;
+      last_valid TIMESTAMP;
+    BEGIN
+      IF to_regclass('airdata.metar_legacy') IS NOT NULL THEN
+        SELECT MIN(valid), MAX(valid) INTO first_valid, last_valid FROM airdata.metar_legacy;
+        IF first_valid IS NOT NULL THEN
+          PERFORM airdata.ensure_monthly_partitions('metar', first_valid::DATE, last_valid::DATE);
+          INSERT INTO airdata.metar
+            SELECT * FROM airdata.metar_legacy WHERE station IS NOT NULL AND valid IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        END IF;
+        DROP TABLE airdata.metar_legacy;
+      END IF;
+    END $$;
+
+    -- Tipos compactos (códigos de cobertura de nuvens, SMALLINT/INTEGER, traço como sentinela)
+    """ + METAR_SCHEMA_SQL + """
+
+    -- Metadados das estações (coordenadas, elevação) e mapeamento aeródromo -> estação (METAR/stations.py)
+    """ + STATIONS_SQL + """
+"""
+
+
+def parse_asos_csv(conteudo: str, workers: int | None = None, executor=None):
+    """
+    Converte o CSV retornado pelo asos.py em DataFrame ('null' vira nulo).
+    Com `workers` (ou um pool em `executor`), CSVs grandes são divididos em faixas de bytes e
+    convertidos em paralelo por um pool de processos.
+    """
+    from METAR.asos_parser import parse_csv, parse_csv_parallel, process_pool
+
+    if executor is not None:
+        return parse_csv_parallel(conteudo, executor)
+    if workers:
+        with process_pool(workers) as pool:
+            return parse_csv_parallel(conteudo, pool)
+    return parse_csv(conteudo)
     # TODO decidir se tem a necessidade de criar algum filtro por colunas que são julgadas não necessárias pra esse bd
-    # TODO Fazer o link com o Banco de dados
-    # TODO Fazer o link com a dag
     # cols_to_eliminate = ['p01m', 'p01i', 'ice_accretion_1hr', 'ice_accretion_3hr', 'ice_accretion_6hr', 'snowdepth', ]
 
-    # dataframe.to_csv('teste.csv', header=True, index=False, encoding='utf-8', sep=';')  # Salva o df pra testar
+
+def refresh_stations() -> int:
+    """
+    Atualiza airdata.metar_station (coordenadas, elevação, nome e período de arquivo de cada
+    estação) a partir do GeoJSON da rede BR__ASOS.
+
+    Returns:
+        quantidade de estações atualizadas
+    """
+    from COMMON.db import get_connection, upsert_dataframe
+    from METAR.stations import parse_stations_geojson
+
+    stations = parse_stations_geojson(get_html_from_url(url=STATIONS_URL, verbose=False))
+    conn = get_connection()
+    with conn, conn.cursor() as cur:
+        updated = upsert_dataframe(cur, stations, 'airdata.metar_station', ['station'], touch_column='updated_at')
+    conn.close()
+    print(f'Estações atualizadas em airdata.metar_station: {updated}')
+    return updated
 
 
 def get_all_stations() -> list:
     import json
     raw_json = json.loads(get_html_from_url(
-        url='https://mesonet.agron.iastate.edu/geojson/network/BR__ASOS.geojson?only_online=0'
+        url=STATIONS_URL
     ))
     # print(raw_json)
     icao_codes = []
@@ -81,9 +176,9 @@ def get_all_stations() -> list:
     return icao_codes
 
 
-def get_html_from_url(url: str, verbose: bool = True) -> str:
-    import requests
-    response = requests.get(url)
+def get_html_from_url(url: str, verbose: bool = True, ttl: float | None = None) -> str:
+    from COMMON.http_cache import cached_get
+    response = cached_get(url, ttl=ttl, verbose=verbose)
     if verbose:
         print(f"URL utilizado: {url}")
         print(f"Status da requisição pra url: {response.status_code}")
@@ -91,128 +186,148 @@ def get_html_from_url(url: str, verbose: bool = True) -> str:
     return html_content
 
 
+def load_metar(start_date: date, end_date: date, stations: list[str] | None = None,
+               requests_per_second: float | None = None, metrics=None) -> int:
+    """
+    Baixa, converte, valida e carrega em airdata.metar os dados das estações no período
+    (corpo da task insert_metar_data, também usado pelos benchmarks).
+
+    Args:
+        start_date: data inicial
+        end_date: data final
+        stations: estações (se vazio, todas as estações da rede BR__ASOS)
+        requests_per_second: taxa do token bucket (padrão: REQUESTS_PER_SECOND do asos_client)
+        metrics: COMMON.metrics.Metrics onde registrar os estágios (padrão: uma nova, 'metar_extraction')
+
+    Returns:
+        quantidade de linhas inseridas
+    """
+    from COMMON.archive import write_archive
+    from COMMON.db import add_checkpoint, clear_checkpoint, get_checkpoint, get_connection, mark_touched_days
+    from COMMON.metrics import Metrics
+    from COMMON.partitioning import ensure_monthly_partitions, load_partitioned, next_month
+    from COMMON.pipeline import Pipeline, Stage
+    from COMMON.validation import Validator, quarantine
+    from METAR.asos_client import MAX_WORKERS, REQUESTS_PER_SECOND, AsosFetcher, pending_requests
+    from METAR.asos_parser import process_pool
+    from METAR.metar_decoder import decode_metar
+    from METAR.metar_schema import apply_metar_schema
+
+    print(f'Data de inicio: {start_date.strftime("%d/%m/%Y")}')
+    print(f'Data de fim: {end_date.strftime("%d/%m/%Y")}')
+
+    if not stations:
+        print('Estações não providenciadas. Obtendo todas as estações')
+        stations = get_all_stations()
+
+    # Requisições em lotes de estações, limitadas pelo token bucket. Download, parsing e carga
+    # rodam em paralelo (pipeline); cada lote é carregado em sua própria transação, junto com
+    # o checkpoint, e se a task falhar a próxima tentativa pula os lotes já carregados.
+    run_key = f'{start_date.isoformat()}:{end_date.isoformat()}'
+    conn = get_connection()
+    # Pool de processos compartilhado pelas threads de parsing (CSVs grandes usam todos os núcleos)
+    parse_pool = process_pool()
+    validator = Validator('metar', METAR_RULES)
+    # Tempo/linhas/bytes de cada estágio do pipeline e das etapas dentro deles
+    metrics = metrics or Metrics('metar_extraction')
+    total = 0
+
+    def parse(fetched):
+        request, conteudo = fetched
+        with metrics.stage('parse.csv', bytes=len(conteudo)) as record:
+            data = parse_asos_csv(conteudo, executor=parse_pool)
+            record.rows = len(data)
+        # Tipos compactos: categóricos, inteiros/reais anuláveis, traço ('T') como sentinela
+        with metrics.stage('parse.schema', rows=len(data)):
+            data = apply_metar_schema(data)
+        return request, data
+
+    def decode(parsed):
+        # Colunas métricas decodificadas da mensagem crua (visibilidade, nuvens, QNH, tempo presente...)
+        request, data = parsed
+        if not data.empty:
+            with metrics.stage('decode.metar', rows=len(data)):
+                data = data.join(apply_metar_schema(decode_metar(data['metar'])))
+        # Validação vetorizada do lote: só as linhas aprovadas são arquivadas e carregadas
+        with metrics.stage('decode.validation', rows=len(data)):
+            result = validator.validate(data)
+        with metrics.stage('decode.archive', rows=len(result.valid)):
+            write_archive(result.valid, 'metar')
+        return request, result
+
+    def load(validated):
+        nonlocal total
+        request, result = validated
+        data = result.valid
+        with conn, conn.cursor() as cur:
+            with metrics.stage('load.quarantine', rows=len(result.rejected)):
+                quarantine(cur, 'metar', result.rejected)
+            if not data.empty:
+                with metrics.stage('load.db_write', rows=len(data)):
+                    total += load_partitioned(
+                        cur,
+                        data,
+                        table='metar',
+                        partition_column='valid',
+                        key_columns=['station', 'valid']
+                    )
+                mark_touched_days(cur, 'metar', data['valid'].dropna().dt.date)
+            add_checkpoint(cur, 'metar', run_key, request.key)
+        return request
+
+    try:
+        with conn, conn.cursor() as cur:
+            done = get_checkpoint(cur, 'metar', run_key)
+
+        Pipeline([
+            Stage('download', AsosFetcher(requests_per_second or REQUESTS_PER_SECOND), workers=MAX_WORKERS),
+            Stage('parse', parse, workers=2),
+            Stage('decode', decode, workers=2),
+            Stage('load', load),
+        ], metrics=metrics).run(pending_requests(stations, start_date, end_date, done))
+
+        with conn, conn.cursor() as cur:
+            # Mantém sempre a partição do mês seguinte criada para as próximas cargas
+            ensure_monthly_partitions(cur, 'metar', end_date, next_month(end_date))
+            clear_checkpoint(cur, 'metar', run_key)
+    finally:
+        parse_pool.shutdown()
+        conn.close()
+    print(f'Inserção de dados finalizada. Linhas enviadas: {total}')
+    metrics.publish()
+    return total
+
+
 @dag(dag_id='metar_extraction', schedule='0 6 * * *', max_active_runs=1)
 def metar_extraction():
-    # Task para criar a tabela VRA se não existir
+    # Task para criar a tabela METAR (particionada mensalmente por 'valid') se não existir
     create_table = SQLExecuteQueryOperator(
         task_id='create_table',
         conn_id='postgres',
-        sql="""
-          CREATE TABLE IF NOT EXISTS airdata.metar (
-            station TEXT,                        -- código ICAO do aeródromo
-            valid TIMESTAMP,                      -- datetime em questão
-            tmpf REAL,                           -- temperatura em fahrenheit do ar
-            tmpc REAL,                           -- temperatura em celsius do ar
-            dwpf REAL,                           -- dew point em fahrenheit
-            dwpc REAL,                           -- dew point em celsius
-            relh REAL,                           -- umidade relativa (porcentagem)
-            feel REAL,                           -- heat index/wind chill em fahrenheit
-            drct REAL,                           -- direção do vento em ângulo
-            sknt REAL,                           -- velocidade do vento em nós
-            sped REAL,                           -- velocidade do vento em milhas por hora
-            alti REAL,                           -- altímetro em polegadas
-            mslp REAL,                           -- pressão ao nível do mar em mb
-            p01m REAL,                           -- precipitações em uma hora (mm)
-            p01i REAL,                           -- precipitações em uma hora (polegadas)
-            vsby REAL,                           -- visibilidade em milhas
-            gust REAL,                           -- rajada de vento em nós
-            gustMph REAL,                        -- rajada de vento em milhas por hora
-            skyc1 TEXT,                          -- cobertura de nuvem no nível 1
-            skyc2 TEXT,                          -- cobertura de nuvem no nível 2
-            skyc3 TEXT,                          -- cobertura de nuvem no nível 3
-            skyc4 TEXT,                          -- cobertura de nuvem no nível 4
-            skyl1 REAL,                          -- altura das nuvens no nível 1 (pés)
-            skyl2 REAL,                          -- altura das nuvens no nível 2 (pés)
-            skyl3 REAL,                          -- altura das nuvens no nível 3 (pés)
-            skyl4 REAL,                          -- altura das nuvens no nível 4 (pés)
-            wxCodes TEXT,                        -- código de clima presente
-            ice_accretion_1hr TEXT,                -- gelo acumulado em uma hora (float | string)
-            ice_accretion_3hr TEXT,                -- gelo acumulado em três horas (float | string)
-            ice_accretion_6hr TEXT,                -- gelo acumulado em seis horas (float | string)
-            peak_wind_gust REAL,                   -- pico de rajada de vento em nós
-            peak_wind_drct REAL,                   -- ângulo da rajada de vento de pico em graus
-            peak_wind_time TIMESTAMP,              -- horário do pico de rajada de vento
-            snowdepth REAL,                      -- profundidade da neve (não especificado)
-            metar TEXT                           -- mensagem METAR crua
-        );
-    	"""
+        sql=METAR_TABLE_SQL
     )
 
     @task
-    def insert_metar_data(start_date: date, end_date: date = date.today(), stations: list[str] | None = None):
+    def insert_metar_data(start_date: date, end_date: date = date.today(), stations: list[str] | None = None) -> int:
         """
         Insere os dados do METAR a partir de uma data inicial, final e as estações.
         Se o campo 'stations' estiver vazio, serão obtidas de todas as estações
         """
-        from sqlalchemy import create_engine
-        import configparser
-
-        print(f'Data de inicio: {start_date.strftime("%d/%m/%Y")}')
-        print(f'Data de fim: {end_date.strftime("%d/%m/%Y")}')
-
-        # Leitura das configurações do banco de dados
-        config = configparser.ConfigParser()
-        config.read("/opt/airflow/config/db.cfg")
-        DB_CONFIG = {
-            "host": config["database"]["host"],
-            "port": config["database"]["port"],
-            "dbname": config["database"]["dbname"],
-            "user": config["database"]["user"],
-            "password": config["database"]["password"],
-        }
-
-        # Criação da engine de conexão com o banco de dados
-        engine = create_engine(
-            f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-            f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
-        )
-
-        if not stations:
-            print('Estações não providenciadas. Obtendo todas as estações')
-            stations = get_all_stations()
-
-        print('Realizando a requisição')
-        data = make_request(
-            stations=stations,
-            start_date=start_date,
-            end_date=end_date
-        )
-        print('Requisição encerrada')
-
-        if data is None:
-            print('Dados não obtidos, algum erro na requisição do site.')
-            return
-
-        print('Inserindo os dados na tabela airdata.metar')
-        data.to_sql(
-            "metar",
-            con=engine,
-            schema="airdata",
-            if_exists="append",
-            index=False,
-            chunksize=5000,
-            method="multi"
-        )
-        print('Inserção de dados finalizada')
+        return load_metar(start_date, end_date, stations)
+
+    @task(task_id='refresh_stations')
+    def refresh_stations_task() -> int:
+        """Task para atualizar as coordenadas e a elevação das estações (airdata.metar_station)"""
+        return refresh_stations()
 
     insert_data = insert_metar_data(
         start_date=date(day=1, month=1, year=2025),
         end_date=date(day=31, month=1, year=2025),
     )
-    create_table >> insert_data
+    create_table >> [refresh_stations_task(), insert_data]
 
 
 metar_extraction()
-# if __name__ == '__main__':
-#     from datetime import date
-#
-#     start_date = date(day=1, month=1, year=2025)
-#     end_date = date(day=31, month=1, year=2025)
-#     make_request(
-#         stations=['SBGR'],
-#         start_date=start_date,
-#         end_date=end_date
-#     )
 
 '''
 station: código ICAO (str)
@@ -0,0 +1,185 @@
+"""
+Esquema tipado dos dados do METAR (em memória e em airdata.metar).
+
+O CSV do asos.py chega como texto. Aqui cada coluna recebe um tipo compacto:
+- cobertura de nuvens (skyc1..4 e cloudN_amount) vira código SMALLINT (tabela airdata.metar_sky_cover)
+  e, em memória, Int16;
+- medidas inteiras por natureza (direção em graus, nós, altura das nuvens em pés) viram SMALLINT/INTEGER;
+- precipitação e acúmulo de gelo viram REAL, com o traço ('T', quantidade não mensurável) convertido
+  no valor sentinela TRACE;
+- estação e códigos de tempo presente viram categóricos do pandas (poucos valores distintos).
+"""
+CLOUD_LAYERS = 4
+
+# Colunas do DataFrame retornado por METAR.metar_decoder.decode_metar (e adicionadas a airdata.metar).
+# Ficam aqui, e não no decodificador, para que a DAG monte o DDL sem compilar as regex do METAR.
+DECODED_COLUMNS = {
+    'report_type': 'TEXT',
+    'visibility_m': 'INTEGER',
+    'cavok': 'BOOLEAN',
+    **{
+        f'cloud{layer}_{field}': sql_type
+        for layer in range(1, CLOUD_LAYERS + 1)
+        # A cobertura é gravada como código (SKY_COVER_CODES)
+        for field, sql_type in (('amount', 'SMALLINT'), ('base_ft', 'INTEGER'), ('type', 'TEXT'))
+    },
+    'qnh_hpa': 'REAL',
+    'significant_weather': 'TEXT',
+    'wx_intensity': 'TEXT',
+    'change_indicator': 'TEXT',
+}
+
+# DDL para adicionar as colunas decodificadas à tabela (propaga para as partições)
+DECODED_COLUMNS_SQL = '\n'.join(
+    f'ALTER TABLE airdata.metar ADD COLUMN IF NOT EXISTS {column} {sql_type};'
+    for column, sql_type in DECODED_COLUMNS.items()
+)
+
+# Valor sentinela do traço ('T'): maior que zero e menor que qualquer medida real
+TRACE = 0.0001
+
+# Códigos da cobertura de nuvens (airdata.metar_sky_cover)
+SKY_COVER_CODES = {
+    'SKC': 0,
+    'CLR': 1,
+    'NSC': 2,
+    'NCD': 3,
+    'FEW': 4,
+    'SCT': 5,
+    'BKN': 6,
+    'OVC': 7,
+    'VV': 8,
+}
+SKY_COVER_COLUMNS = [f'skyc{layer}' for layer in range(1, 5)] + [f'cloud{layer}_amount' for layer in range(1, 5)]
+
+# Colunas com traço ('T') possível
+TRACE_COLUMNS = ['p01m', 'p01i', 'ice_accretion_1hr', 'ice_accretion_3hr', 'ice_accretion_6hr', 'snowdepth']
+
+# Tipo em memória (pandas) e no banco de cada coluna numérica
+NUMERIC_COLUMNS = {
+    'tmpf': ('Float32', 'REAL'),
+    'tmpc': ('Float32', 'REAL'),
+    'dwpf': ('Float32', 'REAL'),
+    'dwpc': ('Float32', 'REAL'),
+    'relh': ('Float32', 'REAL'),
+    'feel': ('Float32', 'REAL'),
+    'drct': ('Int16', 'SMALLINT'),
+    'sknt': ('Int16', 'SMALLINT'),
+    'sped': ('Float32', 'REAL'),
+    'alti': ('Float32', 'REAL'),
+    'mslp': ('Float32', 'REAL'),
+    'p01m': ('Float32', 'REAL'),
+    'p01i': ('Float32', 'REAL'),
+    'vsby': ('Float32', 'REAL'),
+    'gust': ('Int16', 'SMALLINT'),
+    'skyl1': ('Int32', 'INTEGER'),
+    'skyl2': ('Int32', 'INTEGER'),
+    'skyl3': ('Int32', 'INTEGER'),
+    'skyl4': ('Int32', 'INTEGER'),
+    'ice_accretion_1hr': ('Float32', 'REAL'),
+    'ice_accretion_3hr': ('Float32', 'REAL'),
+    'ice_accretion_6hr': ('Float32', 'REAL'),
+    'peak_wind_gust': ('Int16', 'SMALLINT'),
+    'peak_wind_drct': ('Int16', 'SMALLINT'),
+    'snowdepth': ('Float32', 'REAL'),
+}
+CATEGORICAL_COLUMNS = ['station', 'wxcodes']
+DATETIME_COLUMNS = ['valid', 'peak_wind_time']
+
+_TRACE_CASE = f"CASE WHEN {{column}}::TEXT = 'T' THEN {TRACE} ELSE NULLIF({{column}}::TEXT, '')::REAL END"
+
+
+def sky_cover_case(column: str) -> str:
+    """Expressão SQL que converte a cobertura de nuvens (texto) da coluna no código SMALLINT"""
+    return f'CASE {column}::TEXT ' + ' '.join(
+        f"WHEN '{cover}' THEN {code}" for cover, code in SKY_COVER_CODES.items()
+    ) + ' END'
+
+
+def _migrations() -> list[tuple[str, str, str]]:
+    """(coluna, tipo de destino, expressão USING) das colunas convertidas para tipos compactos"""
+    migrations = [(column, 'smallint', sky_cover_case(column)) for column in SKY_COVER_COLUMNS]
+    for column, (_, sql_type) in NUMERIC_COLUMNS.items():
+        if column in TRACE_COLUMNS:
+            migrations.append((column, sql_type.lower(), _TRACE_CASE.format(column=column)))
+        elif sql_type != 'REAL':
+            migrations.append((column, sql_type.lower(), f'ROUND({column})::{sql_type}'))
+    return migrations
+
+
+# Tabela de códigos da cobertura de nuvens e migração das colunas TEXT/REAL para os tipos compactos
+# (ALTER TYPE na tabela particionada propaga para todas as partições; só roda se o tipo for diferente)
+METAR_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS airdata.metar_sky_cover (
+  code SMALLINT PRIMARY KEY,
+  cover TEXT NOT NULL UNIQUE
+);
+INSERT INTO airdata.metar_sky_cover (code, cover) VALUES
+""" + ',\n'.join(f"  ({code}, '{cover}')" for cover, code in SKY_COVER_CODES.items()) + """
+ON CONFLICT (code) DO NOTHING;
+
+DO $$
+DECLARE
+  target RECORD;
+BEGIN
+  FOR target IN
+    SELECT c.column_name, t.sql_type, t.using_expr
+    FROM information_schema.columns c
+    JOIN (VALUES
+""" + ',\n'.join(
+    f"      ('{column}', '{sql_type}', $using${using_expr}$using$)" for column, sql_type, using_expr in _migrations()
+) + """
+    ) AS t(column_name, sql_type, using_expr) ON t.column_name = c.column_name
+    WHERE c.table_schema = 'airdata' AND c.table_name = 'metar' AND c.data_type <> t.sql_type
+  LOOP
+    EXECUTE format('ALTER TABLE airdata.metar ALTER COLUMN %I TYPE %s USING %s',
+                   target.column_name, target.sql_type, target.using_expr);
+  END LOOP;
+END $$;
+"""
+
+
+def sky_cover_codes(series):
+    """Cobertura de nuvens (texto) -> código Int16; séries já codificadas são mantidas"""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('Int16')
+    return series.map(SKY_COVER_CODES).astype('Int16')
+
+
+def apply_metar_schema(df):
+    """
+    Converte um DataFrame do METAR (colunas de texto do asos.py, opcionalmente com as colunas
+    decodificadas) para os tipos compactos do esquema.
+    """
+    import pandas as pd
+
+    for column in DATETIME_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+
+    for column, (dtype, _) in NUMERIC_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if column in TRACE_COLUMNS and not pd.api.types.is_numeric_dtype(values):
+            values = values.mask(values == 'T', str(TRACE))
+        values = pd.to_numeric(values, errors='coerce')
+        if dtype.startswith('Int'):
+            values = values.round()
+        df[column] = values.astype(dtype)
+
+    for column in SKY_COVER_COLUMNS:
+        if column in df.columns:
+            df[column] = sky_cover_codes(df[column])
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+# Recarga do arquivo Parquet (COMMON.archive.replay pela DAG archive_replay): converte arquivos
+# gravados antes do esquema tipado (ex: cobertura de nuvens em texto)
+REPLAY_HOOKS = {'schema': apply_metar_schema}
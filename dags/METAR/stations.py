@@ -0,0 +1,255 @@
+"""
+Metadados e geolocalização das estações METAR e dos aeródromos, e busca da estação mais próxima.
+
+As estações da rede BR__ASOS (GeoJSON do IEM: coordenadas, elevação, nome) ficam em
+airdata.metar_station e os aeródromos (base do OurAirports: todo código ICAO que aparece no VRA) em
+airdata.aerodrome. Um índice espacial em memória (StationIndex, KD-tree do scipy sobre vetores
+unitários, com distâncias de grande círculo) responde em lote qual é a estação mais próxima de cada
+aeródromo, e o resultado fica em airdata.aerodrome_station, usado pela DAG flight_weather_processing
+para relacionar voos de aeródromos sem METAR próprio à estação vizinha.
+
+Os mesmos pontos são exportados em Turtle com geometrias GeoSPARQL (geo:asWKT) para o índice
+espacial do Fuseki (fuseki-config/airdata.ttl).
+"""
+import os
+
+# Base de aeródromos com coordenadas (configurável para apontar para um servidor local, ex: benchmarks)
+AERODROMES_URL = os.environ.get(
+    'AIRDATA_AERODROMES_URL', 'https://davidmegginson.github.io/ourairports-data/airports.csv'
+)
+
+# Raio médio da Terra (km) e distância máxima entre um aeródromo e a estação que o representa
+EARTH_RADIUS_KM = 6371.0088
+MAX_STATION_DISTANCE_KM = 50.0
+
+# IRIs dos aeródromos/estações nos arquivos Turtle exportados
+AERODROME_IRI = 'http://airdata.org/resource/aerodrome/'
+
+STATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS airdata.metar_station (
+    station TEXT PRIMARY KEY,                -- código ICAO (id da feature no GeoJSON do IEM)
+    name TEXT,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    elevation_m REAL,                        -- elevação da estação em metros
+    country TEXT,
+    state TEXT,
+    archive_begin DATE,                      -- primeira observação disponível no IEM
+    archive_end DATE,                        -- última observação (nulo: estação ativa)
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS airdata.aerodrome (
+    icao TEXT PRIMARY KEY,                   -- código ICAO (sg_icao_* do VRA)
+    name TEXT,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    elevation_m REAL,
+    country TEXT,                            -- código ISO do país
+    type TEXT,                               -- large_airport, small_airport, heliport...
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Estação METAR que representa cada aeródromo (a própria, se houver, ou a mais próxima no raio máximo)
+CREATE TABLE IF NOT EXISTS airdata.aerodrome_station (
+    aerodrome TEXT PRIMARY KEY,
+    station TEXT NOT NULL,
+    distance_km REAL NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS aerodrome_station_station_idx ON airdata.aerodrome_station (station);
+"""
+
+
+def parse_stations_geojson(content: str):
+    """Converte o GeoJSON da rede do IEM em DataFrame com as colunas de airdata.metar_station"""
+    import json
+
+    import pandas as pd
+
+    rows = []
+    for feature in json.loads(content)['features']:
+        properties = feature.get('properties') or {}
+        longitude, latitude = feature['geometry']['coordinates'][:2]
+        rows.append({
+            'station': feature['id'],
+            'name': properties.get('sname'),
+            'latitude': latitude,
+            'longitude': longitude,
+            'elevation_m': properties.get('elevation'),
+            'country': properties.get('country'),
+            'state': properties.get('state'),
+            'archive_begin': properties.get('archive_begin'),
+            'archive_end': properties.get('archive_end'),
+        })
+    df = pd.DataFrame(rows, columns=[
+        'station', 'name', 'latitude', 'longitude', 'elevation_m', 'country', 'state', 'archive_begin', 'archive_end'
+    ])
+    for column in ('archive_begin', 'archive_end'):
+        df[column] = pd.to_datetime(df[column], errors='coerce').dt.date
+    return df.drop_duplicates('station')
+
+
+def parse_aerodromes_csv(content: str):
+    """
+    Converte a base de aeródromos do OurAirports em DataFrame com as colunas de airdata.aerodrome
+    (apenas aeródromos abertos com código ICAO de quatro letras).
+    """
+    import io
+
+    import pandas as pd
+
+    df = pd.read_csv(io.StringIO(content), dtype=str, keep_default_na=False)
+    # Código ICAO: coluna icao_code (versões recentes da base), senão gps_code, senão ident
+    icao = df['ident']
+    for column in ('gps_code', 'icao_code'):
+        if column in df.columns:
+            icao = df[column].where(df[column] != '', icao)
+    df = pd.DataFrame({
+        'icao': icao.str.upper(),
+        'name': df['name'],
+        'latitude': pd.to_numeric(df['latitude_deg'], errors='coerce'),
+        'longitude': pd.to_numeric(df['longitude_deg'], errors='coerce'),
+        'elevation_m': (pd.to_numeric(df['elevation_ft'], errors='coerce') * 0.3048).round(1),
+        'country': df['iso_country'],
+        'type': df['type'],
+    })
+    df = df[df['icao'].str.fullmatch('[A-Z]{4}') & (df['type'] != 'closed')].dropna(subset=['latitude', 'longitude'])
+    # Códigos repetidos: fica o aeródromo de maior porte
+    rank = df['type'].map({'large_airport': 0, 'medium_airport': 1, 'small_airport': 2}).fillna(3)
+    return df.assign(rank=rank).sort_values('rank').drop_duplicates('icao').drop(columns='rank')
+
+
+def unit_vectors(latitudes, longitudes):
+    """Coordenadas em graus -> vetores unitários 3D (distância euclidiana é monotônica com a de grande círculo)"""
+    import numpy as np
+
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class StationIndex:
+    """
+    Índice espacial em memória das estações METAR (KD-tree sobre vetores unitários), com consultas
+    em lote da estação mais próxima de cada ponto.
+
+    Exemplo:
+
+        index = StationIndex.from_db(cur)
+        stations, distances_km = index.nearest([-23.43, -22.81], [-46.47, -43.25])
+    """
+
+    def __init__(self, stations: list, latitudes, longitudes):
+        import numpy as np
+        from scipy.spatial import cKDTree
+
+        self.stations = np.asarray(stations, dtype=object)
+        self.tree = cKDTree(unit_vectors(latitudes, longitudes))
+
+    @classmethod
+    def from_db(cls, cur) -> 'StationIndex':
+        """Índice com as estações de airdata.metar_station"""
+        cur.execute("SELECT station, latitude, longitude FROM airdata.metar_station ORDER BY station")
+        rows = cur.fetchall()
+        return cls([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def nearest(self, latitudes, longitudes, k: int = 1, max_km: float | None = None):
+        """
+        Estações mais próximas de cada ponto (consulta em lote).
+
+        Args:
+            latitudes, longitudes: coordenadas dos pontos em graus
+            k: quantidade de estações por ponto
+            max_km: distância máxima; pontos sem estação no raio recebem None e distância NaN
+
+        Returns:
+            (estações, distâncias em km), arrays de forma (n,) se k == 1, senão (n, k)
+        """
+        import numpy as np
+
+        # Distância de grande círculo d <-> corda c = 2 sen(d / 2R)
+        bound = 2 * np.sin(max_km / (2 * EARTH_RADIUS_KM)) if max_km is not None else np.inf
+        chords, indexes = self.tree.query(unit_vectors(latitudes, longitudes), k=k, distance_upper_bound=bound)
+        found = np.isfinite(chords)
+        stations = np.full(indexes.shape, None, dtype=object)
+        stations[found] = self.stations[indexes[found]]
+        distances = np.full(chords.shape, np.nan)
+        distances[found] = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chords[found] / 2, 0, 1))
+        return stations, distances
+
+
+def map_aerodromes(cur, max_km: float = MAX_STATION_DISTANCE_KM) -> int:
+    """
+    Recalcula airdata.aerodrome_station: cada aeródromo com METAR próprio aponta para si mesmo e os
+    demais para a estação mais próxima em até `max_km`.
+
+    Returns:
+        quantidade de aeródromos com estação
+    """
+    import pandas as pd
+
+    from COMMON.db import upsert_dataframe
+
+    index = StationIndex.from_db(cur)
+    if not len(index):
+        print('[STATIONS] Nenhuma estação em airdata.metar_station')
+        return 0
+    cur.execute("SELECT icao, latitude, longitude FROM airdata.aerodrome")
+    aerodromes = pd.DataFrame(cur.fetchall(), columns=['icao', 'latitude', 'longitude'])
+    stations, distances = index.nearest(aerodromes['latitude'], aerodromes['longitude'], max_km=max_km)
+
+    mapping = pd.DataFrame({'aerodrome': aerodromes['icao'], 'station': stations, 'distance_km': distances})
+    own = mapping['aerodrome'].isin(set(index.stations))
+    mapping.loc[own, 'station'] = mapping.loc[own, 'aerodrome']
+    mapping.loc[own, 'distance_km'] = 0.0
+    # Estações sem aeródromo correspondente na base também se representam
+    missing = sorted(set(index.stations) - set(mapping['aerodrome']))
+    mapping = pd.concat([
+        mapping.dropna(subset=['station']),
+        pd.DataFrame({'aerodrome': missing, 'station': missing, 'distance_km': 0.0}),
+    ], ignore_index=True)
+    mapping['distance_km'] = mapping['distance_km'].round(2)
+
+    cur.execute("DELETE FROM airdata.aerodrome_station WHERE aerodrome <> ALL(%s)", (list(mapping['aerodrome']),))
+    upsert_dataframe(cur, mapping, 'airdata.aerodrome_station', ['aerodrome'], touch_column='updated_at')
+    print(f'[STATIONS] {len(mapping)} aeródromos com estação METAR '
+          f'({int(own.sum()) + len(missing)} próprias, {len(mapping) - int(own.sum()) - len(missing)} vizinhas)')
+    return len(mapping)
+
+
+def geo_turtle(cur) -> str:
+    """
+    Turtle com as estações e os aeródromos mapeados (ad:Aerodrome, rdfs:label e geometria GeoSPARQL
+    em WKT), para o índice espacial do Fuseki.
+    """
+    cur.execute(
+        """
+        SELECT a.icao, a.name, a.latitude, a.longitude
+        FROM airdata.aerodrome a JOIN airdata.aerodrome_station s ON s.aerodrome = a.icao
+        UNION ALL
+        SELECT m.station, m.name, m.latitude, m.longitude
+        FROM airdata.metar_station m
+        WHERE NOT EXISTS (SELECT 1 FROM airdata.aerodrome a WHERE a.icao = m.station)
+        ORDER BY 1
+        """
+    )
+    lines = [
+        '@prefix ad: <http://airdata.org/ontology#> .',
+        '@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .',
+        '@prefix geo: <http://www.opengis.net/ont/geosparql#> .',
+        '@prefix sf: <http://www.opengis.net/ont/sf#> .',
+        f'@prefix aerodrome: <{AERODROME_IRI}> .',
+        '',
+    ]
+    for icao, name, latitude, longitude in cur.fetchall():
+        label = (name or icao).replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(
+            f'aerodrome:{icao} a ad:Aerodrome ; rdfs:label "{label}" ; geo:hasGeometry aerodrome:{icao}-geometry .\n'
+            f'aerodrome:{icao}-geometry a sf:Point ; '
+            f'geo:asWKT "POINT({longitude:.6f} {latitude:.6f})"^^geo:wktLiteral .'
+        )
+    return '\n'.join(lines) + '\n'
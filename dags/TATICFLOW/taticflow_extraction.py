@@ -1,16 +1,38 @@
-from airflow.sdk import dag, task
-from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
-
-	
-@dag(dag_id='taticflow_extraction', schedule='0 * * * *', max_active_runs=1)
-def taticflow_extraction():
-	"""DAG para extração e atualização dos dados da Tatic Flow"""
-	
-	# Task para criar a tabela VRA se não existir
-	create_table = SQLExecuteQueryOperator(
-	task_id='create_table',
-	conn_id='postgres',
-	sql="""
+import itertools
+import os
+from typing import NamedTuple
+
+from COMMON.connector import SourceConnector, build_extraction_dag
+from COMMON.validation import NotNull, Ordering, Unique
+
+# URL paginada da API do Tatic Flow (registros com createdat posterior à marca d'água), configurável
+# para apontar para um servidor local (ex: benchmarks)
+API_URL = os.environ.get("AIRDATA_TATICFLOW_URL", "https://odin-ms.icea.decea.mil.br/api/tatic_flow") + "?createdat=gt.{date}&order=createdat.asc&limit={limit}&offset={offset}"
+PAGE_SIZE = 1000
+
+
+class Page(NamedTuple):
+	"""Página da API: registros criados após `created_after`, a partir de `offset`"""
+	created_after: str
+	offset: int
+
+
+class TaticFlowConnector(SourceConnector):
+	"""Extração e atualização dos dados da Tatic Flow, em páginas de PAGE_SIZE registros"""
+	name = "taticflow"
+	table = "taticflow"
+	watermark_column = "createdat"
+	key_columns = ["flowid"]
+	# Regras de qualidade (linhas reprovadas vão para airdata.quarantine)
+	rules = [
+		NotNull("id", "flowid", "createdat", "locality", "callsign", "eventtype"),
+		Unique("flowid"),
+		Unique("id"),
+		Ordering("dep", "arr", name="ordering_dep_arr"),
+	]
+	fetch_workers = 3
+	parse_workers = 1
+	table_sql = """
 	CREATE TABLE IF NOT EXISTS airdata.taticflow (
 		id varchar(36) NOT NULL,
 		flowid varchar(36) NOT NULL,
@@ -42,118 +64,54 @@ def taticflow_extraction():
 		CONSTRAINT flowmovements_pkey PRIMARY KEY (id),
 		dt_insercao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 	);
+
+	-- Marca d'água (MAX(createdat)) e leituras incrementais das DAGs de processamento
+	CREATE INDEX IF NOT EXISTS taticflow_createdat_idx ON airdata.taticflow (createdat);
 	"""
-)
-	
-	@task
-	def get_last_update() -> str:
-		"""Task para obter a última data registrada na tabela VRA."""
-		import psycopg2
-		import configparser
-
-		# Leitura das configurações do banco de dados
-		config = configparser.ConfigParser()
-		config.read("/opt/airflow/config/db.cfg")
-		DB_CONFIG = {
-			"host": config["database"]["host"],
-			"port": config["database"]["port"],
-			"dbname": config["database"]["dbname"],
-			"user": config["database"]["user"],
-			"password": config["database"]["password"],
-		}
-		# Conexão ao banco de dados
-		conn = psycopg2.connect(**DB_CONFIG)
-		cur = conn.cursor()
-		# Consulta para obter a última data de referência
-		cur.execute("SELECT MAX(createdat) FROM airdata.taticflow;")
-		last_date = cur.fetchone()[0]
-		cur.close()
-		conn.close()
-
-		# Verifica se há dados na tabela
-		if last_date is None:
-			print("Nenhum dado encontrado — iniciando de 2025-07-31")
-			return "2025-07-31"
-		# date_str = last_date.strftime("%Y-%m-%d")
-		# print(f"Última atualização: {date_str}")
-		# return date_str
-		# em get_last_update()
-		return last_date.isoformat(timespec="milliseconds")
-
-
-
-	@task
-	def update_taticflow_data(last_date: str):
-		"""Atualiza dados do Tatic Flow a partir da última data registrada"""
-		from sqlalchemy import create_engine
-		import requests
+
+	def items(self, watermark: str):
+		"""Páginas (offsets) da consulta a partir da marca d'água, até a última página"""
+		return (Page(watermark, offset) for offset in itertools.count(0, PAGE_SIZE))
+
+	def fetch(self, page: Page):
+		"""Requisição de uma página; a última (menos de PAGE_SIZE registros) encerra o pipeline"""
+		from COMMON.http_client import get_default_client
+		from COMMON.pipeline import StopPipeline
+
+		url = API_URL.format(date=page.created_after, limit=PAGE_SIZE, offset=page.offset)
+		print(f"[TATIC_FLOW] Requisitando {url}")
+		r = get_default_client().get(url)
+
+		if r.status_code != 200:
+			raise RuntimeError(f"[TATIC_FLOW] Erro {r.status_code} na requisição (offset={page.offset}).")
+
+		data = r.json()
+		if not data:
+			print(f"[TATIC_FLOW] Nenhum dado retornado (offset={page.offset}). Fim da atualização.")
+			raise StopPipeline()
+		# Para se retornou menos de PAGE_SIZE registros (a página ainda é carregada)
+		if len(data) < PAGE_SIZE:
+			print("[TATIC_FLOW] Última página alcançada.")
+			raise StopPipeline(data)
+		return data
+
+	def parse(self, page: Page, data):
+		import pandas as pd
+
+		# Converte campos de data/hora
+		# for col in df.columns:
+		# 	if "at" in col or col in ["eobt", "dep", "arr", "eta"]:
+		# 		df[col] = pd.to_datetime(df[col], errors="coerce")
+		return pd.DataFrame(data)
+
+	def item_watermark(self, page: Page, df) -> str:
 		import pandas as pd
-		from datetime import datetime, timedelta
-		import configparser
-
-		# Leitura da configuração
-		config = configparser.ConfigParser()
-		config.read("/opt/airflow/config/db.cfg")
-		DB_CONFIG = {
-			"host": config["database"]["host"],
-			"port": config["database"]["port"],
-			"dbname": config["database"]["dbname"],
-			"user": config["database"]["user"],
-			"password": config["database"]["password"],
-		}
-
-		# Conexão com o banco
-		engine = create_engine(
-			f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-			f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
-		)
-
-		base_url = "https://odin-ms.icea.decea.mil.br/api/tatic_flow?createdat=gt.{date}&order=createdat.asc&limit=1000&offset={offset}"
-		offset = 0
-		total = 0
-
-		while True:
-			url = base_url.format(date=last_date, offset=offset)
-			print(f"[TATIC_FLOW] Requisitando {url}")
-			r = requests.get(url, timeout=60)
-
-			if r.status_code != 200:
-				print(f"[TATIC_FLOW] Erro {r.status_code} na requisição. Encerrando.")
-				break
-
-			data = r.json()
-			if not data:
-				print("[TATIC_FLOW] Nenhum dado retornado. Fim da atualização.")
-				break
-
-			df = pd.DataFrame(data)
-			if df.empty:
-				break
-
-			# Converte campos de data/hora
-			# for col in df.columns:
-			# 	if "at" in col or col in ["eobt", "dep", "arr", "eta"]:
-			# 		df[col] = pd.to_datetime(df[col], errors="coerce")
-
-			# Insere no banco
-			df.to_sql("taticflow", con=engine, schema="airdata", if_exists="append", index=False)
-			print(f"[TATIC_FLOW] Inseridos {len(df)} registros (offset={offset}).")
-
-			total += len(df)
-			offset += 1000
-
-			# Para se retornou menos de 1000 registros
-			if len(data) < 1000:
-				print("[TATIC_FLOW] Última página alcançada.")
-				break
-
-		print(f"[TATIC_FLOW] Atualização concluída. Total inserido: {total}")
-
-
-	# Definição da ordem das tasks
-	last_update = get_last_update()
-	update_task = update_taticflow_data(last_update)
-	
-	create_table >> last_update >> update_task
-
-taticflow_extraction()
\ No newline at end of file
+
+		return pd.to_datetime(df["createdat"]).max().isoformat(timespec="milliseconds")
+
+	def format_watermark(self, value) -> str:
+		return value.isoformat(timespec="milliseconds")
+
+
+# DAG do Airflow: create_table >> get_last_update >> update_data
+taticflow_extraction = build_extraction_dag(TaticFlowConnector(), dag_id="taticflow_extraction", schedule="0 * * * *")
@@ -0,0 +1,211 @@
+from airflow.sdk import dag, task
+from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
+
+from COMMON.db import INGESTION_STATE_SQL
+
+# KPIs calculados a partir dos marcos de cada movimento, alinhados aos conceitos da ontologia:
+# (nome, classe ad: do KPI, propriedade ad:Performance-* que o relaciona, coluna em minutos)
+KPIS = [
+	("taxi_out", "TaxiOutEfficiencyKPI", "departureKPI", "taxi_out_min"),
+	("holding", "DeparturePerformanceKPI", "departureKPI", "holding_min"),
+	("eobt_adherence", "GateDepartureOnTimeKPI", "departureKPI", "eobt_adherence_min"),
+	("taxi_in", "TaxilnEfficiencyKPI", "arrivalKPI", "taxi_in_min"),
+	("eta_adherence", "ArrivalPerformanceKPI", "arrivalKPI", "eta_adherence_min"),
+]
+
+# Cálculo (vetorizado, em SQL) dos KPIs por movimento para os registros novos da taticflow.
+# Durações fora de uma faixa plausível são descartadas (NULL) para não distorcer os agregados.
+# Retorna o kpi_time gravado de cada movimento e também o anterior (previous = TRUE) dos que já
+# existiam: um movimento que muda de hora (ex: eobt -> dep) precisa sair do agregado antigo.
+MOVEMENT_SQL = """
+WITH novos AS (
+	SELECT
+		t.flowid, t.locality, t.runway, t.eventtype, t.createdat,
+		COALESCE(t.dep, t.arr, t.eobt, t.createdat) AS kpi_time,
+		EXTRACT(EPOCH FROM t.dep - COALESCE(t.cpush, t.taxi)) / 60 AS taxi_out,
+		EXTRACT(EPOCH FROM t.dep - t."hold") / 60 AS holding,
+		EXTRACT(EPOCH FROM COALESCE(t.cpush, t.taxi) - t.eobt) / 60 AS eobt_adherence,
+		EXTRACT(EPOCH FROM t.cpos - t.arr) / 60 AS taxi_in,
+		EXTRACT(EPOCH FROM t.arr - t.eta) / 60 AS eta_adherence
+	FROM airdata.taticflow t
+	WHERE t.createdat > %(watermark)s::TIMESTAMP AND t.createdat <= %(until)s::TIMESTAMP
+),
+-- Todas as partes do comando veem o mesmo snapshot: aqui ainda o kpi_time antes do upsert
+anteriores AS (
+	SELECT m.kpi_time FROM airdata.taticflow_kpi_movement m JOIN novos n ON n.flowid = m.flowid
+),
+gravados AS (
+INSERT INTO airdata.taticflow_kpi_movement AS m (
+	flowid, locality, runway, eventtype, createdat, kpi_time,
+	taxi_out_min, holding_min, eobt_adherence_min, taxi_in_min, eta_adherence_min
+)
+SELECT
+	flowid, locality, runway, eventtype, createdat, kpi_time,
+	CASE WHEN taxi_out BETWEEN 0 AND 240 THEN taxi_out END,
+	CASE WHEN holding BETWEEN 0 AND 240 THEN holding END,
+	CASE WHEN eobt_adherence BETWEEN -720 AND 720 THEN eobt_adherence END,
+	CASE WHEN taxi_in BETWEEN 0 AND 240 THEN taxi_in END,
+	CASE WHEN eta_adherence BETWEEN -720 AND 720 THEN eta_adherence END
+FROM novos
+ON CONFLICT (flowid) DO UPDATE SET
+	locality = EXCLUDED.locality,
+	runway = EXCLUDED.runway,
+	eventtype = EXCLUDED.eventtype,
+	createdat = EXCLUDED.createdat,
+	kpi_time = EXCLUDED.kpi_time,
+	taxi_out_min = EXCLUDED.taxi_out_min,
+	holding_min = EXCLUDED.holding_min,
+	eobt_adherence_min = EXCLUDED.eobt_adherence_min,
+	taxi_in_min = EXCLUDED.taxi_in_min,
+	eta_adherence_min = EXCLUDED.eta_adherence_min
+RETURNING m.kpi_time
+)
+SELECT kpi_time, FALSE AS previous FROM gravados
+UNION ALL
+SELECT kpi_time, TRUE FROM anteriores;
+"""
+
+
+def rollup_sql() -> str:
+	"""Monta o SQL de agregação (formato longo: uma linha por KPI) para uma granularidade e lista de períodos"""
+	kpi_values = ",\n\t\t\t".join(
+		f"('{name}', '{ontology_class}', '{performance}', m.{column})"
+		for name, ontology_class, performance, column in KPIS
+	)
+	return f"""
+	INSERT INTO airdata.taticflow_kpi_rollup
+	SELECT
+		%(granularity)s,
+		date_trunc(%(granularity)s, m.kpi_time) AS bucket_start,
+		m.locality,
+		COALESCE(m.runway, '') AS runway,
+		k.kpi,
+		k.ontology_class,
+		k.performance,
+		COUNT(*),
+		AVG(k.value),
+		percentile_cont(0.5) WITHIN GROUP (ORDER BY k.value),
+		percentile_cont(0.9) WITHIN GROUP (ORDER BY k.value),
+		MIN(k.value),
+		MAX(k.value)
+	FROM airdata.taticflow_kpi_movement m
+	CROSS JOIN LATERAL (
+		VALUES
+			{kpi_values}
+	) AS k(kpi, ontology_class, performance, value)
+	WHERE k.value IS NOT NULL
+		AND m.kpi_time >= %(first_bucket)s::TIMESTAMP
+		AND m.kpi_time < %(last_bucket)s::TIMESTAMP + ('1 ' || %(granularity)s)::INTERVAL
+		AND date_trunc(%(granularity)s, m.kpi_time) = ANY(%(buckets)s::TIMESTAMP[])
+	GROUP BY 1, 2, 3, 4, 5, 6, 7;
+	"""
+
+
+@dag(dag_id='taticflow_kpi_processing', schedule='30 * * * *', max_active_runs=1)
+def taticflow_kpi_processing():
+	"""DAG de processamento dos KPIs de taxi, holding e aderência ao EOBT/ETA a partir da Tatic Flow"""
+
+	# Task para criar as tabelas de KPIs se não existirem
+	create_table = SQLExecuteQueryOperator(
+	task_id='create_table',
+	conn_id='postgres',
+	sql=INGESTION_STATE_SQL + """
+	-- KPIs por movimento (um registro por flowid), base dos agregados
+	CREATE TABLE IF NOT EXISTS airdata.taticflow_kpi_movement (
+		flowid varchar(36) PRIMARY KEY,
+		locality varchar(4) NOT NULL,
+		runway varchar(15) NULL,
+		eventtype varchar(3) NULL,
+		createdat timestamp(3) NOT NULL,
+		kpi_time timestamp(3) NOT NULL,           -- instante de referência do movimento (dep, arr, eobt ou createdat)
+		taxi_out_min REAL,                        -- dep - (cpush | taxi)
+		holding_min REAL,                         -- dep - hold
+		eobt_adherence_min REAL,                  -- (cpush | taxi) - eobt
+		taxi_in_min REAL,                         -- cpos - arr
+		eta_adherence_min REAL                    -- arr - eta
+	);
+	CREATE INDEX IF NOT EXISTS taticflow_kpi_movement_time_idx ON airdata.taticflow_kpi_movement (kpi_time);
+
+	-- Agregados por hora e por dia, em formato longo (um registro por KPI)
+	CREATE TABLE IF NOT EXISTS airdata.taticflow_kpi_rollup (
+		granularity TEXT NOT NULL,                -- 'hour' | 'day'
+		bucket_start TIMESTAMP NOT NULL,
+		locality varchar(4) NOT NULL,
+		runway varchar(15) NOT NULL,              -- '' quando a pista não foi informada
+		kpi TEXT NOT NULL,
+		ontology_class TEXT NOT NULL,             -- classe ad: do KPI (ex: TaxiOutEfficiencyKPI)
+		performance TEXT NOT NULL,                -- ad:Performance-departureKPI | ad:Performance-arrivalKPI
+		n INTEGER NOT NULL,
+		mean_min REAL,
+		p50_min REAL,
+		p90_min REAL,
+		min_min REAL,
+		max_min REAL,
+		PRIMARY KEY (granularity, bucket_start, locality, runway, kpi)
+	);
+	"""
+)
+
+	@task
+	def update_movement_kpis() -> list:
+		"""Task para calcular os KPIs por movimento dos registros novos (após a marca d'água)"""
+		from COMMON.db import get_connection, get_watermark, set_watermark
+
+		conn = get_connection()
+		kpi_times = []
+		with conn, conn.cursor() as cur:
+			watermark = get_watermark(cur, 'taticflow_kpi') or '1970-01-01T00:00:00.000'
+			cur.execute("SELECT MAX(createdat) FROM airdata.taticflow WHERE createdat > %s::TIMESTAMP", (watermark,))
+			until = cur.fetchone()[0]
+			if until is not None:
+				until = until.isoformat(timespec="milliseconds")
+				cur.execute(MOVEMENT_SQL, {'watermark': watermark, 'until': until})
+				kpi_times = cur.fetchall()
+				set_watermark(cur, 'taticflow_kpi', until)
+		conn.close()
+
+		if until is None:
+			print("[TATIC_FLOW_KPI] Nenhum registro novo.")
+			return []
+
+		# Horas novas e antigas dos movimentos (os que mudaram de hora são recalculados nas duas)
+		hours = sorted({kpi_time.replace(minute=0, second=0, microsecond=0) for kpi_time, _ in kpi_times})
+		updated = sum(1 for _, previous in kpi_times if not previous)
+		print(f"[TATIC_FLOW_KPI] Movimentos atualizados: {updated} em {len(hours)} horas")
+		return [hour.isoformat() for hour in hours]
+
+	@task
+	def update_rollups(hours: list):
+		"""Task para recalcular os agregados horários e diários apenas dos períodos afetados"""
+		from datetime import datetime
+		from COMMON.db import get_connection
+
+		if not hours:
+			print("[TATIC_FLOW_KPI] Nenhum período a recalcular.")
+			return
+
+		buckets_by_granularity = {
+			'hour': sorted({datetime.fromisoformat(hour) for hour in hours}),
+			'day': sorted({datetime.fromisoformat(hour).replace(hour=0) for hour in hours}),
+		}
+
+		conn = get_connection()
+		with conn, conn.cursor() as cur:
+			for granularity, buckets in buckets_by_granularity.items():
+				cur.execute(
+					"DELETE FROM airdata.taticflow_kpi_rollup WHERE granularity = %s AND bucket_start = ANY(%s::TIMESTAMP[])",
+					(granularity, buckets)
+				)
+				cur.execute(rollup_sql(), {
+					'granularity': granularity,
+					'buckets': buckets,
+					'first_bucket': buckets[0],
+					'last_bucket': buckets[-1],
+				})
+				print(f"[TATIC_FLOW_KPI] Agregados '{granularity}' recalculados: {cur.rowcount} linhas")
+		conn.close()
+
+	hours = update_movement_kpis()
+	create_table >> hours >> update_rollups(hours)
+
+taticflow_kpi_processing()
@@ -0,0 +1,297 @@
+"""
+Dimensões do VRA: empresas, aeródromos, equipamentos, situações e justificativas.
+
+Cada voo repetia textos longos (nome da empresa, dos aeródromos, situação e justificativa), o que
+inchava a tabela e os índices e deixava lentos os agrupamentos por esses campos. A tabela fato
+airdata.vra_fact guarda apenas as chaves inteiras das dimensões. A view airdata.vra mantém o formato
+plano original para as consultas existentes (flight_weather, grafo virtual).
+
+Na carga, os valores de cada lote são resolvidos em chaves por um cache em memória do processo
+(DimensionCache). Os valores fora do cache são procurados no banco por chave natural; só as chaves
+novas são inseridas (INSERT ... ON CONFLICT DO NOTHING) e só os atributos que mudaram são
+atualizados, sem consumir a sequência nem regravar linhas a cada lote. Empresas e aeródromos são
+identificados pelo código ICAO. O nome preenchido mais recente (dt_referencia) substitui o anterior.
+
+Exemplo:
+
+	fact = to_fact(cur, df)       # df com as colunas do VRA -> colunas de airdata.vra_fact
+"""
+from typing import NamedTuple
+
+
+class Dimension(NamedTuple):
+	"""Tabela de dimensão: chave natural única e atributos (atualizados quando mudam)"""
+	table: str
+	key: str
+	attributes: tuple = ()
+
+
+DIMENSIONS = {
+	'empresa': Dimension('airdata.vra_empresa', 'sg_empresa_icao', ('nm_empresa',)),
+	'aerodromo': Dimension('airdata.vra_aerodromo', 'sg_icao', ('nm_aerodromo',)),
+	'equipamento': Dimension('airdata.vra_equipamento', 'sg_equipamento_icao'),
+	'situacao': Dimension('airdata.vra_situacao', 'ds_situacao'),
+	'justificativa': Dimension('airdata.vra_justificativa', 'ds_justificativa'),
+}
+
+# Coluna da tabela fato -> (dimensão, colunas do VRA com a chave natural e os atributos)
+FACT_REFERENCES = {
+	'empresa_id': ('empresa', ('sg_empresa_icao', 'nm_empresa')),
+	'equipamento_id': ('equipamento', ('sg_equipamento_icao',)),
+	'origem_id': ('aerodromo', ('sg_icao_origem', 'nm_aerodromo_origem')),
+	'destino_id': ('aerodromo', ('sg_icao_destino', 'nm_aerodromo_destino')),
+	'situacao_voo_id': ('situacao', ('ds_situacao_voo',)),
+	'justificativa_id': ('justificativa', ('ds_justificativa',)),
+	'situacao_partida_id': ('situacao', ('ds_situacao_partida',)),
+	'situacao_chegada_id': ('situacao', ('ds_situacao_chegada',)),
+}
+
+# Colunas de airdata.vra_fact (na ordem da tabela, sem id e dt_insercao)
+FACT_COLUMNS = [
+	'empresa_id', 'nr_voo', 'cd_di', 'cd_tipo_linha', 'equipamento_id', 'nr_assentos_ofertados',
+	'origem_id', 'dt_partida_prevista', 'dt_partida_real', 'destino_id', 'dt_chegada_prevista',
+	'dt_chegada_real', 'situacao_voo_id', 'justificativa_id', 'dt_referencia', 'situacao_partida_id',
+	'situacao_chegada_id',
+]
+
+# Chave natural do voo na tabela fato (mesma de VraConnector.key_columns, com as chaves das dimensões)
+FACT_KEY_COLUMNS = ['dt_referencia', 'empresa_id', 'nr_voo', 'origem_id', 'dt_partida_prevista']
+
+DIMENSIONS_SQL = """
+	CREATE TABLE IF NOT EXISTS airdata.vra_empresa (
+		id SERIAL PRIMARY KEY,
+		sg_empresa_icao VARCHAR(10) NOT NULL UNIQUE,
+		nm_empresa TEXT
+	);
+	CREATE TABLE IF NOT EXISTS airdata.vra_aerodromo (
+		id SERIAL PRIMARY KEY,
+		sg_icao VARCHAR(10) NOT NULL UNIQUE,
+		nm_aerodromo TEXT
+	);
+	CREATE TABLE IF NOT EXISTS airdata.vra_equipamento (
+		id SERIAL PRIMARY KEY,
+		sg_equipamento_icao VARCHAR(10) NOT NULL UNIQUE
+	);
+	CREATE TABLE IF NOT EXISTS airdata.vra_situacao (
+		id SERIAL PRIMARY KEY,
+		ds_situacao TEXT NOT NULL UNIQUE
+	);
+	CREATE TABLE IF NOT EXISTS airdata.vra_justificativa (
+		id SERIAL PRIMARY KEY,
+		ds_justificativa TEXT NOT NULL UNIQUE
+	);
+"""
+
+# Formato plano original (mesmas colunas e ordem da antiga tabela airdata.vra)
+VIEW_SQL = """
+	CREATE OR REPLACE VIEW airdata.vra AS
+	SELECT
+		f.id,
+		e.sg_empresa_icao,
+		e.nm_empresa,
+		f.nr_voo,
+		f.cd_di,
+		f.cd_tipo_linha,
+		q.sg_equipamento_icao,
+		f.nr_assentos_ofertados,
+		o.sg_icao AS sg_icao_origem,
+		o.nm_aerodromo AS nm_aerodromo_origem,
+		f.dt_partida_prevista,
+		f.dt_partida_real,
+		d.sg_icao AS sg_icao_destino,
+		d.nm_aerodromo AS nm_aerodromo_destino,
+		f.dt_chegada_prevista,
+		f.dt_chegada_real,
+		sv.ds_situacao AS ds_situacao_voo,
+		j.ds_justificativa,
+		f.dt_referencia,
+		sp.ds_situacao AS ds_situacao_partida,
+		sc.ds_situacao AS ds_situacao_chegada,
+		f.dt_insercao
+	FROM airdata.vra_fact f
+	LEFT JOIN airdata.vra_empresa e ON e.id = f.empresa_id
+	LEFT JOIN airdata.vra_equipamento q ON q.id = f.equipamento_id
+	LEFT JOIN airdata.vra_aerodromo o ON o.id = f.origem_id
+	LEFT JOIN airdata.vra_aerodromo d ON d.id = f.destino_id
+	LEFT JOIN airdata.vra_situacao sv ON sv.id = f.situacao_voo_id
+	LEFT JOIN airdata.vra_justificativa j ON j.id = f.justificativa_id
+	LEFT JOIN airdata.vra_situacao sp ON sp.id = f.situacao_partida_id
+	LEFT JOIN airdata.vra_situacao sc ON sc.id = f.situacao_chegada_id;
+"""
+
+# Migração de uma tabela plana (airdata.vra_legacy, particionada ou não) para as dimensões e a tabela fato.
+# Nomes das dimensões: o preenchido do voo mais recente de cada código.
+MIGRATION_SQL = """
+	INSERT INTO airdata.vra_empresa (sg_empresa_icao, nm_empresa)
+		SELECT DISTINCT ON (sg_empresa_icao) sg_empresa_icao, nm_empresa
+		FROM airdata.vra_legacy WHERE sg_empresa_icao IS NOT NULL
+		ORDER BY sg_empresa_icao, nm_empresa IS NULL, dt_referencia DESC
+		ON CONFLICT (sg_empresa_icao) DO NOTHING;
+	INSERT INTO airdata.vra_aerodromo (sg_icao, nm_aerodromo)
+		SELECT DISTINCT ON (sg_icao) sg_icao, nm_aerodromo FROM (
+			SELECT sg_icao_origem AS sg_icao, nm_aerodromo_origem AS nm_aerodromo, dt_referencia FROM airdata.vra_legacy
+			UNION ALL
+			SELECT sg_icao_destino, nm_aerodromo_destino, dt_referencia FROM airdata.vra_legacy
+		) a WHERE sg_icao IS NOT NULL
+		ORDER BY sg_icao, nm_aerodromo IS NULL, dt_referencia DESC
+		ON CONFLICT (sg_icao) DO NOTHING;
+	INSERT INTO airdata.vra_equipamento (sg_equipamento_icao)
+		SELECT DISTINCT sg_equipamento_icao FROM airdata.vra_legacy WHERE sg_equipamento_icao IS NOT NULL
+		ON CONFLICT DO NOTHING;
+	INSERT INTO airdata.vra_situacao (ds_situacao)
+		SELECT ds_situacao_voo FROM airdata.vra_legacy WHERE ds_situacao_voo IS NOT NULL
+		UNION SELECT ds_situacao_partida FROM airdata.vra_legacy WHERE ds_situacao_partida IS NOT NULL
+		UNION SELECT ds_situacao_chegada FROM airdata.vra_legacy WHERE ds_situacao_chegada IS NOT NULL
+		ON CONFLICT DO NOTHING;
+	INSERT INTO airdata.vra_justificativa (ds_justificativa)
+		SELECT DISTINCT ds_justificativa FROM airdata.vra_legacy WHERE ds_justificativa IS NOT NULL
+		ON CONFLICT DO NOTHING;
+
+	INSERT INTO airdata.vra_fact (id, """ + ', '.join(FACT_COLUMNS) + """, dt_insercao)
+		SELECT
+			l.id, e.id, l.nr_voo, l.cd_di, l.cd_tipo_linha, q.id, l.nr_assentos_ofertados,
+			o.id, l.dt_partida_prevista, l.dt_partida_real, d.id, l.dt_chegada_prevista,
+			l.dt_chegada_real, sv.id, j.id, l.dt_referencia, sp.id,
+			sc.id, l.dt_insercao
+		FROM airdata.vra_legacy l
+		LEFT JOIN airdata.vra_empresa e ON e.sg_empresa_icao = l.sg_empresa_icao
+		LEFT JOIN airdata.vra_equipamento q ON q.sg_equipamento_icao = l.sg_equipamento_icao
+		LEFT JOIN airdata.vra_aerodromo o ON o.sg_icao = l.sg_icao_origem
+		LEFT JOIN airdata.vra_aerodromo d ON d.sg_icao = l.sg_icao_destino
+		LEFT JOIN airdata.vra_situacao sv ON sv.ds_situacao = l.ds_situacao_voo
+		LEFT JOIN airdata.vra_justificativa j ON j.ds_justificativa = l.ds_justificativa
+		LEFT JOIN airdata.vra_situacao sp ON sp.ds_situacao = l.ds_situacao_partida
+		LEFT JOIN airdata.vra_situacao sc ON sc.ds_situacao = l.ds_situacao_chegada
+		WHERE l.dt_referencia IS NOT NULL
+		ON CONFLICT DO NOTHING;
+"""
+
+
+class DimensionCache:
+	"""
+	Chaves das dimensões já resolvidas neste processo: (dimensão, chave natural e atributos) -> id.
+
+	Um id só é válido depois do commit da transação que inseriu a linha. Se a carga falhar,
+	quem chama deve limpar o cache (clear).
+	"""
+
+	def __init__(self):
+		self.ids = {name: {} for name in DIMENSIONS}
+
+	def clear(self):
+		for ids in self.ids.values():
+			ids.clear()
+
+	def resolve(self, cur, name: str, values: list) -> int:
+		"""
+		Garante no cache os ids dos valores (tuplas chave + atributos) de uma dimensão. Os valores vêm
+		na ordem das linhas do lote (dt_referencia crescente): vale o último atributo preenchido de
+		cada chave.
+
+		Returns:
+			quantidade de valores inseridos ou atualizados no banco
+		"""
+		dimension = DIMENSIONS[name]
+		ids = self.ids[name]
+		missing = [value for value in values if value[0] is not None and value not in ids]
+		if not missing:
+			return 0
+
+		# Um valor por chave natural; atributo nulo não apaga o valor conhecido
+		by_key = {}
+		for value in missing:
+			known = by_key.get(value[0], value)
+			by_key[value[0]] = tuple(new if new is not None else old for new, old in zip(value, known))
+
+		columns = (dimension.key,) + dimension.attributes
+		unnest = f"unnest({', '.join(['%s::TEXT[]'] * len(columns))}) AS u({', '.join(columns)})"
+		cur.execute(
+			f"SELECT {', '.join(columns)}, id FROM {dimension.table} WHERE {dimension.key} = ANY(%s)",
+			(list(by_key),)
+		)
+		existing = {row[0]: row for row in cur.fetchall()}
+		key_ids = {key: row[-1] for key, row in existing.items()}
+
+		changed = [
+			value for key, value in by_key.items()
+			if key in existing and any(new is not None and new != old for new, old in zip(value[1:], existing[key][1:-1]))
+		]
+		if changed:
+			updates = ', '.join(f'{column} = COALESCE(u.{column}, t.{column})' for column in dimension.attributes)
+			cur.execute(
+				f"UPDATE {dimension.table} t SET {updates} FROM {unnest} WHERE t.{dimension.key} = u.{dimension.key}",
+				[list(column) for column in zip(*changed)]
+			)
+
+		new = [value for key, value in by_key.items() if key not in existing]
+		if new:
+			cur.execute(
+				f"INSERT INTO {dimension.table} ({', '.join(columns)}) SELECT * FROM {unnest} "
+				f"ON CONFLICT ({dimension.key}) DO NOTHING RETURNING {dimension.key}, id",
+				[list(column) for column in zip(*new)]
+			)
+			key_ids.update(cur.fetchall())
+			# Chaves inseridas por outra carga entre o SELECT e o INSERT
+			raced = [value[0] for value in new if value[0] not in key_ids]
+			if raced:
+				cur.execute(f"SELECT {dimension.key}, id FROM {dimension.table} WHERE {dimension.key} = ANY(%s)", (raced,))
+				key_ids.update(cur.fetchall())
+
+		for value in missing:
+			ids[value] = key_ids[value[0]]
+		return len(changed) + len(new)
+
+	def lookup(self, name: str, value: tuple):
+		return None if value[0] is None else self.ids[name][value]
+
+
+# Cache do processo (o estágio de carga do pipeline roda em uma única thread)
+DIMENSION_CACHE = DimensionCache()
+
+
+def clear_cache():
+	"""Esvazia o cache do processo (carga desfeita)"""
+	DIMENSION_CACHE.clear()
+
+
+def to_fact(cur, df, cache: DimensionCache = DIMENSION_CACHE):
+	"""
+	Converte um lote do VRA (colunas planas) nas colunas de airdata.vra_fact, resolvendo os textos em
+	chaves das dimensões (na transação do cursor).
+	"""
+	import pandas as pd
+
+	# Valores de cada referência como tuplas (nulos -> None)
+	values = {}
+	for column, (name, source_columns) in FACT_REFERENCES.items():
+		source = df.reindex(columns=list(source_columns)).astype(object)
+		source = source.where(source.notna(), None)
+		values[column] = list(source.itertuples(index=False, name=None))
+
+	# Linhas em ordem de dt_referencia (estável): o nome mais recente de cada código é o último
+	if 'dt_referencia' in df.columns:
+		order = pd.Series(df['dt_referencia'].to_numpy()).sort_values(kind='stable', na_position='first').index
+	else:
+		order = range(len(df))
+
+	new_values = 0
+	for name in DIMENSIONS:
+		batch = [
+			values[column][position]
+			for position in order
+			for column, (dimension, _) in FACT_REFERENCES.items() if dimension == name
+		]
+		new_values += cache.resolve(cur, name, batch)
+	if new_values:
+		print(f"[VRA] {new_values} valores novos ou alterados nas dimensões")
+
+	fact = df.reindex(columns=FACT_COLUMNS)
+	for column, (name, _) in FACT_REFERENCES.items():
+		fact[column] = pd.array([cache.lookup(name, value) for value in values[column]], dtype='Int32')
+	return fact
+
+
+# Recarga do arquivo Parquet (COMMON.archive.replay pela DAG archive_replay): o arquivo guarda o
+# formato plano, a tabela fato recebe as chaves das dimensões e, se a recarga falhar, os ids
+# resolvidos na transação desfeita deixam de valer
+REPLAY_HOOKS = {'fact': to_fact, 'fact_key_columns': FACT_KEY_COLUMNS, 'on_failure': clear_cache}
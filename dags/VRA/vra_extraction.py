@@ -1,162 +1,169 @@
-from airflow.sdk import dag, task
-from airflow.providers.common.sql.operators.sql import SQLExecuteQueryOperator
-
-def parse_datetime(x):
-	"""Realiza o parsing de uma string para datetime no formato dd/mm/YYYY HH:MM"""
-	import pandas as pd
-
-	return pd.to_datetime(x, format="%d/%m/%Y %H:%M", errors="coerce")
-
-def parse_date(x):
-	"""Realiza o parsing de uma string para date no formato dd/mm/YYYY"""
-	import pandas as pd
-
-	return pd.to_datetime(x, format="%d/%m/%Y", errors="coerce")
-	
-@dag(dag_id='vra_extraction', schedule='0 6 * * *', max_active_runs=1)
-def vra_extraction():
-	"""DAG para extração e atualização dos dados da VRA (Voo Regular Ativo - ANAC)"""
-	
-	# Task para criar a tabela VRA se não existir
-	create_table = SQLExecuteQueryOperator(
-	task_id='create_table',
-	conn_id='postgres',
-	sql="""
-	CREATE TABLE IF NOT EXISTS airdata.vra (
-		id SERIAL PRIMARY KEY,
-		sg_empresa_icao VARCHAR(10),
-		nm_empresa TEXT,
+import os
+from datetime import date, datetime, timedelta
+
+from COMMON.connector import Column, SourceConnector, build_extraction_dag
+from COMMON.validation import NotNull, Ordering, Range, Unique
+from VRA.vra_dimensions import DIMENSIONS_SQL, MIGRATION_SQL, VIEW_SQL
+
+# Quantidade de dias após os quais os dados de um dia da VRA são considerados definitivos
+FINAL_AFTER_DAYS = 30
+
+# URL base da API do VRA (configurável para apontar para um servidor local, ex: benchmarks)
+API_URL = os.environ.get("AIRDATA_VRA_URL", "https://sas.anac.gov.br/sas/vra_api/vra/data") + "?dt_voo={date}"
+
+
+class VraConnector(SourceConnector):
+	"""Extração e atualização dos dados da VRA (Voo Regular Ativo - ANAC), um dia por requisição"""
+	name = "vra"
+	table = "vra_fact"
+	partition_column = "dt_referencia"
+	watermark_column = "dt_referencia"
+	# Chave natural do voo (empresa, número, origem e partida prevista no dia de referência)
+	key_columns = ["dt_referencia", "sg_empresa_icao", "nr_voo", "sg_icao_origem", "dt_partida_prevista"]
+	schema = {
+		"dt_partida_prevista": Column("timestamp", "%d/%m/%Y %H:%M"),
+		"dt_partida_real": Column("timestamp", "%d/%m/%Y %H:%M"),
+		"dt_chegada_prevista": Column("timestamp", "%d/%m/%Y %H:%M"),
+		"dt_chegada_real": Column("timestamp", "%d/%m/%Y %H:%M"),
+		"dt_referencia": Column("date", "%d/%m/%Y"),
+		"nr_assentos_ofertados": Column("int"),
+	}
+	# Regras de qualidade (linhas reprovadas vão para airdata.quarantine)
+	rules = [
+		NotNull("dt_referencia", "sg_empresa_icao", "nr_voo", "sg_icao_origem"),
+		Unique(*key_columns, name="unique_voo"),
+		Ordering("dt_partida_prevista", "dt_chegada_prevista", name="ordering_previsto"),
+		Ordering("dt_partida_real", "dt_chegada_real", name="ordering_real"),
+		Range("nr_assentos_ofertados", 0, 1000),
+	]
+	# Tabela fato do VRA particionada mensalmente por dt_referencia, com os textos repetidos em
+	# dimensões (VRA/vra_dimensions.py) e a view airdata.vra no formato plano original
+	table_sql = """
+	-- Tabelas planas (a não particionada original e a particionada) são renomeadas e migradas abaixo
+	DO $$
+	BEGIN
+		IF EXISTS (
+			SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+			WHERE n.nspname = 'airdata' AND c.relname = 'vra' AND c.relkind IN ('r', 'p')
+		) THEN
+			ALTER TABLE airdata.vra RENAME TO vra_legacy;
+			ALTER INDEX IF EXISTS airdata.vra_pkey RENAME TO vra_legacy_pkey;
+		END IF;
+	END $$;
+	""" + DIMENSIONS_SQL + """
+	CREATE TABLE IF NOT EXISTS airdata.vra_fact (
+		id SERIAL,
+		empresa_id INTEGER,                   -- airdata.vra_empresa
 		nr_voo VARCHAR(10),
 		cd_di VARCHAR(5),
 		cd_tipo_linha VARCHAR(5),
-		sg_equipamento_icao VARCHAR(10),
+		equipamento_id INTEGER,               -- airdata.vra_equipamento
 		nr_assentos_ofertados INTEGER,
-		sg_icao_origem VARCHAR(10),
-		nm_aerodromo_origem TEXT,
+		origem_id INTEGER,                    -- airdata.vra_aerodromo
 		dt_partida_prevista TIMESTAMP,
 		dt_partida_real TIMESTAMP,
-		sg_icao_destino VARCHAR(10),
-		nm_aerodromo_destino TEXT,
+		destino_id INTEGER,                   -- airdata.vra_aerodromo
 		dt_chegada_prevista TIMESTAMP,
 		dt_chegada_real TIMESTAMP,
-		ds_situacao_voo TEXT,
-		ds_justificativa TEXT,
-		dt_referencia DATE,
-		ds_situacao_partida TEXT,
-		ds_situacao_chegada TEXT,
-		dt_insercao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-	);
+		situacao_voo_id INTEGER,              -- airdata.vra_situacao
+		justificativa_id INTEGER,             -- airdata.vra_justificativa
+		dt_referencia DATE NOT NULL,
+		situacao_partida_id INTEGER,          -- airdata.vra_situacao
+		situacao_chegada_id INTEGER,          -- airdata.vra_situacao
+		dt_insercao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+		PRIMARY KEY (id, dt_referencia)
+	) PARTITION BY RANGE (dt_referencia);
+
+	-- Consultas por rota/aeroporto ao longo do tempo
+	CREATE INDEX IF NOT EXISTS vra_fact_origem_partida_idx ON airdata.vra_fact (origem_id, dt_partida_prevista);
+	CREATE INDEX IF NOT EXISTS vra_fact_destino_chegada_idx ON airdata.vra_fact (destino_id, dt_chegada_prevista);
+	-- Chave natural do voo (empresa, número, origem e partida prevista no dia de referência)
+	CREATE UNIQUE INDEX IF NOT EXISTS vra_fact_voo_key
+		ON airdata.vra_fact (dt_referencia, empresa_id, nr_voo, origem_id, dt_partida_prevista);
+	""" + VIEW_SQL + """
+	-- Migração dos dados da tabela plana antiga, se existir
+	DO $$
+	DECLARE
+		first_date DATE;
+		last_date DATE;
+	BEGIN
+		IF to_regclass('airdata.vra_legacy') IS NOT NULL THEN
+			SELECT MIN(dt_referencia), MAX(dt_referencia) INTO first_date, last_date FROM airdata.vra_legacy;
+			IF first_date IS NOT NULL THEN
+				PERFORM airdata.ensure_monthly_partitions('vra_fact', first_date, last_date);
+				""" + MIGRATION_SQL + """
+				PERFORM setval(
+					pg_get_serial_sequence('airdata.vra_fact', 'id'),
+					(SELECT COALESCE(MAX(id), 1) FROM airdata.vra_fact)
+				);
+				INSERT INTO airdata.ingestion_state (source, watermark)
+					VALUES ('vra', last_date::TEXT)
+					ON CONFLICT (source) DO NOTHING;
+			END IF;
+			DROP TABLE airdata.vra_legacy;
+		END IF;
+	END $$;
 	"""
-)
-	
-	@task
-	def get_last_update() -> str:
-		"""Task para obter a última data registrada na tabela VRA."""
-		import psycopg2
-		import configparser
-
-		# Leitura das configurações do banco de dados
-		config = configparser.ConfigParser()
-		config.read("/opt/airflow/config/db.cfg")
-		DB_CONFIG = {
-			"host": config["database"]["host"],
-			"port": config["database"]["port"],
-			"dbname": config["database"]["dbname"],
-			"user": config["database"]["user"],
-			"password": config["database"]["password"],
-		}
-		# Conexão ao banco de dados
-		conn = psycopg2.connect(**DB_CONFIG)
-		cur = conn.cursor()
-		# Consulta para obter a última data de referência
-		cur.execute("SELECT MAX(dt_referencia) FROM airdata.vra;")
-		last_date = cur.fetchone()[0]
-		cur.close()
-		conn.close()
-
-		# Verifica se há dados na tabela
-		if last_date is None:
-			print("Nenhum dado encontrado — iniciando de 2025-07-31")
-			return "2025-07-31"
-		date_str = last_date.strftime("%Y-%m-%d")
-		print(f"Última atualização: {date_str}")
-		return date_str
-
-	@task
-	def update_vra_data(last_date: str):
-		"""Task para atualizar os dados da VRA a partir da data seguinte à última data registrada"""
-		from sqlalchemy import create_engine
-		import requests
+
+	def items(self, watermark: str):
+		"""Dias entre a data seguinte à marca d'água e hoje"""
+		single_date = datetime.strptime(watermark, "%Y-%m-%d").date() + timedelta(days=1)
+		while single_date <= date.today():
+			yield single_date
+			single_date += timedelta(days=1)
+
+	def fetch(self, single_date: date):
+		"""Requisição à API (com cache) de um dia"""
+		from COMMON.http_cache import FOREVER, cached_get, invalidate
+
+		single_date_str = single_date.strftime("%d%m%Y")
+		url = API_URL.format(date=single_date_str)
+		print(f"Buscando dados para {single_date_str}... URL: {url}")
+		# Dias com mais de FINAL_AFTER_DAYS já estão consolidados e não são baixados de novo
+		is_final = single_date < date.today() - timedelta(days=FINAL_AFTER_DAYS)
+		response = cached_get(url, ttl=FOREVER if is_final else None)
+
+		if response.status_code != 200:
+			# Falha a task: a próxima execução retoma a partir do último dia carregado (marca d'água)
+			raise RuntimeError(f"Falha ao buscar dados para {single_date_str}: {response.status_code}")
+		if response.text == '"Nenhum dado foi encontrado."': # Verifica se não há dados para a data
+			print(f"Nenhum dado disponível para {single_date_str}.")
+			invalidate(url) # Dia ainda não publicado: não reaproveita a resposta vazia
+			return None
+		return response
+
+	def parse(self, single_date: date, response):
+		"""A API retorna JSON dentro de uma string JSON"""
 		import json
-		from datetime import datetime, timedelta, date
-		import pandas as pd		
-		import configparser
-
-		# Leitura das configurações do banco de dados
-		config = configparser.ConfigParser()
-		config.read("/opt/airflow/config/db.cfg")
-		DB_CONFIG = {
-			"host": config["database"]["host"],
-			"port": config["database"]["port"],
-			"dbname": config["database"]["dbname"],
-			"user": config["database"]["user"],
-			"password": config["database"]["password"],
-		}
-
-		# URL base da API do VRA
-		API_URL = "https://sas.anac.gov.br/sas/vra_api/vra/data?dt_voo={date}"
-
-		# Criação da engine de conexão com o banco de dados
-		engine = create_engine(
-					f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-					f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
-				)
-
-		# Define os limites de data para extração
-		start_date = datetime.strptime(last_date, "%Y-%m-%d").date() + timedelta(days=1) # Data seguinte à última data registrada
-		end_date = date.today() # Data atual
-
-		# Loop para buscar e inserir dados para cada data no intervalo
-		for single_date in pd.date_range(start=start_date, end=end_date):
-			single_date_str = single_date.strftime("%d%m%Y")
-
-			print(f"Buscando dados para {single_date_str}...")
-			print("URL: " + API_URL.format(date=single_date_str))
-			response = requests.get(API_URL.format(date=single_date_str)) # Requisição à API
-					
-			if response.status_code == 200: # Verifica se a requisição foi bem-sucedida
-				if response.text == '"Nenhum dado foi encontrado."': # Verifica se não há dados para a data
-					print(f"Nenhum dado disponível para {single_date_str}.")
-				else: # Processa os dados retornados
-					data = json.loads(response.json()) # Parsing do JSON retornado
-					if data:
-						df = pd.DataFrame(data) # Conversão dos dados para DataFrame
-						# Parsing das colunas de data e hora
-						for col in ["dt_partida_prevista", "dt_partida_real", "dt_chegada_prevista", "dt_chegada_real"]:
-							if col in df.columns:
-								df[col] = df[col].apply(parse_datetime)
-						# Parsing da coluna de data
-						df["dt_referencia"] = df["dt_referencia"].apply(parse_date)
-						
-						# Inserção dos dados no banco de dados
-						df.to_sql(
-							"vra",
-							con=engine,
-							schema="airdata",
-							if_exists="append",
-							index=False,
-							chunksize=5000,
-							method="multi"
-						)
-					else:
-						print(f"Nenhum dado disponível para {single_date_str}.")
-			else:
-				print(f"Falha ao buscar dados para {single_date_str}: {response.status_code}")
-
-	# Definição da ordem das tasks
-	last_update = get_last_update()
-	update_task = update_vra_data(last_update)
-	
-	create_table >> last_update >> update_task
-
-vra_extraction()
\ No newline at end of file
+		import pandas as pd
+
+		return pd.DataFrame(json.loads(response.json()))
+
+	def item_watermark(self, single_date: date, df) -> str:
+		return single_date.strftime("%Y-%m-%d")
+
+	def load(self, cur, item, df) -> int:
+		"""Resolve os textos repetidos em chaves das dimensões (cache do processo) e carrega a tabela fato"""
+		from COMMON.db import mark_touched_days
+		from COMMON.partitioning import load_partitioned
+		from VRA.vra_dimensions import DIMENSION_CACHE, FACT_KEY_COLUMNS, to_fact
+
+		try:
+			fact = to_fact(cur, df)
+			inserted = load_partitioned(
+				cur,
+				fact,
+				table=self.table,
+				partition_column=self.partition_column,
+				key_columns=FACT_KEY_COLUMNS
+			)
+		except Exception:
+			# A transação será desfeita: ids de linhas novas das dimensões deixam de existir
+			DIMENSION_CACHE.clear()
+			raise
+		mark_touched_days(cur, self.name, df[self.partition_column].dropna().dt.date.unique())
+		return inserted
+
+
+# DAG do Airflow: create_table >> get_last_update >> update_data
+vra_extraction = build_extraction_dag(VraConnector(), dag_id="vra_extraction", schedule="0 6 * * *")